@@ -0,0 +1,243 @@
+# This file contains the benchmark suite for the board, ship and CPU hot paths.
+#
+# Run "python benchmark.py" to time everything, "-k Board" to only run benchmarks whose name contains "Board",
+# "--output results.json" to save the results, and "--baseline results.json" to compare against saved results
+# (the exit code is 1 if anything got slower than the regression threshold).
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+
+import simulation
+from core import * # ComputerPlayer, CPUs, Board, Ship, etc
+
+# registered benchmarks
+# format - name:str => (prepare function, ops per round:int)
+BENCHMARKS = {}
+
+def benchmark(name:str, ops:int=1):
+    """
+    Register a benchmark. The decorated function does any untimed setup for one round and returns a function that runs the round.
+    The round function is timed as a whole and counted as ops operations, unless it returns a list of the nanoseconds each operation took
+    (see timeCall) to report its own per-call timings.
+    """
+    def register(prepare):
+        BENCHMARKS[name] = (prepare, ops)
+        return prepare
+    return register
+
+def timerOverhead(samples:int=1000):
+    """Return the nanoseconds a back-to-back pair of perf_counter_ns calls takes, which is subtracted from every per-call timing."""
+    best = None
+    for _ in range(samples):
+        start = time.perf_counter_ns()
+        elapsed = time.perf_counter_ns() - start
+        if best is None or elapsed < best: best = elapsed
+    return best
+
+def fleetBoard(boardClass):
+    """Return a board of boardClass with a random fleet on it."""
+    board = boardClass()
+    for ship in randomFleet(board):
+        board.addShip(ship)
+    return board
+
+def allPositions(board):
+    return [(x, y) for x in range(board.MIN_X, board.MAX_X+1) for y in range(board.MIN_Y, board.MAX_Y+1)]
+
+### BOARD ###
+for boardClass in (Board, BitBoard):
+    def addEnemyShot(boardClass=boardClass):
+        board = fleetBoard(boardClass)
+        shots = allPositions(board)
+        random.shuffle(shots)
+        def run():
+            samples = []
+            for pos in shots:
+                start = time.perf_counter_ns()
+                board.addEnemyShot(pos)
+                samples.append(time.perf_counter_ns() - start)
+            return samples
+        return run
+    benchmark(f"{boardClass.__name__}.addEnemyShot")(addEnemyShot)
+
+    def isShipValid(boardClass=boardClass):
+        board = fleetBoard(boardClass)
+        ships = [Ship(pos, 3, d) for pos in allPositions(board) for d in Ship.POSSIBLE_DIRECTIONS]
+        def run():
+            samples = []
+            for ship in ships:
+                start = time.perf_counter_ns()
+                board.isShipValid(ship)
+                samples.append(time.perf_counter_ns() - start)
+            return samples
+        return run
+    benchmark(f"{boardClass.__name__}.isShipValid")(isShipValid)
+
+### SHIP ###
+@benchmark("Ship()")
+def construct():
+    def run():
+        samples = []
+        for _ in range(1000):
+            start = time.perf_counter_ns()
+            Ship((3, 3), 5, (1, 0))
+            samples.append(time.perf_counter_ns() - start)
+        return samples
+    return run
+
+@benchmark("Ship.translated")
+def translated():
+    ship = Ship((3, 3), 5, (1, 0))
+    def run():
+        samples = []
+        for _ in range(1000):
+            start = time.perf_counter_ns()
+            ship.translated((1, 0))
+            samples.append(time.perf_counter_ns() - start)
+        return samples
+    return run
+
+@benchmark("Ship.rotated")
+def rotated():
+    ship = Ship((3, 3), 5, (1, 0))
+    def run():
+        samples = []
+        for _ in range(1000):
+            start = time.perf_counter_ns()
+            ship.rotated()
+            samples.append(time.perf_counter_ns() - start)
+        return samples
+    return run
+
+### CPUS ###
+CPUS = (RandomCPU, IntermediateCPU, AdvancedCPU, MonteCarloCPU)
+
+for cpuClass in CPUS:
+    def setup(cpuClass=cpuClass):
+        player = ComputerPlayer(cpuClass(False), BitBoard())
+        return player.getConfirmation
+    benchmark(f"{cpuClass.__name__}.setup")(setup)
+
+    def getMove(cpuClass=cpuClass):
+        player = ComputerPlayer(cpuClass(False), BitBoard())
+        target = fleetBoard(BitBoard)
+        def run():
+            # only the getMove calls are timed; a round is a whole game against a random fleet
+            samples = []
+            while len(target.aliveShips) > 0:
+                start = time.perf_counter_ns()
+                move = player.getMove()
+                samples.append(time.perf_counter_ns() - start)
+                result = target.addEnemyShot(move)
+                player.sendMoveResult(move, result, target.lastShipSunk().name if result == Result.SUNK else None)
+            return samples
+        return run
+    benchmark(f"{cpuClass.__name__}.getMove")(getMove)
+
+### FULL GAMES ###
+for cpuA, cpuB in ((RandomCPU, RandomCPU), (IntermediateCPU, IntermediateCPU), (AdvancedCPU, IntermediateCPU)):
+    def game(cpuA=cpuA, cpuB=cpuB):
+        def run():
+            simulation.playGame(cpuA, cpuB)
+        return run
+    benchmark(f"game.{cpuA.__name__}-{cpuB.__name__}")(game)
+
+def percentile(samples:list, p:float):
+    """Return the p-th percentile (0-100) of the sorted list samples."""
+    i = min(len(samples) - 1, max(0, round(p / 100 * (len(samples) - 1))))
+    return samples[i]
+
+def runBenchmark(name:str, minRounds:int=20, minTime:float=0.5, overhead:int=0):
+    """
+    Run one benchmark for at least minRounds rounds and minTime seconds, and return its statistics.
+    Latency percentiles are over every timed call (or every round, for benchmarks that time whole rounds), with overhead ns of timer cost taken off each call.
+    ops/sec is the median over rounds, and spread is the interquartile range of the rounds' ops/sec relative to that median, a measure of how noisy it is.
+    """
+    prepare, ops = BENCHMARKS[name]
+    latencies = [] # ns per op
+    rates = [] # ops/sec, one per round
+    started = time.perf_counter()
+    while len(rates) < minRounds or time.perf_counter() - started < minTime:
+        run = prepare()
+        start = time.perf_counter_ns()
+        rv = run()
+        elapsed = time.perf_counter_ns() - start
+        if isinstance(rv, list):
+            if not rv: continue
+            samples = [max(0, t - overhead) for t in rv]
+            latencies.extend(samples)
+            rates.append(len(samples) / (max(1, sum(samples)) / 1e9))
+        elif ops > 0:
+            latencies.extend([elapsed / ops] * ops)
+            rates.append(ops / (elapsed / 1e9))
+    latencies.sort()
+    rates.sort()
+    median = percentile(rates, 50)
+    return {
+        "ops_per_sec": median,
+        "spread": (percentile(rates, 75) - percentile(rates, 25)) / median if median else 0.0,
+        "rounds": len(rates),
+        "ops": len(latencies),
+        "p50_us": percentile(latencies, 50) / 1000,
+        "p90_us": percentile(latencies, 90) / 1000,
+        "p99_us": percentile(latencies, 99) / 1000,
+        "max_us": latencies[-1] / 1000,
+    }
+
+def compare(results:dict, baseline:dict, threshold:float):
+    """
+    Return a list of (name, change) for every benchmark whose median ops/sec is more than threshold slower than in baseline.
+    A slowdown within the spread measured by either run is treated as noise, so a noisy benchmark has to slow down by more than its spread to count.
+    """
+    regressions = []
+    for name, stats in results["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(name)
+        if old is None or old["ops_per_sec"] == 0: continue
+        change = stats["ops_per_sec"] / old["ops_per_sec"] - 1
+        if change < -max(threshold, stats.get("spread", 0.0), old.get("spread", 0.0)):
+            regressions.append((name, change))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the board, ship and CPU hot paths.")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=20, help="minimum rounds per benchmark")
+    parser.add_argument("--time", type=float, default=0.5, help="minimum seconds per benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("-b", "--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="fraction of median ops/sec that a benchmark may lose before it counts as a regression (raised to the measured spread for noisy benchmarks)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {"python": platform.python_version(), "platform": platform.platform(), "timestamp": time.time(), "benchmarks": {}}
+    overhead = timerOverhead()
+    print(f"{'benchmark':40} {'ops/sec':>12} {'spread':>7} {'p50 us':>10} {'p90 us':>10} {'p99 us':>10} {'change':>8}")
+    for name in BENCHMARKS:
+        if args.filter not in name: continue
+        stats = runBenchmark(name, args.rounds, args.time, overhead)
+        results["benchmarks"][name] = stats
+        change = ""
+        if baseline is not None and name in baseline.get("benchmarks", {}):
+            old = baseline["benchmarks"][name]["ops_per_sec"]
+            if old: change = f"{100 * (stats['ops_per_sec'] / old - 1):+.1f}%"
+        print(f"{name:40} {stats['ops_per_sec']:12.0f} {100 * stats['spread']:6.1f}% {stats['p50_us']:10.2f} {stats['p90_us']:10.2f} {stats['p99_us']:10.2f} {change:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for name, change in regressions:
+            print(f"REGRESSION: {name} is {-100 * change:.1f}% slower than the baseline")
+        if regressions: sys.exit(1)
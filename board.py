@@ -1,38 +1,75 @@
 from enum import Enum
+from collections.abc import MutableMapping
 from ship import Ship
+from cellpool import UnshotPool, UnshotMask
+from config import GameConfig, DEFAULT_CONFIG
+
+__all__ = ["Result", "DuplicateShotError", "Board", "BitBoard", "zobristKey"]
+
+MASK64 = (1 << 64) - 1
 
 class Result(Enum):
     MISS = 0
     HIT = 1
     SUNK = 2
 
+def zobristKey(cell:int, result:Result):
+    """
+    Return the 64 bit Zobrist key of a shot with result at cell (see Board.cellIndex).
+    Keys are made by the splitmix64 finalizer instead of being looked up in a random table, so they work for any board size and are the same in every process.
+    """
+    z = (cell * 3 + result.value + 1) * 0x9E3779B97F4A7C15 & MASK64
+    z = (z ^ z >> 30) * 0xBF58476D1CE4E5B9 & MASK64
+    z = (z ^ z >> 27) * 0x94D049BB133111EB & MASK64
+    return z ^ z >> 31
+
 class DuplicateShotError(Exception):
     """Exception raised when a player or opponent attempts to fire a shot in the same place twice."""
     def __init__(self, message):
         super().__init__(message)
 
 class Board():
-    def __init__(self, ships=None):
+    """
+    One player's primary grid (their ships and the enemy's shots) and targeting grid (their own shots).
+    Everything is stored sparsely, keyed by position, so memory grows with ships and shots rather than with board size.
+    """
+    def __init__(self, ships=None, config:GameConfig=None):
         # shots the enemy has fired onto your grid
         # format - (xpos:int, ypos:int) => hit:bool
         self.enemyshots = {}
         # shots you have fired onto the enemy's grid
         # format - (xpos:int, ypos:int) => hit:bool
         self.myshots = {}
-        self.occupiedspaces = []
-        self.aliveShips = []
+        # index of every occupied space
+        # format - (xpos:int, ypos:int) => Ship
+        self.shipAt = {}
+        # ships that haven't been sunk yet (insertion ordered, so this also works as an O(1) removable list)
+        # format - Ship => hits remaining before the ship sinks:int
+        self.aliveShips = {}
         self.deadShips = []
+        self.unshot = None # UnshotPool of the targeting board, built the first time a CPU asks for it
+        self.shotHash = 0 # Zobrist hash of myshots: the xor of zobristKey of every shot, so equal targeting boards hash the same however they were reached
 
         # constants
+        self.config = DEFAULT_CONFIG if config is None else config
         self.MIN_X = 1
-        self.MAX_X = 10
+        self.MAX_X = self.config.width
         self.MIN_Y = 1
-        self.MAX_Y = 10
+        self.MAX_Y = self.config.height
 
         if ships is not None:
             for s in ships:
                 self.addShip(s)
 
+    def cellIndex(self, pos):
+        """Return the index of position pos when the board is numbered row by row starting at 0."""
+        return (pos[1] - self.MIN_Y) * (self.MAX_X - self.MIN_X + 1) + (pos[0] - self.MIN_X)
+
+    def cellPos(self, cell:int):
+        """Return the position of the cell with index cell (the inverse of cellIndex)."""
+        width = self.MAX_X - self.MIN_X + 1
+        return (self.MIN_X + cell % width, self.MIN_Y + cell // width)
+
     def getNeighbors(self, pos):
         """Return a list of valid neighboring squares of position pos."""
         rv = []
@@ -44,42 +81,216 @@ class Board():
         return rv
     
     def addShip(self, ship):
-        self.aliveShips.append(ship)
+        self.aliveShips[ship] = ship.length
         for space in ship.spaces:
-            self.occupiedspaces.append(space)
+            self.shipAt[space] = ship
 
     def addMyShot(self, pos, result):
         """Add a shot to targeting board"""
         if pos in self.myshots:
             raise DuplicateShotError("There is already a shot there!")
         self.myshots[pos] = result
+        self.shotHash ^= zobristKey(self.cellIndex(pos), result)
+        if self.unshot is not None: self.unshot.remove(pos)
+
+    def getUnshotPool(self):
+        """Return the pool of targeting board positions that haven't been fired upon yet."""
+        if self.unshot is None: self.unshot = UnshotPool(self)
+        return self.unshot
 
     def addEnemyShot(self, pos):
-        """Add an enemy shot to the primary board and return the result of the shot"""
+        """Add an enemy shot to the primary board and return the result of the shot. Raises ValueError if pos is off the board."""
+        if not ((self.MIN_X <= pos[0] <= self.MAX_X) and (self.MIN_Y <= pos[1] <= self.MAX_Y)): raise ValueError("Position is off the board")
         if pos in self.enemyshots:
             raise DuplicateShotError("There is already an enemy shot there!")
-        
-        for ship in self.aliveShips:
-            if pos in ship.spaces:
-                self.enemyshots[pos] = True # hit
-                ship.spaces.remove(pos)
-                if ship.isSunk():
-                    self.aliveShips.remove(ship)
-                    self.deadShips.append(ship)
-                    return Result.SUNK # tells calling function to check victory conditions
-                else: return Result.HIT
-        self.enemyshots[pos] = False # miss
-        return Result.MISS
+
+        ship = self.shipAt.get(pos)
+        if ship is None:
+            self.enemyshots[pos] = False # miss
+            return Result.MISS
+        self.enemyshots[pos] = True # hit
+        return self.hitShip(ship)
+
+    def hitShip(self, ship):
+        """Count a hit on ship and return HIT, or SUNK if that was its last unhit space. The ship's spaces are left untouched."""
+        remaining = self.aliveShips[ship] - 1
+        if remaining == 0:
+            del self.aliveShips[ship]
+            self.deadShips.append(ship)
+            return Result.SUNK # tells calling function to check victory conditions
+        self.aliveShips[ship] = remaining
+        return Result.HIT
+
+    def isSunk(self, ship):
+        """Return True if ship (which must have been added to this board) has been sunk."""
+        return ship not in self.aliveShips
     
     def isShipValid(self, ship:Ship):
         """Return 0 if ship placement is valid, 1 if out of bounds, 2 if inside an existing ship"""
+        (left, top), (right, bottom) = ship.spaces[0], ship.spaces[-1] # spaces are sorted, so these are the corners
+        if (left < self.MIN_X) or (top < self.MIN_Y) or (right > self.MAX_X) or (bottom > self.MAX_Y):
+            return 1
         for space in ship.spaces:
-            if (space[0] < self.MIN_X) | (space[0] > self.MAX_X) | (space[1] < self.MIN_Y) | (space[1] > self.MAX_Y):
-                return 1
-            if space in self.occupiedspaces:
+            if space in self.shipAt:
                 return 2
         return 0
 
     def lastShipSunk(self):
         """Return the last ship sunk"""
-        return self.deadShips[len(self.deadShips)-1]
\ No newline at end of file
+        return self.deadShips[-1]
+
+class ShotMap(MutableMapping):
+    """
+    The enemy shots on a BitBoard as a mapping of (xpos:int, ypos:int) => hit:bool, like Board.enemyshots, read from and written to the board's masks.
+    """
+    def __init__(self, board):
+        self.board = board
+
+    def bit(self, pos):
+        if not ((1 <= pos[0] <= self.board.width) and (1 <= pos[1] <= self.board.height)): raise KeyError(pos)
+        return 1 << self.board.cellIndex(pos)
+
+    def __getitem__(self, pos):
+        bit = self.bit(pos)
+        if not self.board.enemyshotmask & bit: raise KeyError(pos)
+        return bool(self.board.enemyhitmask & bit)
+
+    def __setitem__(self, pos, hit:bool):
+        bit = self.bit(pos)
+        self.board.enemyshotmask |= bit
+        if hit: self.board.enemyhitmask |= bit
+        else: self.board.enemyhitmask &= ~bit
+
+    def __delitem__(self, pos):
+        bit = self.bit(pos)
+        if not self.board.enemyshotmask & bit: raise KeyError(pos)
+        self.board.enemyshotmask &= ~bit
+        self.board.enemyhitmask &= ~bit
+
+    def __contains__(self, pos):
+        try:
+            return bool(self.board.enemyshotmask & self.bit(pos))
+        except (KeyError, TypeError):
+            return False
+
+    def __iter__(self):
+        mask = self.board.enemyshotmask
+        while mask:
+            low = mask & -mask
+            yield self.board.cellPos(low.bit_length() - 1)
+            mask ^= low
+
+    def __len__(self):
+        return self.board.enemyshotmask.bit_count()
+
+class BitBoard(Board):
+    """
+    Board that stores occupancy, shots and the cells of each ship as integer bitmasks, one bit per cell (see Board.cellIndex).
+    It keeps the same public interface as Board, so it can be used anywhere a Board is expected: enemyshots is a ShotMap over the masks, and
+    the unshot pool is an UnshotMask that reads the targeting masks, so firing a shot only updates masks.
+    Every mask update copies a whole mask, so this is meant for normal sized boards; use Board for very large ones.
+    """
+    # neighbor tables shared by all boards of the same size
+    # format - (MIN_X, MAX_X, MIN_Y, MAX_Y) => {(xpos:int, ypos:int) => tuple of neighboring positions}
+    neighborTables = {}
+    MAX_NEIGHBOR_TABLE_CELLS = 10000 # larger boards work out neighbors on the fly instead
+
+    def __init__(self, ships=None, config:GameConfig=None):
+        super().__init__(config=config)
+        self.width = self.config.width
+        self.height = self.config.height
+        self.occupiedmask = 0
+        self.enemyshotmask = 0 # every cell the enemy has fired upon
+        self.enemyhitmask = 0 # the shots in enemyshotmask that hit
+        self.enemyshots = ShotMap(self)
+        self.myshotmask = 0 # every cell you have fired upon
+        self.myhitmask = 0 # the shots in myshotmask that hit
+        # cells of each ship
+        # format - Ship => mask:int
+        self.shipmasks = {}
+        # ship on each cell (see Board.cellIndex), or None
+        self.cellShips = [None] * self.config.cells
+
+        key = (self.MIN_X, self.MAX_X, self.MIN_Y, self.MAX_Y)
+        if (self.config.cells <= BitBoard.MAX_NEIGHBOR_TABLE_CELLS) & (key not in BitBoard.neighborTables):
+            BitBoard.neighborTables[key] = {(x, y): tuple(Board.getNeighbors(self, (x, y)))
+                                            for x in range(self.MIN_X, self.MAX_X+1) for y in range(self.MIN_Y, self.MAX_Y+1)}
+        self.neighbors = BitBoard.neighborTables.get(key)
+
+        if ships is not None:
+            for s in ships:
+                self.addShip(s)
+
+    @property
+    def enemymissmask(self):
+        return self.enemyshotmask & ~self.enemyhitmask
+
+    @property
+    def mymissmask(self):
+        return self.myshotmask & ~self.myhitmask
+
+    def getNeighbors(self, pos):
+        """Return a tuple of valid neighboring squares of position pos."""
+        if self.neighbors is None: return super().getNeighbors(pos)
+        return self.neighbors[pos]
+
+    def shipMask(self, ship:Ship):
+        """Return the bitmask of the cells occupied by ship. Assumes the ship is in bounds."""
+        return ship.cellMask(self.width)
+
+    def addShip(self, ship):
+        super().addShip(ship)
+        mask = self.shipMask(ship)
+        self.shipmasks[ship] = mask
+        self.occupiedmask |= mask
+        for x, y in ship.spaces:
+            self.cellShips[(y - 1) * self.width + (x - 1)] = ship
+
+    def addMyShot(self, pos, result):
+        """Add a shot to targeting board"""
+        cell = (pos[1] - 1) * self.width + (pos[0] - 1)
+        shots = self.myshotmask
+        if shots >> cell & 1:
+            raise DuplicateShotError("There is already a shot there!")
+        self.myshotmask = shots | 1 << cell
+        if result != Result.MISS: self.myhitmask |= 1 << cell
+        self.myshots[pos] = result
+        self.shotHash ^= zobristKey(cell, result)
+
+    def getUnshotPool(self):
+        """Return the pool of targeting board positions that haven't been fired upon yet."""
+        if self.unshot is None: self.unshot = UnshotMask(self)
+        return self.unshot
+
+    def addEnemyShot(self, pos):
+        """Add an enemy shot to the primary board and return the result of the shot. Raises ValueError if pos is off the board."""
+        x, y = pos
+        if not ((1 <= x <= self.width) and (1 <= y <= self.height)): raise ValueError("Position is off the board")
+        cell = (y - 1) * self.width + (x - 1)
+        shots = self.enemyshotmask
+        if shots >> cell & 1:
+            raise DuplicateShotError("There is already an enemy shot there!")
+        self.enemyshotmask = shots | 1 << cell
+
+        ship = self.cellShips[cell]
+        if ship is None: return Result.MISS
+        self.enemyhitmask |= 1 << cell
+        return self.hitShip(ship)
+
+    def isShipValid(self, ship:Ship):
+        """Return 0 if ship placement is valid, 1 if out of bounds, 2 if inside an existing ship"""
+        spaces = ship.spaces # sorted, so the first and last spaces are the corners
+        left, top = spaces[0]
+        right, bottom = spaces[-1]
+        width = self.width
+        if (left < 1) or (top < 1) or (right > width) or (bottom > self.height):
+            return 1
+        mask = ship.mask # cellMask's cache, read directly to save a call on this hot path
+        if (mask is not None) and (mask[0] == width):
+            return 2 if mask[1] & self.occupiedmask else 0
+        # building the mask of a new ship costs more than looking up its few cells
+        cellShips = self.cellShips
+        for x, y in spaces:
+            if cellShips[(y - 1) * width + (x - 1)] is not None:
+                return 2
+        return 0
@@ -0,0 +1,116 @@
+# This file contains the pool of unshot cells used to pick random moves.
+
+import random
+
+from placements import randomBit
+
+class UnshotPool():
+    """
+    The cells of a targeting board that haven't been fired upon, for picking random moves in O(1).
+    Cells are split by checkerboard color ((x + y) % 2) into two virtual arrays, where slot i of a color starts out holding the i-th cell of that color (row by row).
+    Removing a cell moves the cell in the last slot of its color into its slot (swap-remove), so the unshot cells of a color are always slots 0 to size-1
+    and a random move is just a random slot.
+    Only slots that have been changed by a removal are stored, so the pool takes O(1) time to build and memory grows with the number of shots, not the board size.
+    """
+    def __init__(self, board):
+        self.minX = board.MIN_X
+        self.minY = board.MIN_Y
+        self.width = board.MAX_X - board.MIN_X + 1
+        height = board.MAX_Y - board.MIN_Y + 1
+        self.base = (self.minX + self.minY) % 2 # color of cell 0
+
+        cells = self.width * height
+        self.sizes = [0, 0]
+        self.sizes[self.base] = (cells + 1) // 2
+        self.sizes[1 - self.base] = cells // 2
+        # slots that no longer hold their starting cell
+        # format - color => {slot:int => cell:int}
+        self.slots = ({}, {})
+        # slots of cells that have been moved
+        # format - cell:int => slot:int
+        self.moved = {}
+
+        for pos in board.myshots:
+            self.remove(pos)
+
+    def __len__(self):
+        return self.sizes[0] + self.sizes[1]
+
+    def rowStart(self, color:int, y:int):
+        """Return the x offset (0 or 1) of the first cell of color in row y."""
+        return (color - y - self.base) % 2
+
+    def cellAt(self, color:int, slot:int):
+        """Return the cell in slot of color."""
+        cell = self.slots[color].get(slot, -1)
+        if cell >= 0: return cell
+        # every pair of rows holds exactly width cells of each color
+        pair, rem = divmod(slot, self.width)
+        start = self.rowStart(color, 0)
+        firstRow = (self.width - start + 1) // 2
+        if rem < firstRow: return (2*pair) * self.width + start + 2*rem
+        return (2*pair + 1) * self.width + (1 - start) + 2*(rem - firstRow)
+
+    def slotOf(self, color:int, cell:int):
+        """Return the slot of cell, which has color."""
+        slot = self.moved.get(cell, -1)
+        if slot >= 0: return slot
+        y, x = divmod(cell, self.width)
+        start = self.rowStart(color, 0)
+        firstRow = (self.width - start + 1) // 2
+        return (y // 2) * self.width + (firstRow if y % 2 else 0) + (x - self.rowStart(color, y)) // 2
+
+    def remove(self, pos):
+        """Remove position pos from the pool."""
+        cell = (pos[1] - self.minY) * self.width + (pos[0] - self.minX)
+        color = (pos[0] + pos[1]) % 2
+        last = self.sizes[color] - 1
+        slot = self.slotOf(color, cell)
+        if slot > last: return # already removed
+        lastCell = self.cellAt(color, last)
+        self.slots[color][slot] = lastCell
+        self.moved[lastCell] = slot
+        self.slots[color][last] = cell
+        self.moved[cell] = last
+        self.sizes[color] = last
+
+    def pick(self, parity:bool=False):
+        """
+        Return a uniformly random unshot position, or None if every position has been fired upon.
+        With parity, positions where x + y is even are picked first: every ship of length 2 or more covers one of them, so hunting on them alone still finds every ship.
+        """
+        if parity and self.sizes[0] > 0: color = 0
+        elif len(self) == 0: return None
+        else: color = 0 if random.randrange(len(self)) < self.sizes[0] else 1
+        cell = self.cellAt(color, random.randrange(self.sizes[color]))
+        return (self.minX + cell % self.width, self.minY + cell // self.width)
+
+class UnshotMask():
+    """
+    UnshotPool for a BitBoard: the unshot cells are read from the board's myshotmask whenever a move is picked, so firing a shot doesn't have to update
+    the pool at all.
+    """
+    # cells where x + y is even (see UnshotPool.pick), shared by all boards of the same size
+    # format - (width, height) => mask:int
+    evenMasks = {}
+
+    def __init__(self, board):
+        self.board = board
+        self.all = (1 << board.config.cells) - 1
+        size = (board.width, board.height)
+        if size not in UnshotMask.evenMasks:
+            UnshotMask.evenMasks[size] = sum(1 << board.cellIndex((x, y)) for x in range(1, board.width+1) for y in range(1, board.height+1) if (x + y) % 2 == 0)
+        self.even = UnshotMask.evenMasks[size]
+
+    def __len__(self):
+        return (self.all & ~self.board.myshotmask).bit_count()
+
+    def remove(self, pos):
+        pass # the board's masks already have the shot
+
+    def pick(self, parity:bool=False):
+        """Return a uniformly random unshot position, or None if every position has been fired upon. See UnshotPool.pick for parity."""
+        unshot = self.all & ~self.board.myshotmask
+        if parity and (unshot & self.even): unshot &= self.even
+        if not unshot: return None
+        return self.board.cellPos(randomBit(unshot))
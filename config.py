@@ -0,0 +1,44 @@
+# This file contains the game configuration (board size and fleet) shared by the boards, CPUs, GUI and headless code.
+
+# ships each player places, as (length, name)
+DEFAULT_FLEET = ((5, "Carrier"), (4, "Battleship"), (3, "Destroyer"), (3, "Submarine"), (2, "Patrol Boat"))
+
+class GameConfig():
+    """
+    Board dimensions and fleet for a game. Positions run from (1, 1) to (width, height).
+    Configs are compared and hashed by value so they can be used as cache keys; don't change one after creating it.
+    """
+    def __init__(self, width:int=10, height:int=10, fleet:tuple=DEFAULT_FLEET):
+        """
+        :param width: number of columns
+        :param height: number of rows
+        :param fleet: tuple of (length, name) for each ship; names must be unique
+        """
+        fleet = tuple((int(length), str(name)) for length, name in fleet)
+        if (width < 1) | (height < 1): raise ValueError("Board dimensions must be positive")
+        if len(set(name for length, name in fleet)) != len(fleet): raise ValueError("Ship names must be unique")
+        for length, name in fleet:
+            if (length < 1) | (length > max(width, height)): raise ValueError(f"The {name} doesn't fit on a {width}x{height} board")
+        if sum(length for length, name in fleet) > width * height: raise ValueError("The fleet doesn't fit on the board")
+        self.width = width
+        self.height = height
+        self.fleet = fleet
+
+    def __eq__(self, other):
+        return isinstance(other, GameConfig) and (self.width, self.height, self.fleet) == (other.width, other.height, other.fleet)
+
+    def __hash__(self):
+        return hash((self.width, self.height, self.fleet))
+
+    def __repr__(self):
+        return f"GameConfig({self.width}, {self.height}, {self.fleet})"
+
+    @property
+    def cells(self):
+        return self.width * self.height
+
+    def shipLengths(self):
+        """Return a dict of ship name => length."""
+        return dict((name, length) for length, name in self.fleet)
+
+DEFAULT_CONFIG = GameConfig()
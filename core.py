@@ -0,0 +1,20 @@
+# This file is the entry point to the core game logic (config, ships, boards, players and CPUs) for headless use.
+#
+# It only pulls in small standard library modules: never tkinter, asyncio or multiprocessing. The GUI (game.py) and
+# networking (server.py, remoteplayer.py) are optional layers on top, and process pools are only imported when used.
+
+from config import GameConfig, DEFAULT_CONFIG, DEFAULT_FLEET
+from ship import Ship
+from board import Result, DuplicateShotError, Board, BitBoard
+from placements import randomFleet, firstFit
+from cpu import Mode, CPU, RandomCPU, IntermediateCPU, AdvancedCPU, MonteCarloCPU
+from player import Player, ComputerPlayer
+
+__all__ = [
+    "GameConfig", "DEFAULT_CONFIG", "DEFAULT_FLEET",
+    "Ship",
+    "Result", "DuplicateShotError", "Board", "BitBoard",
+    "randomFleet", "firstFit",
+    "Mode", "CPU", "RandomCPU", "IntermediateCPU", "AdvancedCPU", "MonteCarloCPU",
+    "Player", "ComputerPlayer",
+]
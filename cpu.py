@@ -2,8 +2,14 @@
 
 import time
 import random
+from enum import Enum
+from collections import deque
 
-from board import *
+from board import Board, Result
+from placements import boardTable, randomFleet, packCells, unpackCells, MAX_TABLE_CELLS
+from statecache import StateCache
+
+__all__ = ["Mode", "CPU", "RandomCPU", "IntermediateCPU", "AdvancedCPU", "MonteCarloCPU"]
 
 class Mode(Enum):
     """
@@ -21,10 +27,41 @@ class CPU():
         self.slow = slow
         self.lastmove = None
         self.lastresult = None
+        self.placement = None # fleet sampler to set up with instead of the CPU's own placement (anything with randomShips(board), e.g. a heatmap.FleetBook)
     
     def setBoard(self, board:Board):
         self.board = board
 
+    def thinkingTime(self, setup:bool=False):
+        """
+        Return how many seconds the CPU should appear to think before its next move (or its setup, if setup is true).
+        In slow mode this is a random delay to make the player think the computer is running some super fancy algorithm.
+        The caller waits it out without blocking, and the time spent actually computing the move counts towards it.
+        """
+        if not self.slow: return 0
+        return random.uniform(1.5, 4.5) if setup else random.uniform(0.5, 1.5)
+
+    def sendMoveResult(self, move:tuple, result:Result, shipName:str=None):
+        """Receive the result of a move this CPU made. shipName is the name of the ship that was sunk, if any."""
+        self.lastmove = move
+        self.lastresult = result
+
+    def rematch(self):
+        """Return a new CPU with the same settings and no memory of this game."""
+        cpu = self.fresh()
+        cpu.placement = self.placement
+        return cpu
+
+    def fresh(self):
+        """Return a new CPU of this kind with the same constructor arguments."""
+        return type(self)(self.slow)
+
+    def placeShips(self, spacing:bool=False):
+        """Add a fleet to the board, from the placement sampler if there is one, otherwise at random (kept apart, with spacing)."""
+        ships = self.placement.randomShips(self.board) if self.placement is not None else randomFleet(self.board, spacing)
+        for ship in ships:
+            self.board.addShip(ship)
+
     def setup(self): raise NotImplementedError()
     def getMove(self): raise NotImplementedError()
 
@@ -35,175 +72,450 @@ class RandomCPU(CPU):
     Moves: Makes completely random moves. Only has access to RANDOM mode.
     """
     def setup(self):
-        if self.slow: time.sleep(random.uniform(1.5, 4.5)) # add random time delay to make player think computer is running some super fancy algorithm
-        shipsToPlace = [(5, "Carrier"), (4, "Battleship"), (3, "Destroyer"), (3, "Submarine"), (2, "Patrol Boat")]
-        while len(shipsToPlace) > 0:
-            nextShipInfo = shipsToPlace[0]
-            shipsToPlace.pop(0)
-            valid = -1
-            while valid != 0:
-                pos = (random.randint(self.board.MIN_X, self.board.MAX_X), random.randint(self.board.MIN_Y, self.board.MAX_Y))
-                direction = random.choice(Ship.POSSIBLE_DIRECTIONS)
-                nextShip = Ship(pos, nextShipInfo[0], direction, nextShipInfo[1])
-                valid = self.board.isShipValid(nextShip)
-            self.board.addShip(nextShip)
+        self.placeShips()
     
     def getMove(self):
-        if self.slow: time.sleep(random.uniform(0.5, 1.5))
-        valid = False
-        while not valid:
-            move = (random.randint(self.board.MIN_X, self.board.MAX_X), random.randint(self.board.MIN_Y, self.board.MAX_Y))
-            if move not in self.board.myshots:
-                valid = True
-        return move
+        return self.board.getUnshotPool().pick()
     
 class IntermediateCPU(CPU):
     """
     Smarter than Random CPU.
     Setup: Tries to place ships with at least one square of space between them.
-    Moves: Only has access to RANDOM and SHIPGROUP modes.
+    Moves: Only has access to RANDOM and SHIPGROUP modes. With parity, RANDOM mode only fires on one checkerboard color until it runs out.
     """
-    def __init__(self, slow:bool):
+    def __init__(self, slow:bool, parity:bool=False):
         super().__init__(slow)
+        self.parity = parity
         self.targetingMode = Mode.RANDOM
-        self.shipGroup = [] # all confirmed spaces of the current ship group being fired upon
-        self.shipGroupBorders = [] # spaces bordering the shipGroup squares that have not been fired upon yet
+        self.shipGroup = set() # all confirmed spaces of the current ship group being fired upon
+        self.shipGroupBorders = deque() # spaces bordering the shipGroup squares that have not been fired upon yet, in the order they were found
+        self.queuedBorders = set() # every space ever added to shipGroupBorders for the current ship group
+
+    def fresh(self):
+        return type(self)(self.slow, self.parity)
 
     def setup(self):
-        if self.slow: time.sleep(random.uniform(1.5, 4.5))
-        shipsToPlace = [(5, "Carrier"), (4, "Battleship"), (3, "Destroyer"), (3, "Submarine"), (2, "Patrol Boat")]
-        while len(shipsToPlace) > 0:
-            nextShipInfo = shipsToPlace[0]
-            shipsToPlace.pop(0)
-            valid = -1
-            while valid != 0:
-                pos = (random.randint(self.board.MIN_X, self.board.MAX_X), random.randint(self.board.MIN_Y, self.board.MAX_Y))
-                direction = random.choice(Ship.POSSIBLE_DIRECTIONS)
-                length = nextShipInfo[0]
-                nextShip = Ship(pos, length, direction, nextShipInfo[1])
-                valid = self.board.isShipValid(nextShip)
-                # check squares around ship
-                spaces = nextShip.spaces
-                squaresAround = []
-                for x in range(spaces[0][0]-1, spaces[length-1][0]+1):
-                    for y in range(spaces[0][1]-1, spaces[length-1][1]+1):
-                        if (x, y) in spaces: continue
-                        if (x < self.board.MIN_X) | (x > self.board.MAX_X): continue
-                        if (y < self.board.MIN_Y) | (y > self.board.MAX_Y): continue
-                        squaresAround.append((x, y))
-                for sq in squaresAround:
-                    if sq in self.board.occupiedspaces:
-                        valid = 1
-            self.board.addShip(nextShip)
+        self.placeShips(spacing=True)
+
+    def sendMoveResult(self, move:tuple, result:Result, shipName:str=None):
+        super().sendMoveResult(move, result, shipName)
+        if self.targetingMode == Mode.RANDOM:
+            # If the move was a hit, start a ship group around it.
+            if result == Result.HIT:
+                self.setShipGroup(move)
+        elif result != Result.MISS:
+            self.addToShipGroup(move)
     
     def getMove(self):
         moveToReturn = None
-        if self.slow: time.sleep(random.uniform(0.5, 1.5))
-        if self.targetingMode == Mode.RANDOM:
-            # If last move was a hit, switch modes.
-            if self.lastresult == Result.HIT:
-                self.targetingMode = Mode.SHIPGROUP
-                self.shipGroupCenter = self.lastmove # space to build the ship group around
-                moveToReturn = self.shipGroupMove()
-            else:
-                # Otherwise, return a random move
-                moveToReturn = self.randomMove()
-        else: # in SHIPGROUP mode
+        if self.targetingMode == Mode.SHIPGROUP:
             moveToReturn = self.shipGroupMove()
             if moveToReturn is None:
                 self.targetingMode = Mode.RANDOM
-                self.shipGroupCenter = None
-                moveToReturn = self.randomMove()
+        if moveToReturn is None:
+            moveToReturn = self.randomMove()
         
         self.lastmove = moveToReturn
         return moveToReturn
         
     def randomMove(self):
-        """Return a random valid move."""
-        valid = False
-        while not valid:
-            move = (random.randint(self.board.MIN_X, self.board.MAX_X), random.randint(self.board.MIN_Y, self.board.MAX_Y))
-            if move not in self.board.myshots:
-                valid = True
-        return move
+        """Return a random valid move (on one checkerboard color first, if hunting with parity)."""
+        return self.board.getUnshotPool().pick(self.parity)
     
     def shipGroupMove(self):
-        """Explore from ship group center until an unfired space has been found. Return that space. If the ship group is complete, return None."""
-        spacesToExplore = [self.shipGroupCenter] # this will function as a queue
-        exploredSpaces = []
-        while len(spacesToExplore) > 0:
-            nextSpace = spacesToExplore.pop(0)
-            exploredSpaces.append(nextSpace)
-            if nextSpace in self.board.myshots:
-                if self.board.myshots[nextSpace] != Result.MISS:
-                    # queue all unexplored neighboring spaces
-                    neighbors = self.board.getNeighbors(nextSpace)
-                    for nb in neighbors:
-                        if (nb not in spacesToExplore) & (nb not in exploredSpaces):
-                            spacesToExplore.append(nb)
-            else:
-                # this space hasn't been fired on yet
+        """Return the next unfired space bordering the ship group. If the ship group is complete, return None."""
+        while len(self.shipGroupBorders) > 0:
+            nextSpace = self.shipGroupBorders.popleft()
+            if nextSpace not in self.board.myshots:
                 return nextSpace
-        
-        # if all spaces have been explored
         return None
 
-    '''def setShipGroup(self):
+    def setShipGroup(self, center:tuple):
+        """Start a new ship group around center, which should be the space of the last hit."""
+        self.targetingMode = Mode.SHIPGROUP
+        self.shipGroup = set()
+        self.shipGroupBorders = deque()
+        self.queuedBorders = set()
+        self.addToShipGroup(center)
+
+    def addToShipGroup(self, pos:tuple):
         """
-        Automatically determine the ship group and set variables accordingly.
-        This function should only be called when the last move was a hit.
+        Add a hit space to the ship group, along with every hit space already connected to it, and queue their unfired neighbors as borders.
+        Each space is only ever added once, so keeping the group up to date costs O(neighbors) per hit.
         """
-        self.targetingMode = Mode.SHIPGROUP
-        self.shipGroup = []
-        self.shipGroupBorders = []
-        spacesToExplore = [self.lastmove] # this will function as a queue
-        exploredSpaces = []
-        while len(spacesToExplore) > 0:
-            nextSpace = spacesToExplore.pop(0)
-            exploredSpaces.append(nextSpace)
-            if nextSpace in self.board.myshots:
-                if self.board.myshots[nextSpace] == Result.HIT:
-                    # add to ship group and queue all unexplored neighboring spaces
-                    self.shipGroup.append(nextSpace)
-                    neighbors = self.board.getNeighbors(nextSpace)
-                    for nb in neighbors:
-                        if (nb not in spacesToExplore) & (nb not in exploredSpaces):
-                            spacesToExplore.append(nb)
-            else:
-                # this space hasn't been fired on, so add it to the borders of the ship group to be explored
-                self.shipGroupBorders.append(nextSpace)'''
+        toAdd = [pos]
+        while len(toAdd) > 0:
+            space = toAdd.pop()
+            if space in self.shipGroup: continue
+            self.shipGroup.add(space)
+            for nb in self.board.getNeighbors(space):
+                if nb in self.board.myshots:
+                    if (self.board.myshots[nb] != Result.MISS) & (nb not in self.shipGroup):
+                        toAdd.append(nb)
+                elif nb not in self.queuedBorders:
+                    self.queuedBorders.add(nb)
+                    self.shipGroupBorders.append(nb)
 
 class AdvancedCPU(CPU):
     """
-    Smarter than Intermediate
-    Setup: TBD
-    Moves: Has access to all modes. RANDOM mode is semi-random and attempts to maximize board coverage.
+    Smarter than Intermediate.
+    Setup: Same as IntermediateCPU.
+    Moves: Keeps a probability density ("heat map") of every placement of each remaining enemy ship that is consistent with its shots, and fires at the densest unshot cell.
+    While there are hits on ships that haven't been sunk, only placements through those hits are counted, so damaged ships get finished off first.
+
+    Placements are stored as bitsets over the shared placement tables (see placements.py).
+    Every miss or sunk cell removes the placements covering it from the valid placements, and the density of a cell is just popcount(valid & coverage).
+
+    The densest cells of every state are kept in a StateCache shared by all AdvancedCPUs in the process, keyed by the board's shot hash, the remaining fleet
+    and the unsunk hits (which together determine the valid placements), so states that come up again, like the opening moves of every game, aren't recounted.
+    Common opening states are also looked up in the opening book (see openingbook.py), if there is one for the board's config, so they're never counted at all.
     """
+    # caches of the densest cells of states seen so far, shared by every AdvancedCPU playing with the same config
+    # format - GameConfig => StateCache of (shotHash:int, fleet:tuple, hitmask:int) => tuple of cells
+    stateCaches = {}
+
+    def __init__(self, slow:bool):
+        super().__init__(slow)
+        self.fleet = None # lengths of enemy ships that haven't been sunk yet
+
     def setup(self):
-        raise NotImplementedError()
-    
+        IntermediateCPU.setup(self)
+
+    def initTargeting(self):
+        """Set up the placement bitsets for the current board."""
+        b = self.board
+        if b.config.cells > MAX_TABLE_CELLS:
+            raise ValueError(f"AdvancedCPU can't count placements on a {b.config.width}x{b.config.height} board")
+        self.width = b.config.width
+        self.height = b.config.height
+        self.fleet = [length for length, name in b.config.fleet]
+        self.shipLengths = b.config.shipLengths()
+        self.tables = dict((length, boardTable(b, length)) for length in set(self.fleet))
+        # bytes per cell when densities are packed into one int (see placements.packCells); a cell is covered by at most 2*length placements of a ship
+        self.fieldBytes = next(n for n in (1, 2, 4) if sum(2 * length for length in self.fleet) < 1 << (8 * n))
+        self.valid = dict((length, table.all) for length, table in self.tables.items()) # length => bitset of placements not ruled out by misses or sunk ships
+        self.shotmask = 0 # every cell fired upon
+        self.hitmask = 0 # hits on ships that haven't been sunk yet
+        if b.config not in AdvancedCPU.stateCaches: AdvancedCPU.stateCaches[b.config] = StateCache()
+        self.cache = AdvancedCPU.stateCaches[b.config]
+        import openingbook # only loaded when needed, it pulls in json and mmap
+        book = openingbook.load()
+        self.book = book if (book is not None) and (book.config == b.config) else None # only holds states where no ship has been sunk yet
+
+    def sendMoveResult(self, move:tuple, result:Result, shipName:str=None):
+        super().sendMoveResult(move, result, shipName)
+        if self.fleet is None: self.initTargeting()
+        cell = self.board.cellIndex(move)
+        self.shotmask |= 1 << cell
+        if result == Result.MISS:
+            self.block(cell)
+            return
+        self.hitmask |= 1 << cell
+        if result == Result.SUNK:
+            self.sink(cell, self.shipLengths.get(shipName))
+
+    def block(self, cell:int):
+        """Rule out every placement that covers cell."""
+        for length in self.valid:
+            self.valid[length] &= ~self.tables[length].coverage[cell]
+
+    def sink(self, cell:int, length:int):
+        """
+        Mark the ship sunk by a shot at cell as sunk, removing it from the remaining fleet and its cells from the unsunk hits.
+
+        :param cell: cell of the shot that sank the ship
+        :param length: length of the sunk ship, or None if unknown (the longest remaining ship that fits is assumed)
+        """
+        lengths = [length] if length in self.fleet else sorted(set(self.fleet), reverse=True)
+        for l in lengths:
+            candidates = self.valid[l] & self.tables[l].coverage[cell]
+            while candidates:
+                low = candidates & -candidates
+                candidates ^= low
+                mask = self.tables[l].masks[low.bit_length()-1]
+                if mask & ~self.hitmask == 0:
+                    self.fleet.remove(l)
+                    self.hitmask &= ~mask
+                    while mask:
+                        low = mask & -mask
+                        mask ^= low
+                        self.block(low.bit_length()-1)
+                    return
+        # no placement of the sunk ship fits the hits, so just drop a ship of that length from the fleet
+        if length in self.fleet: self.fleet.remove(length)
+
     def getMove(self):
-        raise NotImplementedError()
-    
-    def randomMove(self):
-        pass
-    
-    def singleShipMove(self):
-        """Return a move with the goal of sinking a single identified ship."""
-        if self.lastresult == Result.SUNK: # sunk the ship, so leave targeting mode and start making random guesses
-            self.targetingMode = Mode.RANDOM
-            self.targetingDirection = None
+        if self.fleet is None: self.initTargeting()
+
+        best = None
+        if (self.book is not None) and (len(self.fleet) == len(self.board.config.fleet)): best = self.book.lookup(self.board.shotHash)
+        if best is None:
+            key = (self.board.shotHash, tuple(sorted(self.fleet)), self.hitmask)
+            best = self.cache.get(key)
+            if best is None:
+                best = self.densestCells()
+                self.cache.put(key, best)
+        cell = random.choice(best) if best else None
+        if (cell is None) or (self.shotmask >> cell & 1): # nothing fits (e.g. unknown ship names), or a hash collision
+            return self.board.getUnshotPool().pick()
+        return self.board.cellPos(cell)
+
+    def densestCells(self):
+        """Return a tuple of the unshot cells with the highest density, or an empty tuple if no remaining placement fits."""
+        counts = {} # length => number of remaining ships with that length
+        for length in self.fleet:
+            counts[length] = counts.get(length, 0) + 1
+
+        # in target mode, only count placements through unsunk hits
+        candidates = {}
+        if self.hitmask:
+            for length in counts:
+                candidates[length] = self.valid[length] & self.tables[length].covering(self.hitmask)
+        if not any(candidates.values()):
+            candidates = dict((length, self.valid[length]) for length in counts)
+
+        # densities of every cell at once, packed one field per cell, with the shot cells zeroed
+        cells = self.width * self.height
+        density = 0
+        for length, n in counts.items():
+            density += n * self.tables[length].cellCounts(candidates[length], self.fieldBytes)
+        density &= packCells(~self.shotmask, cells, self.fieldBytes) * ((1 << (8 * self.fieldBytes)) - 1)
+
+        densities = unpackCells(density, cells, self.fieldBytes)
+        bestDensity = max(densities)
+        if bestDensity == 0: return ()
+        best = [densities.index(bestDensity)]
+        for _ in range(densities.count(bestDensity) - 1):
+            best.append(densities.index(bestDensity, best[-1] + 1))
+        return tuple(best)
+
+class MonteCarloCPU(CPU):
+    """
+    Sampling alternative to AdvancedCPU that doesn't need placement tables, so it also plays on boards too big to count placements on.
+    Setup: Same as IntermediateCPU.
+    Moves: Keeps a population of "particles", each a full placement of the enemy ships that haven't been sunk yet that is consistent with every shot so far
+    (no ship on a miss or a sunk ship, every unsunk hit covered), and fires at the unshot cell covered by the most particles.
+
+    After each shot the particles that contradict it are dropped and the population is topped back up, mostly by moving one ship of a surviving particle
+    (or copying it, if that fails), so earlier work carries over from move to move. Fresh particles are only built when none survive.
+    Hit counts per cell are kept up to date as particles come and go, so choosing a move doesn't rescan the population.
+
+    A placement is stored as (cell of its top left space, step), where step is 1 for horizontal ships and the board width for vertical ones.
+    A particle is stored as (list of placements aligned with fleet, set of the cells they cover), so checking a cell against a particle takes O(1)
+    and checking a placement against it takes O(length), however large the fleet is.
+    """
+    MAX_TRIES = 20 # attempts at placing one ship before giving up on it
+
+    def __init__(self, slow:bool, particles:int=500, budget:float=0.05):
+        """
+        :param particles: size of the population to keep
+        :param budget: seconds to spend on each shot's result, filtering and topping the population back up (checked while building each particle, too)
+        """
+        super().__init__(slow)
+        self.particleCount = particles
+        self.budget = budget
+        self.fleet = None # (length, name) of enemy ships that haven't been sunk yet
+
+    def fresh(self):
+        return type(self)(self.slow, self.particleCount, self.budget)
+
+    def setup(self):
+        IntermediateCPU.setup(self)
+
+    def initTargeting(self):
+        self.width = self.board.config.width
+        self.height = self.board.config.height
+        self.fleet = list(self.board.config.fleet)
+        self.shot = set() # every cell fired upon
+        self.blocked = set() # misses and cells of sunk ships, which no remaining ship can cover
+        self.hits = set() # hits on ships that haven't been sunk yet
+        self.particles = [] # (placements, cells) of each particle
+        # number of placements over all particles that cover each cell
+        # format - cell:int => count:int
+        self.counts = {}
+
+    ### PLACEMENTS ###
+    def cells(self, placement, length:int):
+        return range(placement[0], placement[0] + placement[1] * length, placement[1])
+
+    def covers(self, placement, length:int, cell:int):
+        offset = cell - placement[0]
+        return (offset >= 0) and (offset % placement[1] == 0) and (offset // placement[1] < length)
+
+    def randomPlacement(self, length:int, through:int=None):
+        """Return a random in-bounds placement of a ship of length, through the cell through if given."""
+        vertical = random.getrandbits(1) if (length <= self.width) & (length <= self.height) else int(length > self.width)
+        if through is None:
+            x = random.randrange(self.width - (0 if vertical else length - 1))
+            y = random.randrange(self.height - (length - 1 if vertical else 0))
+        else:
+            x, y = through % self.width, through // self.width
+            i = random.randrange(length)
+            if vertical: y -= i
+            else: x -= i
+            if (x < 0) | (y < 0) | (x + (0 if vertical else length - 1) >= self.width) | (y + (length - 1 if vertical else 0) >= self.height): return None
+        return (y * self.width + x, self.width if vertical else 1)
+
+    def fits(self, placement, length:int, taken:set):
+        """Return True if placement doesn't cover a blocked cell or a cell in taken (the cells of the other ships of its particle)."""
+        for cell in self.cells(placement, length):
+            if (cell in self.blocked) or (cell in taken): return False
+        return True
+
+    ### POPULATION ###
+    def addParticle(self, particle:tuple):
+        self.particles.append(particle)
+        for cell in particle[1]:
+            self.counts[cell] = self.counts.get(cell, 0) + 1
+
+    def removeParticle(self, particle:tuple):
+        for cell in particle[1]:
+            self.counts[cell] -= 1
+
+    def freshParticle(self, deadline:float):
+        """Build a particle from scratch, covering the unsunk hits first. Return None if it didn't work out or the deadline (a perf_counter time) passed."""
+        ships = [None] * len(self.fleet)
+        order = list(range(len(ships)))
+        random.shuffle(order)
+        taken = set() # cells of the ships placed so far
+        for hit in self.hits:
+            if hit in taken: continue
+            placed = False
+            for i in [i for i in order if ships[i] is None]:
+                if time.perf_counter() > deadline: return None
+                length = self.fleet[i][0]
+                for _ in range(self.MAX_TRIES):
+                    p = self.randomPlacement(length, hit)
+                    if (p is not None) and self.fits(p, length, taken):
+                        ships[i] = p
+                        taken.update(self.cells(p, length))
+                        placed = True
+                        break
+                if placed: break
+            if not placed: return None
+        for i in order:
+            if ships[i] is not None: continue
+            if time.perf_counter() > deadline: return None
+            length = self.fleet[i][0]
+            for _ in range(self.MAX_TRIES):
+                p = self.randomPlacement(length)
+                if self.fits(p, length, taken):
+                    ships[i] = p
+                    taken.update(self.cells(p, length))
+                    break
+            if ships[i] is None: return None
+        return (ships, taken)
+
+    def movedParticle(self, particle:tuple, deadline:float):
+        """Return a copy of particle with one ship moved to another legal spot, an unchanged copy if no move was found, or None if the deadline passed."""
+        ships, cells = particle
+        i = random.randrange(len(ships))
+        length = self.fleet[i][0]
+        taken = cells.difference(self.cells(ships[i], length)) # cells of the other ships
+        needed = [hit for hit in self.hits if hit not in taken] # hits the moved ship has to cover
+        for _ in range(self.MAX_TRIES):
+            if time.perf_counter() > deadline: return None
+            p = self.randomPlacement(length, needed[0] if needed else None)
+            if (p is None) or not self.fits(p, length, taken): continue
+            if all(self.covers(p, length, hit) for hit in needed):
+                ships = list(ships)
+                ships[i] = p
+                taken.update(self.cells(p, length))
+                return (ships, taken)
+        return (list(ships), set(cells))
+
+    def refill(self, deadline:float=None):
+        """Top the population back up to the particle count, or until deadline (a perf_counter time, by default the time budget from now)."""
+        if not self.fleet: return
+        if deadline is None: deadline = time.perf_counter() + self.budget
+        survivors = len(self.particles)
+        while (len(self.particles) < self.particleCount) and (time.perf_counter() <= deadline):
+            particle = self.movedParticle(self.particles[random.randrange(survivors)], deadline) if survivors else self.freshParticle(deadline)
+            if particle is not None: self.addParticle(particle)
+
+    def filter(self, keep):
+        """Drop every particle for which keep(cells it covers) is false."""
+        kept = []
+        for particle in self.particles:
+            if keep(particle[1]): kept.append(particle)
+            else: self.removeParticle(particle)
+        self.particles = kept
+
+    ### TURNS ###
+    def sendMoveResult(self, move:tuple, result:Result, shipName:str=None):
+        deadline = time.perf_counter() + self.budget
+        super().sendMoveResult(move, result, shipName)
+        if self.fleet is None: self.initTargeting()
+        cell = self.board.cellIndex(move)
+        self.shot.add(cell)
+        if result == Result.MISS:
+            self.blocked.add(cell)
+            self.filter(lambda cells: cell not in cells)
         else:
-            d = self.targetingDirection
-            nextMove = (self.lastmove[0] + d[0], self.lastmove[1] + d[1])
-            if (nextMove in self.board.myshots) | (self.lastresult == Result.MISS): # went off the edge, so come back the other direction
-                d = self.targetingDirection = (-d[0], -d[1]) # update both attribute and abbreviated copy
-                nextMove = (self.lastmove[0] + d[0], self.lastmove[1] + d[1])
-                while nextMove not in self.board.myshots:
-                    if self.board.myshots[nextMove] != Result.HIT: # went off the edge in both directions, so AI is being fooled by multiple ships right next to each other
-                        # change mode and make shipgroup move instead
-                        self.setShipGroup()
-                        return self.shipGroupMove()
-                    nextMove = (nextMove[0] + d[0], nextMove[1] + d[1])
-            # regardless of if condition is true, we now have the correct value of nextMove
-            return nextMove
\ No newline at end of file
+            self.hits.add(cell)
+            if result == Result.SUNK: self.sink(cell, shipName)
+            else: self.filter(lambda cells: cell in cells)
+        self.refill(deadline)
+
+    def sink(self, cell:int, shipName:str):
+        """Take the ship sunk by a shot at cell out of the fleet and of every particle, and block its cells."""
+        names = [name for length, name in self.fleet]
+        candidates = [names.index(shipName)] if shipName in names else range(len(self.fleet))
+        votes = {} # (ship index, placement) => number of particles that have that ship there
+        fallback = None
+        for k in candidates:
+            length = self.fleet[k][0]
+            for step in (1, self.width):
+                for i in range(length):
+                    p = (cell - i * step, step)
+                    if (step == 1) and ((p[0] < 0) or (p[0] // self.width != cell // self.width) or (p[0] % self.width + length > self.width)): continue
+                    if (step != 1) and ((p[0] < 0) or (p[0] + step * (length - 1) >= self.width * self.height)): continue
+                    if all(c in self.hits for c in self.cells(p, length)):
+                        votes[(k, p)] = 0
+                        if fallback is None: fallback = (k, p)
+        if fallback is None:
+            # no line of hits fits the sunk ship, so just drop it (or the longest remaining ship) from the fleet
+            k = candidates[0] if shipName in names else max(range(len(self.fleet)), key=lambda k: self.fleet[k][0])
+            self.removeShip(k, ())
+            return
+        for ships, cells in self.particles:
+            for k in candidates:
+                if (k, ships[k]) in votes: votes[(k, ships[k])] += 1
+        k, p = max(votes, key=lambda kp: (votes[kp], kp == fallback))
+        self.removeShip(k, self.cells(p, self.fleet[k][0]))
+
+    def removeShip(self, k:int, cells):
+        """Remove ship k from the fleet and every particle, and mark cells as sunk."""
+        for particle in self.particles:
+            self.removeParticle(particle)
+        particles = self.particles
+        self.particles = []
+        length = self.fleet[k][0]
+        del self.fleet[k]
+        cells = list(cells)
+        for c in cells:
+            self.hits.discard(c)
+            self.blocked.add(c)
+        for ships, taken in particles:
+            taken.difference_update(self.cells(ships[k], length))
+            del ships[k]
+            if taken.isdisjoint(cells) and (self.hits <= taken): self.addParticle((ships, taken)) # still legal, and still covers every unsunk hit
+
+    def getMove(self):
+        if self.fleet is None: self.initTargeting()
+        if not self.particles: self.refill()
+        best = []
+        bestCount = 0
+        for cell, count in self.counts.items():
+            if (count < bestCount) or (cell in self.shot): continue
+            if count > bestCount:
+                best = [cell]
+                bestCount = count
+            else:
+                best.append(cell)
+        if bestCount == 0: # no particles, so fire next to a hit if there is one, or anywhere
+            for hit in self.hits:
+                for nb in self.board.getNeighbors(self.board.cellPos(hit)):
+                    if nb not in self.board.myshots: return nb
+            return self.board.getUnshotPool().pick()
+        return self.board.cellPos(random.choice(best))
@@ -1,15 +1,14 @@
-"""
-BUGS:
-    - clicking during opponent's turn "buffers" a click (may be unfixable, but could maybe use threading)
-FEATURES TO ADD:
-    - implement advanced CPU
-    - implement multiplayer
-"""
+# This file contains the GUI, a layer on top of the core game logic (see core.py).
 
+import time
+import random
 import tkinter as tk
-import copy
+import tkinter.messagebox
+from concurrent.futures import ThreadPoolExecutor
 
-from player import * # includes Player, CPU, Board, Ship, etc
+from core import * # Player, CPUs, Board, Ship, etc
+from remoteplayer import RemotePlayer
+import network
 
 # UI CONSTANTS
 BG_COLOR = "lightblue"
@@ -26,14 +25,14 @@ class TitleScreen(tk.Frame):
 
         self.label = tk.Label(self, text="Battleship", font=UI_FONT, background=BG_COLOR)
         self.localbutton = tk.Button(self, command=self.local_game, text="Play VS Computer", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
-        #self.hostbutton = tk.Button(self, command=self.host_screen, text="Host Game", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
-        #self.joinbutton = tk.Button(self, command=self.join_screen, text="Join Game", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
+        self.hostbutton = tk.Button(self, command=self.host_screen, text="Host Game", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
+        self.joinbutton = tk.Button(self, command=self.join_screen, text="Join Game", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
         self.exitbutton = tk.Button(self, command=self.master.destroy, text="Quit", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
 
         self.label.pack(pady=PAD)
         self.localbutton.pack(pady=PAD)
-        #self.hostbutton.pack(pady=PAD)
-        #self.joinbutton.pack(pady=PAD)
+        self.hostbutton.pack(pady=PAD)
+        self.joinbutton.pack(pady=PAD)
         self.exitbutton.pack(pady=PAD)
     
     def local_game(self):
@@ -50,7 +49,7 @@ class CPUPregameScreen(tk.Frame):
         super().__init__(background=BG_COLOR)
         self.master = master
 
-        self.difficulty_options = ["Easy", "Medium"] # TODO: add Hard option once implemented
+        self.difficulty_options = ["Easy", "Medium", "Hard"]
         self.d_selection = tk.StringVar()
         self.speed_options = ["Slow", "Fast"]
         self.s_selection = tk.StringVar()
@@ -86,7 +85,7 @@ class CPUPregameScreen(tk.Frame):
         else: errormsg += "Please select a difficulty value.\n"
 
         if errormsg == "": # no errors
-            self.master.display(GameScreen(self.master, ComputerPlayer(cpu)))
+            self.master.newGame(ComputerPlayer(cpu))
         else:
             if hasattr(self, 'errorlabel'):
                 self.errorlabel.configure(text=errormsg)
@@ -97,76 +96,272 @@ class CPUPregameScreen(tk.Frame):
     def back(self):
         self.master.display(TitleScreen(self.master))
 
+def parseAddress(address:str):
+    """Split "host:port" (the port is optional) into (host, port)."""
+    host, sep, port = address.strip().rpartition(":")
+    if sep == "": return address.strip(), network.DEFAULT_PORT
+    return host, int(port)
+
 class HostScreen(tk.Frame):
     def __init__(self, master):
         super().__init__(background=BG_COLOR)
         self.master = master
 
         self.label = tk.Label(self, text="Host a Game...", font=UI_FONT, background = BG_COLOR)
+        self.serverlabel = tk.Label(self, text="Server: ", background = BG_COLOR)
+        self.server = tk.Entry(self, bg="white", fg="black")
+        self.server.insert(0, f"127.0.0.1:{network.DEFAULT_PORT}")
         self.lobbynamelabel = tk.Label(self, text="Lobby Name: ", background = BG_COLOR)
-        self.lobbyname = tk.Text(self, height=3, bg="white", fg="black")
+        self.lobbyname = tk.Entry(self, bg="white", fg="black")
         self.displaynamelabel = tk.Label(self, text="Display Name: ", background = BG_COLOR)
-        self.displayname = tk.Text(self, height=3, bg="white", fg="black")
+        self.displayname = tk.Entry(self, bg="white", fg="black")
         self.startbutton = tk.Button(self, command=self.createLobby, text="Start Lobby", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
         self.backbutton = tk.Button(self, command=self.back, text="Back", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
+        self.errorlabel = tk.Label(self, text="", background = BG_COLOR, foreground="red")
 
-        self.label.grid(row=1, column=1, columnspan=2)
-        self.lobbynamelabel.grid(row=2, column=1)
-        self.lobbyname.grid(row=2, column=2)
-        self.displaynamelabel.grid(row=3, column=1)
-        self.displayname.grid(row=3, column=2)
-        self.startbutton.grid(row=4, column=1, columnspan=2)
-        self.backbutton.grid(row=5, column=1, columnspan=2)
+        self.label.grid(row=1, column=1, columnspan=2, pady=PAD)
+        self.serverlabel.grid(row=2, column=1, pady=PAD)
+        self.server.grid(row=2, column=2, pady=PAD)
+        self.lobbynamelabel.grid(row=3, column=1, pady=PAD)
+        self.lobbyname.grid(row=3, column=2, pady=PAD)
+        self.displaynamelabel.grid(row=4, column=1, pady=PAD)
+        self.displayname.grid(row=4, column=2, pady=PAD)
+        self.errorlabel.grid(row=5, column=1, columnspan=2)
+        self.startbutton.grid(row=6, column=1, columnspan=2, pady=PAD)
+        self.backbutton.grid(row=7, column=1, columnspan=2, pady=PAD)
     
     def createLobby(self):
-        self.master.display(LobbyScreen(self.master))
+        try:
+            opponent = RemotePlayer(*parseAddress(self.server.get()))
+        except (OSError, ValueError) as e:
+            self.errorlabel.configure(text=f"Couldn't connect to the server: {e}")
+            return
+        try:
+            opponent.host(self.lobbyname.get().strip(), self.displayname.get().strip())
+        except ConnectionError as e:
+            opponent.close()
+            self.errorlabel.configure(text=str(e))
+            return
+        self.master.display(LobbyScreen(self.master, opponent, self.lobbyname.get().strip()))
     
     def back(self):
         self.master.display(TitleScreen(self.master))
 
-# TODO: implement
 class LobbyScreen(tk.Frame):
-    def __init__(self, master):
-        super().__init__()
+    """Waits for someone to join a hosted lobby, then starts the game."""
+    POLL_MS = 200
+
+    def __init__(self, master, opponent:RemotePlayer, lobbyName:str):
+        super().__init__(background=BG_COLOR)
         self.master = master
-        raise NotImplementedError("Lobby screen is not implemented yet")
+        self.opponent = opponent
+
+        self.label = tk.Label(self, text=f"Lobby \"{lobbyName}\"", font=UI_FONT, background = BG_COLOR)
+        self.waitlabel = tk.Label(self, text="Waiting for an opponent to join...", background = BG_COLOR)
+        self.cancelbutton = tk.Button(self, command=self.cancel, text="Cancel", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
+
+        self.label.pack(pady=PAD)
+        self.waitlabel.pack(pady=PAD)
+        self.cancelbutton.pack(pady=PAD)
+
+        self.after(self.POLL_MS, self.checkForOpponent)
+
+    def checkForOpponent(self):
+        try:
+            joined = self.opponent.hasOpponent()
+        except ConnectionError as e:
+            self.waitlabel.configure(text=str(e), foreground="red")
+            return
+        if joined: self.master.newGame(self.opponent)
+        else: self.after(self.POLL_MS, self.checkForOpponent)
+
+    def cancel(self):
+        self.opponent.close()
+        self.master.display(TitleScreen(self.master))
 
-# TODO: implement
 class JoinScreen(tk.Frame):
     def __init__(self, master):
-        super().__init__()
+        super().__init__(background=BG_COLOR)
         self.master = master
-        raise NotImplementedError("Join screen is not implemented yet")
+        self.opponent = None # RemotePlayer connected to the server, once the lobbies have been listed
+        self.lobbies = [] # names of the lobbies shown in the list
+
+        self.label = tk.Label(self, text="Join a Game...", font=UI_FONT, background = BG_COLOR)
+        self.serverlabel = tk.Label(self, text="Server: ", background = BG_COLOR)
+        self.server = tk.Entry(self, bg="white", fg="black")
+        self.server.insert(0, f"127.0.0.1:{network.DEFAULT_PORT}")
+        self.displaynamelabel = tk.Label(self, text="Display Name: ", background = BG_COLOR)
+        self.displayname = tk.Entry(self, bg="white", fg="black")
+        self.lobbylist = tk.Listbox(self, height=10, width=50)
+        self.refreshbutton = tk.Button(self, command=self.refresh, text="Find Lobbies", width=BUTTON_WIDTH, height=2)
+        self.joinbutton = tk.Button(self, command=self.join, text="Join Lobby", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
+        self.backbutton = tk.Button(self, command=self.back, text="Back", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
+        self.errorlabel = tk.Label(self, text="", background = BG_COLOR, foreground="red")
+
+        self.label.grid(row=1, column=1, columnspan=2, pady=PAD)
+        self.serverlabel.grid(row=2, column=1, pady=PAD)
+        self.server.grid(row=2, column=2, pady=PAD)
+        self.displaynamelabel.grid(row=3, column=1, pady=PAD)
+        self.displayname.grid(row=3, column=2, pady=PAD)
+        self.refreshbutton.grid(row=4, column=1, columnspan=2, pady=PAD)
+        self.lobbylist.grid(row=5, column=1, columnspan=2, pady=PAD)
+        self.errorlabel.grid(row=6, column=1, columnspan=2)
+        self.joinbutton.grid(row=7, column=1, columnspan=2, pady=PAD)
+        self.backbutton.grid(row=8, column=1, columnspan=2, pady=PAD)
+
+    def refresh(self):
+        """Connect to the server (if not already connected) and list its open lobbies."""
+        try:
+            if self.opponent is None: self.opponent = RemotePlayer(*parseAddress(self.server.get()))
+            lobbies = self.opponent.listLobbies()
+        except (OSError, ValueError) as e: # ConnectionError is an OSError
+            self.disconnect()
+            self.errorlabel.configure(text=f"Couldn't reach the server: {e}")
+            return
+        self.errorlabel.configure(text="")
+        self.lobbies = [name for name, host, config in lobbies]
+        self.lobbylist.delete(0, "end")
+        for name, host, config in lobbies:
+            self.lobbylist.insert("end", f"{name} (hosted by {host}, {config.width}x{config.height})")
+
+    def join(self):
+        selection = self.lobbylist.curselection()
+        if (self.opponent is None) or not selection:
+            self.errorlabel.configure(text="Please select a lobby.")
+            return
+        try:
+            self.opponent.join(self.lobbies[selection[0]], self.displayname.get().strip())
+        except ConnectionError as e:
+            self.errorlabel.configure(text=str(e))
+            return
+        self.master.newGame(self.opponent)
+
+    def disconnect(self):
+        if self.opponent is not None: self.opponent.close()
+        self.opponent = None
+
+    def back(self):
+        self.disconnect()
+        self.master.display(TitleScreen(self.master))
+
+class ShotLayer():
+    """
+    The shot markers of one grid on a GameScreen. Every marker is created up front and hidden, and drawing a shot only reconfigures the marker
+    for its cell, so the number of canvas items stays the same for the whole game.
+    Boards with more than MAX_ITEMS cells get a single transparent image instead, with each shot painted into it as a square.
+    """
+    MAX_ITEMS = 2500
+
+    def __init__(self, canvas:tk.Canvas, x:int, y:int, space:int, config):
+        """
+        :param x: x location of NW corner of grid
+        :param y: y location of NW corner of grid
+        :param space: width/height of one space in px
+        """
+        self.canvas = canvas
+        self.space = space
+        self.width = config.width
+        self.items = None # oval for each cell, indexed by cell
+        self.image = None
+        if config.cells <= self.MAX_ITEMS:
+            self.items = []
+            for row in range(config.height):
+                for col in range(config.width):
+                    left = x + space * col
+                    top = y + space * row
+                    self.items.append(canvas.create_oval(left, top, left+space, top+space, width=0, state="hidden", tags="shots"))
+        else:
+            self.image = tk.PhotoImage(width=space * config.width, height=space * config.height)
+            canvas.create_image(x, y, image=self.image, anchor="nw", tags="shots")
+
+    def set(self, pos, color:str):
+        """Show a marker of color at position pos (in board coordinates)."""
+        if self.items is not None:
+            self.canvas.itemconfigure(self.items[(pos[1] - 1) * self.width + (pos[0] - 1)], fill=color, state="normal")
+        else:
+            left = self.space * (pos[0] - 1)
+            top = self.space * (pos[1] - 1)
+            self.image.put(color, to=(left, top, left+self.space, top+self.space))
+
+    def clear(self):
+        """Hide every marker."""
+        if self.items is not None:
+            for item in self.items:
+                self.canvas.itemconfigure(item, state="hidden")
+        else:
+            self.image.blank()
 
 class GameScreen(tk.Canvas):
-    """Container representing the main interactive area (primary grid and targeting grid)"""
+    """
+    Container representing the main interactive area (primary grid and targeting grid)
+
+    Anything that waits on the opponent (their setup, their moves, and the results of our moves) runs on a worker thread,
+    and the Tk thread polls for the result with after(), so the window stays responsive while the opponent thinks.
+    """
+    POLL_MS = 15 # how often to check on work running on the worker thread
+
     def __init__(self, master, opponent):
+        """
+        Build the screen and start a game against opponent.
+        The background depends only on the config, so Game keeps the screen around and calls reset() to start later games with the same config.
+        """
         super().__init__(master, width=800, height=800, bd=0, highlightthickness=0, relief='ridge')
         self.master = master
-        self.board = Board() # local player's board
-        self.opponent:Player = opponent
-        self.myturn:bool = True # true if local player's turn, false otherwise
-        self.game_phase:str = "Setup"
+        self.config = opponent.board.config # both players use the opponent's board size and fleet
+        self.worker = ThreadPoolExecutor(max_workers=1) # runs the opponent's (possibly slow) calls
+        self.generation:int = 0 # incremented whenever a game is stopped, so work queued for an old game is dropped
 
-        # create PhotoImages
-        self.ocean = tk.PhotoImage(file="assets/ocean.png")
-        self.radar = tk.PhotoImage(file="assets/radar.png")
+        # shared PhotoImages
+        self.ocean = master.image("ocean")
+        self.radar = master.image("radar")
 
         # primary board constants
         self.PBOARD_X = 250
         self.PBOARD_Y = 450
-        self.PBOARD_SPACE = 30 #width/height of one space
+        self.PBOARD_SPACE = max(1, 300 // max(self.config.width, self.config.height)) #width/height of one space
         # targeting board constants
         self.TBOARD_X = 250
         self.TBOARD_Y = 50
-        self.TBOARD_SPACE = 30 #width/height of one space
+        self.TBOARD_SPACE = self.PBOARD_SPACE #width/height of one space
+        # ship graveyard constants, scaled down to fit large fleets
+        self.GRAVEYARD_PAD_Y = min(50, 300 // len(self.config.fleet)) # distance between ships
+        self.GRAVEYARD_SPACE = max(1, min(30, 150 // max(length for length, name in self.config.fleet), self.GRAVEYARD_PAD_Y * 3 // 5)) #width/height of one space
 
         self.drawBackground()
-
-        self.master.bind("<Key>", self.onKeyPress)
         self.bind("<Button-1>", self.onClick)
 
+        self.reset(opponent)
+
+    def reset(self, opponent):
+        """Start a new game against opponent (whose config must match this screen's), clearing everything but the background."""
+        self.generation += 1
+        self.opponent:Player = opponent
+        self.board = Board(config=self.config) # local player's board
+        self.myturn:bool = True # true if local player's turn, false otherwise
+        self.game_phase:str = "Setup" # "Setup", "Waiting" (for the opponent to finish setting up) or "Main"
+        self.busy:bool = False # true while waiting on the worker thread; input is ignored until it's done
+        self.recorder = None # record.GameWriter for this game, if it's being recorded
+        self.pendingResult = None # (move, result, sunk ship name) of the opponent's last move, sent to them along with the request for their next one
+
+        self.delete("dynamic")
+        self.targetShots.clear()
+        self.primaryShots.clear()
+        for line in self.sunkLines.values():
+            self.itemconfigure(line, state="hidden")
+        self.sidebar.reset()
+        if isinstance(self.opponent, RemotePlayer):
+            self.sidebar.changeLabel("lobbyinfo", "Game Type: Online")
+            self.sidebar.changeLabel("opponentinfo", f"Opponent: {self.opponent.name}")
+
+        self.master.bind("<Key>", self.onKeyPress)
         self.initializeSetupPhase()
+
+    def stop(self):
+        """End the current game (when the screen is hidden): drop pending work, stop listening for keys and let go of the opponent."""
+        self.generation += 1
+        self.busy = False
+        self.master.unbind("<Key>")
+        self.opponent.close()
     
     ### DRAWING FUNCTIONS ###
     def drawBackground(self):
@@ -197,32 +392,65 @@ class GameScreen(tk.Canvas):
         self.create_line(550, 750, 250, 750, fill="green", width=1)
         self.create_line(250, 750, 250, 450, fill="green", width=1)
 
+        # shot markers
+        self.targetShots = ShotLayer(self, self.TBOARD_X, self.TBOARD_Y, self.TBOARD_SPACE, self.config)
+        self.primaryShots = ShotLayer(self, self.PBOARD_X, self.PBOARD_Y, self.PBOARD_SPACE, self.config)
+
         # ship graveyard constants
         PAD_X = 25
-        PAD_Y = 50
+        SUNK_PAD_X = 10 # how far strikethroughs stick out past the ships
 
         # enemy ships
         self.create_text(700, 25, anchor="center", text="Enemy Ships", fill="black", font=GAME_FONT)
-        self.drawShip(600+PAD_X, 50, 5)
-        self.drawShip(600+PAD_X, 50+PAD_Y, 4)
-        self.drawShip(600+PAD_X, 50+2*PAD_Y, 3)
-        self.drawShip(600+PAD_X, 50+3*PAD_Y, 3)
-        self.drawShip(600+PAD_X, 50+4*PAD_Y, 2)
+        for i, (length, name) in enumerate(self.config.fleet):
+            self.drawShip(600+PAD_X, 50+i*self.GRAVEYARD_PAD_Y, length, size=self.GRAVEYARD_SPACE)
 
         # friendly ships
         self.create_text(700, 425, anchor="center", text="Your Ships", fill="black", font=GAME_FONT)
-        self.drawShip(600+PAD_X, 450, 5)
-        self.drawShip(600+PAD_X, 450+PAD_Y, 4)
-        self.drawShip(600+PAD_X, 450+2*PAD_Y, 3)
-        self.drawShip(600+PAD_X, 450+3*PAD_Y, 3)
-        self.drawShip(600+PAD_X, 450+4*PAD_Y, 2)
+        for i, (length, name) in enumerate(self.config.fleet):
+            self.drawShip(600+PAD_X, 450+i*self.GRAVEYARD_PAD_Y, length, size=self.GRAVEYARD_SPACE)
+
+        # strikethroughs for sunk ships, hidden until drawSunk shows them
+        # format - (opponent:bool, ship name) => line
+        self.sunkLines = {}
+        for opponent, top in ((True, 50), (False, 450)):
+            for i, (length, name) in enumerate(self.config.fleet):
+                y = top + i * self.GRAVEYARD_PAD_Y + self.GRAVEYARD_SPACE // 2
+                self.sunkLines[(opponent, name)] = self.create_line(600+PAD_X-SUNK_PAD_X, y, 600+PAD_X+length*self.GRAVEYARD_SPACE+SUNK_PAD_X, y,
+                                                                    fill="red", width=3, state="hidden")
 
         self.sidebar = self.InfoSidebar(self)
         self.create_window(0, 0, width=200, height=800, anchor="nw", window=self.sidebar)
     
-    def drawShip(self, x, y, length, vertical=False, color="gray", tags=None):
+    @staticmethod
+    def shipCoords(x, y, length, vertical=False, size=30):
+        """
+        Return the coordinates of the shapes that make up a ship drawn by drawShip, in the order drawShip creates them:
+        the colored backdrop, the four border lines, then the lines between squares.
         """
-        drawShip draws a ship consisting of 30px by 30px squares
+        if not vertical:
+            rv = [
+                (x, y, x+size*length, y+size), # colored backdrop
+                (x, y, x+size*length, y), # border lines
+                (x, y+size, x+size*length, y+size),
+                (x, y, x, y+size),
+                (x+size*length, y, x+size*length, y+size),
+            ]
+            rv.extend((x + size*i, y, x + size*i, y+size) for i in range(1, length)) # inside lines
+        else:
+            rv = [
+                (x, y, x+size, y+size*length), # colored backdrop
+                (x, y, x, y+size*length), # border lines
+                (x+size, y, x+size, y+size*length),
+                (x, y, x+size, y),
+                (x, y+size*length, x+size, y+size*length),
+            ]
+            rv.extend((x, y + size*i, x+size, y + size*i) for i in range(1, length)) # inside lines
+        return rv
+
+    def drawShip(self, x, y, length, vertical=False, color="gray", tags=None, size=30):
+        """
+        drawShip draws a ship consisting of size by size squares
 
         :param x: x location of NW corner of ship 
         :param y: y location of NW corner of ship
@@ -230,69 +458,49 @@ class GameScreen(tk.Canvas):
         :param vertical: draw ship vertically if true, horizontally if false
         :param color: color of ship
         :param tags: tags to be included in all shapes used to draw the ship
+        :param size: width/height of one square in px
         """
-
-        if not vertical:
-            # colored backdrop
-            self.create_rectangle(x, y, x+30*length, y+30, fill=color, tags=tags)
-
-            # border lines
-            self.create_line(x, y, x+30*length, y, width=2, tags=tags)
-            self.create_line(x, y+30, x+30*length, y+30, width=2, tags=tags)
-            self.create_line(x, y, x, y+30, width=2, tags=tags)
-            self.create_line(x+30*length, y, x+30*length, y+30, width=2, tags=tags)
-
-            # inside lines
-            for i in range(1, length):
-                newX = x + 30 * i
-                self.create_line(newX, y, newX, y+30, width=1, tags=tags)
-        else:
-            # colored backdrop
-            self.create_rectangle(x, y, x+30, y+30*length, fill=color, tags=tags)
-
-            # border lines
-            self.create_line(x, y, x, y+30*length, width=2, tags=tags)
-            self.create_line(x+30, y, x+30, y+30*length, width=2, tags=tags)
-            self.create_line(x, y, x+30, y, width=2, tags=tags)
-            self.create_line(x, y+30*length, x+30, y+30*length, width=2, tags=tags)
-
-            # inside lines
-            for i in range(1, length):
-                newY = y + 30 * i
-                self.create_line(x, newY, x+30, newY, width=1, tags=tags)
+        coords = self.shipCoords(x, y, length, vertical, size)
+        self.create_rectangle(*coords[0], fill=color, tags=tags)
+        for i, line in enumerate(coords[1:]):
+            self.create_line(*line, width=2 if i < 4 else 1, tags=tags)
+
+    def shipObjectCorner(self, ship:Ship):
+        """Return the canvas position of the NW corner of ship on the primary board."""
+        return (self.PBOARD_X + self.PBOARD_SPACE * (ship.spaces[0][0] - 1), self.PBOARD_Y + self.PBOARD_SPACE * (ship.spaces[0][1] - 1))
     
     def drawShipObject(self, ship:Ship, color="gray", tags=None):
         """
-        drawShipObject draws a Ship object on the primary board consisting of 30px by 30px squares
+        drawShipObject draws a Ship object on the primary board, with one square per board space (underneath the shot markers)
 
         :param ship: the Ship object to be drawn
         :param color: color of ship
-        :param tags: tags to be included in all shapes used to draw the ship
+        :param tags: tags to be included in all shapes used to draw the ship (along with "dynamic", so they are cleared by reset)
         """
-        
-        x = self.PBOARD_X + self.PBOARD_SPACE * (ship.spaces[0][0] - 1)
-        y = self.PBOARD_Y + self.PBOARD_SPACE * (ship.spaces[0][1] - 1)
+        x, y = self.shipObjectCorner(ship)
         vertical = ship.direction[0] == 0
-        self.drawShip(x, y, ship.length, vertical, color=color, tags=tags)
+        self.drawShip(x, y, ship.length, vertical, color=color, tags=("dynamic",) if tags is None else (tags, "dynamic"), size=self.PBOARD_SPACE)
+        if tags is not None: self.tag_lower(tags, "shots")
+
+    def reshapeShipObject(self, ship:Ship, tags):
+        """Move the shapes of a ship drawn by drawShipObject (with tags) to where ship is now, without recreating them."""
+        x, y = self.shipObjectCorner(ship)
+        coords = self.shipCoords(x, y, ship.length, ship.direction[0] == 0, self.PBOARD_SPACE)
+        for item, c in zip(self.find_withtag(tags), coords):
+            self.coords(item, *c)
     
     def drawShot(self, opponent:bool, pos, result):
         """
         Draw a shot on the applicable board.
 
         :param opponent: true if shot is by opponent (primary board), false if by player (targeting board)
-        :param pos: tuple(int, int) position of the shot in board coordinates (1-10, 1-10)
+        :param pos: tuple(int, int) position of the shot in board coordinates (1-width, 1-height)
         :param result: result of the shot (will determine color)
         """
         if result == Result.MISS: clr = "white"
         else: clr = "red"
-        if opponent:
-            x = self.PBOARD_X + self.PBOARD_SPACE * (pos[0] - 1)
-            y = self.PBOARD_Y + self.PBOARD_SPACE * (pos[1] - 1)
-            self.create_oval(x, y, x+self.PBOARD_SPACE, y+self.PBOARD_SPACE, fill=clr, width=0)
-        else:
-            x = self.TBOARD_X + self.TBOARD_SPACE * (pos[0] - 1)
-            y = self.TBOARD_Y + self.TBOARD_SPACE * (pos[1] - 1)
-            self.create_oval(x, y, x+self.TBOARD_SPACE, y+self.TBOARD_SPACE, fill=clr, width=0)
+        if opponent: self.primaryShots.set(pos, clr)
+        else: self.targetShots.set(pos, clr)
 
     def drawSunk(self, opponent:bool, shipName):
         """
@@ -301,19 +509,9 @@ class GameScreen(tk.Canvas):
         :param opponent: true if opponent's ship, false if player's
         :param shipName: name of ship to draw strikethrough through
         """
-        x = 625
-        shippad = 10
-        if opponent: y = 65
-        else: y = 465
-        
-        if shipName == "Carrier": length = 5*30; y += 0
-        elif shipName == "Battleship": length = 4*30; y += 50
-        elif shipName == "Destroyer": length = 3*30; y += 100
-        elif shipName == "Submarine": length = 3*30; y += 150
-        elif shipName == "Patrol Boat": length = 2*30; y += 200
-        else: raise ValueError(f"Unknown ship name \"{shipName}\"")
-
-        self.create_line(x-shippad, y, x+length+shippad, y, fill="red", width=3)
+        line = self.sunkLines.get((opponent, shipName))
+        if line is None: raise ValueError(f"Unknown ship name \"{shipName}\"")
+        self.itemconfigure(line, state="normal")
 
     class InfoSidebar(tk.Frame):
         def __init__(self, master):
@@ -321,11 +519,12 @@ class GameScreen(tk.Canvas):
             self.master = master
             self.labels:dict[str, tk.Label] = {}
 
-            self.labels["turninfo"] = tk.Label(self, text="Setup Phase", bg=BG_COLOR, font=GAME_FONT)
-            self.labels["instructions"] = tk.Label(self, text="Place Your Ships\nUse arrow keys to move the ship\nPress Space to rotate\nPress Enter to confirm", bg=BG_COLOR)
+            self.labels["turninfo"] = tk.Label(self, bg=BG_COLOR, font=GAME_FONT)
+            self.labels["instructions"] = tk.Label(self, bg=BG_COLOR)
             self.labels["lobbyinfoheader"] = tk.Label(self, text="Lobby Info:", bg=BG_COLOR, font=GAME_FONT)
-            self.labels["lobbyinfo"] = tk.Label(self, text="Game Type: Local", bg=BG_COLOR)
-            self.labels["opponentinfo"] = tk.Label(self, text="Opponent: CPU", bg=BG_COLOR)
+            self.labels["lobbyinfo"] = tk.Label(self, bg=BG_COLOR)
+            self.labels["opponentinfo"] = tk.Label(self, bg=BG_COLOR)
+            self.reset()
 
             for lb in self.labels.values():
                 lb.pack()
@@ -333,10 +532,16 @@ class GameScreen(tk.Canvas):
             self.quitbutton = tk.Button(self, text="Quit", command=self.quit, width=15, height=2)
             self.quitbutton.pack(side="bottom", pady=20)
         
+        def reset(self):
+            """Put back the text shown at the start of a game."""
+            self.changeLabel("turninfo", "Setup Phase")
+            self.changeLabel("instructions", "Place Your Ships\nUse arrow keys to move the ship\nPress Space to rotate\nPress Enter to confirm")
+            self.changeLabel("lobbyinfo", "Game Type: Local")
+            self.changeLabel("opponentinfo", "Opponent: CPU")
+
         def changeLabel(self, labelname, newTxt):
             """Change the text of label with labelname to display newTxt"""
             self.labels[labelname].configure(text=newTxt)
-            self.labels[labelname].update()
         
         def getLabelText(self, labelname):
             return self.labels[labelname].cget("text")
@@ -346,7 +551,7 @@ class GameScreen(tk.Canvas):
     
     ### SETUP PHASE ###
     def initializeSetupPhase(self):
-        self.shipsToPlace = [Ship((0, 0), 5, (1, 0), "Carrier"), Ship((0, 0), 4, (1, 0), "Battleship"), Ship((0, 0), 3, (1, 0), "Destroyer"), Ship((0, 0), 3, (1, 0), "Submarine"), Ship((0, 0), 2, (1, 0), "Patrol Boat")]
+        self.shipsToPlace = [Ship((0, 0), length, (1, 0), name) for length, name in self.config.fleet]
         self.getNextShip()
     
     def getNextShip(self):
@@ -354,15 +559,8 @@ class GameScreen(tk.Canvas):
         self.nextShip = self.shipsToPlace[0]
         self.shipsToPlace.pop(0)
 
-        #TODO: maybe optimize this?
-        # find an empty space to place the ship in (to start)
-        valid = self.board.isShipValid(self.nextShip)
-        while valid != 0:
-            if valid == 2: # advance horizontally
-                self.nextShip.translate((1, 0))
-            else: # out of bounds, reset horizontal and advance vertically
-                self.nextShip.translate((1-self.nextShip.pos[0], 1))
-            valid = self.board.isShipValid(self.nextShip)
+        # start the ship in the first empty space (row by row, preferring horizontal placements)
+        self.nextShip = firstFit(self.board, self.nextShip.length, self.nextShip.name)
         
         self.drawShipObject(self.nextShip, "lightgray", "shipToPlace")
     
@@ -374,46 +572,83 @@ class GameScreen(tk.Canvas):
         :param transVector: The vector by which to move the ship - [dx, dy]
         """
         # check if translation is valid
-        translated = copy.deepcopy(self.nextShip)
-        translated.translate(transVector)
+        translated = self.nextShip.translated(transVector)
         valid = self.board.isShipValid(translated)
         while valid != 0:
             if valid == 1: return # now out of bounds, don't move ship
-            translated.translate(transVector) # if inside another ship, move further and try again
+            translated = translated.translated(transVector) # if inside another ship, move further and try again
             valid = self.board.isShipValid(translated)
+        dx = (translated.spaces[0][0] - self.nextShip.spaces[0][0]) * self.PBOARD_SPACE
+        dy = (translated.spaces[0][1] - self.nextShip.spaces[0][1]) * self.PBOARD_SPACE
         self.nextShip = translated
-        self.delete("shipToPlace")
-        self.drawShipObject(self.nextShip, "lightgray", "shipToPlace")
+        self.move("shipToPlace", dx, dy)
 
     def rotateSetupShip(self):
         """ 
         Attempt to rotate the startup ship 90 degrees clockwise.
         If there's something in the way or the rotation would place the ship out of bounds, don't rotate.
         """
-        rotated = copy.deepcopy(self.nextShip)
-        rotated.rotate()
+        rotated = self.nextShip.rotated()
         if self.board.isShipValid(rotated) != 0: return
         self.nextShip = rotated
-        self.delete("shipToPlace")
-        self.drawShipObject(self.nextShip, "lightgray", "shipToPlace")
+        self.reshapeShipObject(self.nextShip, "shipToPlace")
     
     def confirmSetupShip(self):
         """Place setup ship on board and either queue next ship or start game"""
-        self.delete("shipToPlace")
+        # keep the setup ship's shapes, just recolor and retag them
+        self.itemconfigure(self.find_withtag("shipToPlace")[0], fill="gray")
+        self.addtag_withtag(self.nextShip.name, "shipToPlace")
+        self.dtag("shipToPlace", "shipToPlace")
         self.board.addShip(self.nextShip)
-        self.drawShipObject(self.nextShip, tags=self.nextShip.name)
         try:
             self.getNextShip()
         except: # out of ships to place, so start the game
             self.startGame()
     
     ### MAIN GAME FUNCTIONS ###
+    def runInBackground(self, func, onDone, delay:float=0):
+        """
+        Call func() on the worker thread, then call onDone with its result on the Tk thread, but no sooner than delay seconds from now.
+        If func raises a ConnectionError, the game ends with connectionLost instead. Input is ignored until onDone is called.
+        """
+        self.busy = True
+        future = self.worker.submit(func)
+        deadline = time.monotonic() + delay
+        generation = self.generation
+        def check():
+            if self.generation != generation: return # the game this was for is over
+            if not future.done() or time.monotonic() < deadline:
+                self.after(self.POLL_MS, check)
+                return
+            self.busy = False
+            try:
+                rv = future.result()
+            except ConnectionError as e:
+                return self.connectionLost(e)
+            onDone(rv)
+        self.after(self.POLL_MS, check)
+
+    def destroy(self):
+        self.stop()
+        self.worker.shutdown(wait=False)
+        super().destroy()
+
     def startGame(self):
+        self.game_phase = "Waiting"
         self.sidebar.changeLabel("instructions", "Opponent is placing their ships...")
-        self.opponent.sendConfirmation()
-        self.opponent.getConfirmation() # wait for other player to be ready
+        def confirm():
+            self.opponent.sendConfirmation(list(self.board.aliveShips))
+            return self.opponent.getConfirmation() # wait for other player to be ready
+        self.runInBackground(confirm, lambda ready: self.beginMainPhase(), self.opponent.thinkingTime(setup=True))
+
+    def beginMainPhase(self):
         self.game_phase = "Main"
-        self.myturn = bool(random.getrandbits(1)) #TODO: change this if we implement online multiplayer
+        # myturn is flipped by changeTurns, so it starts out as whether the opponent moves first
+        self.myturn = bool(random.getrandbits(1)) if self.opponent.goesFirst is None else self.opponent.goesFirst
+        if isinstance(self.opponent, ComputerPlayer): # only games where the opponent's fleet is known can be recorded
+            self.recorder = self.master.recorder(self.config)
+            # the local player is player 0
+            if self.recorder is not None: self.recorder.start(int(self.myturn), [list(self.board.aliveShips), list(self.opponent.board.aliveShips)])
         self.changeTurns()
         
     def changeTurns(self):
@@ -427,40 +662,57 @@ class GameScreen(tk.Canvas):
             self.handleOpponentMove()
     
     def handlePlayerMove(self, move):
-        try:
-            result = self.opponent.sendMove(move)
-            self.board.addMyShot(move, result)
-            self.drawShot(False, move, result)
-            if result == Result.SUNK:
-                self.drawSunk(True, self.opponent.board.lastShipSunk().name)
-                if self.checkVictory() == 1: return
-            self.changeTurns()
-        except DuplicateShotError: pass # do nothing if player tries to click the same spot twice
+        if move in self.board.myshots: return # do nothing if player tries to click the same spot twice
+        self.runInBackground(lambda: self.opponent.sendMove(move), lambda result: self.finishPlayerMove(move, result))
+
+    def finishPlayerMove(self, move, result):
+        self.board.addMyShot(move, result)
+        self.drawShot(False, move, result)
+        if self.recorder is not None: self.recorder.shot(move, result)
+        if result == Result.SUNK:
+            self.drawSunk(True, self.opponent.board.lastShipSunk().name)
+            if self.checkVictory() == 1: return
+        self.changeTurns()
     
     def handleOpponentMove(self):
-        """Get move from opponent and update information accordingly, then do end of turn checks."""
-        move = self.opponent.getMove()
+        """Send the opponent the result of their last move and get their next one on the worker thread, then finish the turn with finishOpponentMove."""
+        pending, self.pendingResult = self.pendingResult, None
+        def getMove():
+            if pending is not None: self.opponent.sendMoveResult(*pending)
+            return self.opponent.getMove()
+        self.runInBackground(getMove, self.finishOpponentMove, self.opponent.thinkingTime())
+
+    def finishOpponentMove(self, move):
+        """Update information according to the opponent's move, then do end of turn checks."""
         result = self.board.addEnemyShot(move)
         self.drawShot(True, move, result) # add peg for move
-        self.opponent.sendMoveResult(move, result)
+        sunkName = self.board.lastShipSunk().name if result == Result.SUNK else None
+        self.pendingResult = (move, result, sunkName) # sent on the worker thread with the next handleOpponentMove (a CPU may take a while to update)
+        if self.recorder is not None: self.recorder.shot(move, result)
         if result == Result.SUNK:
-            self.drawSunk(False, self.board.lastShipSunk().name)
+            self.drawSunk(False, sunkName)
             if self.checkVictory() == 1: return
         self.changeTurns()
     
     def checkVictory(self):
         """Check to see if either player has won. If so, go to victory screen and return 1. Otherwise, return 0."""
+        if (self.recorder is not None) and (len(self.board.aliveShips) == 0 or self.opponent.isDefeated()): self.recorder.finish()
         if len(self.board.aliveShips) == 0:
-            self.master.display(VictoryScreen(self.master, "Opponent"))
+            self.master.display(VictoryScreen(self.master, "Opponent", self.opponent))
             return 1
-        if len(self.opponent.board.aliveShips) == 0:
-            self.master.display(VictoryScreen(self.master, "Player"))
+        if self.opponent.isDefeated():
+            self.master.display(VictoryScreen(self.master, "Player", self.opponent))
             return 1
         return 0
     
+    def connectionLost(self, error):
+        """Tell the player the online game has ended early and go back to the title screen."""
+        tkinter.messagebox.showerror("Game Over", str(error))
+        self.master.display(TitleScreen(self.master))
+    
     ### INPUT HANDLING FUNCTIONS ###
     def onKeyPress(self, event):
-        if not self.myturn: return # ignore input during opponent's turn
+        if (not self.myturn) | self.busy: return # ignore input during opponent's turn
 
         if self.game_phase == "Setup":
             if event.keysym == "Up": self.moveSetupShip((0, -1))
@@ -471,26 +723,27 @@ class GameScreen(tk.Canvas):
             elif event.keysym == "Return": self.confirmSetupShip()
 
     def onClick(self, event:tk.Event):
-        if not self.myturn: return # ignore input during opponent's turn
+        if (not self.myturn) | self.busy: return # ignore input during opponent's turn
 
         if self.game_phase == "Main":
             # ignore if click was outside the targeting board
             if event.x < self.TBOARD_X: return
-            if event.x > self.TBOARD_X + 10 * self.TBOARD_SPACE: return
+            if event.x > self.TBOARD_X + self.config.width * self.TBOARD_SPACE: return
             if event.y < self.TBOARD_Y: return
-            if event.y > self.TBOARD_Y + 10 * self.TBOARD_SPACE: return
+            if event.y > self.TBOARD_Y + self.config.height * self.TBOARD_SPACE: return
 
-            x = (event.x - self.TBOARD_X - 1) // self.TBOARD_SPACE + 1
-            y = (event.y - self.TBOARD_Y - 1) // self.TBOARD_SPACE + 1
+            x = max(1, (event.x - self.TBOARD_X - 1) // self.TBOARD_SPACE + 1)
+            y = max(1, (event.y - self.TBOARD_Y - 1) // self.TBOARD_SPACE + 1)
             self.handlePlayerMove((x, y))
 
 class VictoryScreen(tk.Frame):
-    def __init__(self, master, winner:str):
+    def __init__(self, master, winner:str, opponent:Player):
         super().__init__(background = BG_COLOR)
         self.master = master
+        self.nextOpponent = opponent.rematch() # None if this kind of opponent can't play again
 
         self.label = tk.Label(self, text=f"{winner} Won!", font=UI_FONT, bg=BG_COLOR)
-        self.rematchbutton = tk.Button(self, command=self.rematch, text="Rematch", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
+        self.rematchbutton = tk.Button(self, command=self.rematch, text="Rematch", width=BUTTON_WIDTH, height=BUTTON_HEIGHT, state="normal" if self.nextOpponent is not None else "disabled")
         self.titlebutton = tk.Button(self, command=self.title, text="Title Screen", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
         self.exitbutton = tk.Button(self, command=self.master.destroy, text="Quit", width=BUTTON_WIDTH, height=BUTTON_HEIGHT)
 
@@ -500,7 +753,7 @@ class VictoryScreen(tk.Frame):
         self.exitbutton.pack(pady=PAD)
     
     def rematch(self):
-        raise NotImplementedError("Rematch function is not implemented yet")
+        self.master.newGame(self.nextOpponent)
 
     def title(self):
         self.master.display(TitleScreen(self.master))
@@ -508,15 +761,49 @@ class VictoryScreen(tk.Frame):
 
 # main game object
 class Game(tk.Tk):
-    def __init__(self):
+    def __init__(self, recordPath:str=None):
+        """:param recordPath: optional path of a record file (see record.py) to append every finished game against the computer to"""
         super().__init__()
         self.geometry("800x800")
         self.title("Battleship")
         self.configure(background=BG_COLOR)
 
         self.current_screen = None # current frame being displayed
+        self.images = {} # PhotoImages loaded so far, by asset name
+        self.gameScreen = None # last GameScreen, kept between games so its background only has to be drawn once
+        self.recordPath = recordPath
+        self.writer = None # GameWriter for recordPath, opened by the first recorded game
         self.display(TitleScreen(self))
 
+    def recorder(self, config:GameConfig):
+        """Return the GameWriter that games with config should be recorded with, or None if they aren't recorded."""
+        if self.recordPath is None: return None
+        if (self.writer is not None) and (self.writer.config == config): return self.writer
+        if self.writer is not None: self.writer.close()
+        try:
+            from record import GameWriter
+            self.writer = GameWriter(self.recordPath, config)
+        except ValueError as e: # the file holds games with another config
+            print(f"Not recording game: {e}")
+            self.writer = None
+        return self.writer
+
+    def image(self, name:str):
+        """Return the PhotoImage for assets/<name>.png, loading it the first time it is asked for."""
+        if name not in self.images: self.images[name] = tk.PhotoImage(file=f"assets/{name}.png")
+        return self.images[name]
+
+    def newGame(self, opponent:Player):
+        """Display a game against opponent, reusing the last GameScreen if the opponent plays with the same config."""
+        if (self.gameScreen is not None) and (self.gameScreen.config == opponent.board.config):
+            self.gameScreen.reset(opponent)
+        else:
+            if self.gameScreen is not None:
+                if self.current_screen is self.gameScreen: self.current_screen = None
+                self.gameScreen.destroy()
+            self.gameScreen = GameScreen(self, opponent)
+        self.display(self.gameScreen)
+
     def title_screen(self):
         ts = TitleScreen(self)
         ts.pack()
@@ -530,16 +817,35 @@ class Game(tk.Tk):
         js.pack()
 
     def display(self, screen):
-        """Destroy current screen and display passed screen."""
-        if self.current_screen is not None:
-            self.current_screen.destroy()
+        """Destroy current screen and display passed screen. The game screen is only hidden, so that the next game can reuse it."""
+        if (self.current_screen is not None) and (self.current_screen is not screen):
+            if self.current_screen is self.gameScreen:
+                self.gameScreen.stop()
+                self.gameScreen.pack_forget()
+            else:
+                self.current_screen.destroy()
         self.current_screen = screen
         self.current_screen.pack()
 
 if __name__ == "__main__":
-    game = Game()
+    import argparse
+    parser = argparse.ArgumentParser(description="Play Battleship.")
+    parser.add_argument("--instrument", metavar="FILE", help="record per-method latencies and write them to FILE as JSON when the window is closed")
+    parser.add_argument("--profile", metavar="FILE", nargs="?", const="", help="run under cProfile, optionally saving the raw stats to FILE")
+    parser.add_argument("--record", metavar="FILE", help="append every finished game against the computer to the record file FILE (see record.py)")
+    args = parser.parse_args()
+
+    if (args.instrument is not None) | (args.profile is not None):
+        import instrument
+    if args.instrument is not None: instrument.enable(gameScreen=GameScreen)
+    game = Game(args.record)
     #game.display(GameScreen(game, ComputerPlayer(IntermediateCPU(False))))
-    game.mainloop()
+    if args.profile is not None: instrument.profile(game.mainloop, output=args.profile or None)
+    else: game.mainloop()
+    if game.writer is not None: game.writer.close()
+    if args.instrument is not None:
+        instrument.dump()
+        instrument.save(args.instrument)
     '''root = tk.Tk()
     game = GameScreen(root, ComputerPlayer())
     game.pack()
@@ -0,0 +1,218 @@
+# This file contains the data-driven fleet placement: fleets picked to dodge where an opponent tends to fire early.
+#
+# Building is done offline, once per opponent:
+#     1. A heat map is counted of how likely the opponent is to fire at each cell within its first few shots, either from record files
+#        (see record.py) or by letting a CPU fire at random fleets.
+#     2. Many random fleets are sampled, and the ones that would take the fewest expected hits from those early shots are kept as a "fleet book".
+# At setup, a CPU with a fleet book just picks one of its fleets at random, so it costs next to nothing. The book holds thousands of fleets,
+# so the placement stays hard to predict.
+#
+# File layout (little endian):
+#     header   b"BSHM", version byte, varint length, game config as JSON (see protocol.encodeConfig)
+#     uint16   number of early shots the heat map counts (horizon)
+#     uint32   number of games the heat map was counted from
+#     float32  heat of every cell (see Board.cellIndex): chance of being fired upon within the horizon
+#     uint32   number of fleets in the book
+#     uint16   every fleet, as one placement index per ship in config fleet order (see placements.PlacementTable)
+#
+# Run "python heatmap.py build OUT --cpu AdvancedCPU" (or "--record FILE ...") to build a book, and "python heatmap.py show FILE" to print its heat map.
+
+import sys
+import json
+import heapq
+import random
+from array import array
+from functools import lru_cache
+
+from config import GameConfig
+from board import BitBoard, Result
+from placements import getTable, getSampler, randomFleet, MAX_SAMPLER_CELLS
+from protocol import encodeConfig, decodeConfig, writeVarint, readVarint
+
+MAGIC = b"BSHM"
+VERSION = 1
+
+def littleEndian(a:array):
+    """Byteswap a in place on big endian machines, so that it matches the file."""
+    if sys.byteorder == "big": a.byteswap()
+    return a
+
+class FleetBook():
+    """A heat map of an opponent's early shots and the fleets that dodge it best. Use randomShips(board) as a CPU's placement."""
+    def __init__(self, config:GameConfig, horizon:int, games:int, heat:list, fleets:array):
+        """
+        :param horizon: number of early shots the heat map counts
+        :param games: number of games the heat map was counted from
+        :param heat: chance of each cell being fired upon within the horizon
+        :param fleets: flat array of placement indices, one row of len(config.fleet) per fleet
+        """
+        self.config = config
+        self.horizon = horizon
+        self.games = games
+        self.heat = heat
+        self.fleets = fleets
+        self.tables = [getTable(length, 1, config.width, 1, config.height) for length, name in config.fleet]
+
+    def __len__(self):
+        return len(self.fleets) // len(self.config.fleet)
+
+    def fleet(self, i:int):
+        """Return the Ship objects of fleet i."""
+        n = len(self.config.fleet)
+        return [table.ship(p, name) for table, p, (length, name) in zip(self.tables, self.fleets[i*n:(i+1)*n], self.config.fleet)]
+
+    def expectedHits(self, ships):
+        """Return how many of the opponent's first horizon shots are expected to hit ships."""
+        return sum(self.heat[(y - 1) * self.config.width + (x - 1)] for ship in ships for x, y in ship.spaces)
+
+    def randomShips(self, board):
+        """Return a random fleet from the book, or a plain random fleet if the board has ships on it already or another config."""
+        if (board.config != self.config) or board.shipAt or len(self) == 0: return randomFleet(board, spacing=True)
+        return self.fleet(random.randrange(len(self)))
+
+    ### FILES ###
+    def save(self, path:str):
+        data = json.dumps(encodeConfig(self.config), separators=(",", ":")).encode()
+        out = bytearray(MAGIC)
+        out.append(VERSION)
+        writeVarint(out, len(data))
+        out += data
+        out += self.horizon.to_bytes(2, "little")
+        out += self.games.to_bytes(4, "little")
+        out += littleEndian(array("f", self.heat)).tobytes()
+        out += len(self).to_bytes(4, "little")
+        out += littleEndian(array("H", self.fleets)).tobytes()
+        with open(path, "wb") as f:
+            f.write(out)
+
+@lru_cache(maxsize=None)
+def load(path:str):
+    """Load a fleet book file (once per path; later calls return the same book). Raises ValueError if it isn't one."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != MAGIC: raise ValueError("Not a fleet book file")
+    if data[4] != VERSION: raise ValueError(f"Unsupported fleet book version {data[4]}")
+    try:
+        length, i = readVarint(data, 5)
+        config = decodeConfig(json.loads(data[i:i+length]))
+        i += length
+        horizon = int.from_bytes(data[i:i+2], "little")
+        games = int.from_bytes(data[i+2:i+6], "little")
+        i += 6
+        heat = littleEndian(array("f", data[i:i + 4*config.cells]))
+        i += 4 * config.cells
+        count = int.from_bytes(data[i:i+4], "little")
+        i += 4
+        fleets = littleEndian(array("H", data[i:i + 2*count*len(config.fleet)]))
+    except (IndexError, ValueError) as e:
+        raise ValueError("Fleet book file is truncated") from e
+    if (len(heat) != config.cells) or (len(fleets) != count * len(config.fleet)): raise ValueError("Fleet book file is truncated")
+    return FleetBook(config, horizon, games, heat.tolist(), fleets)
+
+### BUILDING ###
+def countHeat(config:GameConfig, shotLists, horizon:int):
+    """Return (heat, games) for an iterable of lists of shot cells, one list per game, in the order they were fired."""
+    counts = [0] * config.cells
+    games = 0
+    for cells in shotLists:
+        games += 1
+        for cell in cells[:horizon]:
+            counts[cell] += 1
+    return [n / games if games else 0.0 for n in counts], games
+
+class PlacedCPU():
+    """
+    Stand-in for a CPU class that makes CPUs of that class set up from the fleet book at path, e.g. PlacedCPU(AdvancedCPU, "advanced.bshm").
+    It can be passed anywhere simulation.py and tournament.py take a CPU class, including to worker processes (the book is loaded once per process).
+    """
+    def __init__(self, cpuClass, path:str):
+        self.cpuClass = cpuClass
+        self.path = path
+        self.__name__ = f"{cpuClass.__name__}[{path}]"
+
+    def __call__(self, *args, **kwargs):
+        cpu = self.cpuClass(*args, **kwargs)
+        cpu.placement = load(self.path)
+        return cpu
+
+def recordedShots(paths:list, horizon:int):
+    """Yield the first horizon shot cells of every player in every game of the record files at paths."""
+    from record import RecordReader
+    config = None
+    for path in paths:
+        with RecordReader(path) as reader:
+            if config is None: config = reader.config
+            elif reader.config != config: raise ValueError(f"{path} holds games for a different config")
+            for game in reader:
+                for player in (0, 1):
+                    shots = [pos for i, (pos, result) in enumerate(game.shots) if game.shooter(i) == player][:horizon]
+                    yield [(y - 1) * reader.config.width + (x - 1) for x, y in shots]
+
+def simulatedShots(cpuClass, config:GameConfig, games:int, horizon:int, spacing:bool=True):
+    """Yield the first horizon shot cells of cpuClass firing at each of games random fleets (placed with spacing, like the default CPU setups)."""
+    from player import ComputerPlayer
+    for _ in range(games):
+        target = BitBoard(config=config)
+        for ship in randomFleet(target, spacing):
+            target.addShip(ship)
+        shooter = ComputerPlayer(cpuClass(False), BitBoard(config=config))
+        cells = []
+        while (len(cells) < horizon) and target.aliveShips:
+            move = shooter.getMove()
+            result = target.addEnemyShot(move)
+            shooter.sendMoveResult(move, result, target.lastShipSunk().name if result == Result.SUNK else None)
+            cells.append(target.cellIndex(move))
+        yield cells
+
+def buildBook(config:GameConfig, heat:list, games:int, horizon:int, size:int=4096, candidates:int=100000, spacing:bool=True):
+    """
+    Sample candidates random fleets and return a FleetBook of the size fleets expected to take the fewest early hits.
+
+    :param spacing: sample fleets with ships kept apart, like IntermediateCPU's setup
+    """
+    if config.cells > MAX_SAMPLER_CELLS: raise ValueError("Board is too large to build a fleet book for")
+    sampler = getSampler(config, spacing)
+    tables = [getTable(length, 1, config.width, 1, config.height) for length, name in config.fleet]
+    # expected hits on each placement of each ship
+    scores = [[sum(heat[c] for c in range(config.cells) if m >> c & 1) for m in table.masks] for table in tables]
+    best = heapq.nsmallest(size, (sampler.sample() for _ in range(candidates)), key=lambda fleet: sum(s[p] for s, p in zip(scores, fleet)))
+    return FleetBook(config, horizon, games, heat, array("H", [p for fleet in best for p in fleet]))
+
+if __name__ == "__main__":
+    import argparse
+    from simulation import getCPUClass
+    parser = argparse.ArgumentParser(description="Build or inspect fleet books for data-driven CPU setup.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="count an opponent's early shots and build a fleet book from them")
+    build.add_argument("output")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument("--record", metavar="FILE", nargs="+", help="count shots from these record files")
+    source.add_argument("--cpu", help="count shots of this CPU class firing at random fleets")
+    build.add_argument("-n", "--games", type=int, default=2000, help="games to simulate with --cpu")
+    build.add_argument("--horizon", type=int, default=30, help="number of early shots to dodge")
+    build.add_argument("--size", type=int, default=4096, help="fleets to keep in the book")
+    build.add_argument("--candidates", type=int, default=100000, help="random fleets to choose the book from")
+    build.add_argument("--width", type=int, default=10)
+    build.add_argument("--height", type=int, default=10)
+    show = commands.add_parser("show", help="print the heat map of a fleet book")
+    show.add_argument("file")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.record:
+            from record import RecordReader
+            with RecordReader(args.record[0]) as reader:
+                config = reader.config
+            shots = recordedShots(args.record, args.horizon)
+        else:
+            config = GameConfig(args.width, args.height)
+            shots = simulatedShots(getCPUClass(args.cpu), config, args.games, args.horizon)
+        heat, games = countHeat(config, shots, args.horizon)
+        book = buildBook(config, heat, games, args.horizon, args.size, args.candidates)
+        book.save(args.output)
+        print(f"{len(book)} fleets from {args.candidates} candidates, heat map of the first {args.horizon} shots of {games} games")
+    book = load(args.output if args.command == "build" else args.file)
+    for y in range(book.config.height):
+        print(" ".join(f"{book.heat[y * book.config.width + x]:.2f}" for x in range(book.config.width)))
+    mean = sum(book.expectedHits(book.fleet(i)) for i in range(len(book))) / max(1, len(book))
+    print(f"{len(book)} fleets, {mean:.2f} expected hits in the first {book.horizon} shots")
@@ -0,0 +1,235 @@
+# This file contains the opt-in latency instrumentation and profiling hooks.
+#
+# Nothing is measured until enable() is called. enable() wraps the hot methods of every Player, CPU and Board class (and the GameScreen
+# draw functions, if given the class) with a timer, and disable() puts the original methods back, so turned off it costs nothing.
+
+import sys
+import json
+import time
+import cProfile
+import pstats
+import threading
+import functools
+from collections import Counter
+
+from player import Player
+from cpu import CPU
+from board import Board
+
+# methods to time, by the base class whose subclasses define them
+TARGETS = {
+    Player: ("getMove", "sendMove", "sendMoveResult"),
+    CPU: ("setup", "getMove"),
+    Board: ("addEnemyShot",),
+}
+GUI_METHODS = ("drawBackground", "drawShip", "drawShipObject", "drawShot", "drawSunk")
+
+class Histogram():
+    """
+    Latency histogram in nanoseconds. Buckets are a quarter of a power of two wide, so percentiles are accurate to within about 20%.
+    The count, total, minimum and maximum are exact.
+    """
+    def __init__(self):
+        self.buckets = Counter() # bucket index => count
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def bucket(ns:int):
+        b = ns.bit_length()
+        if b < 3: return ns
+        return b * 4 + ((ns >> (b - 3)) & 3)
+
+    @staticmethod
+    def bucketTop(bucket:int):
+        """Return the largest value in bucket."""
+        if bucket < 4: return bucket # values below 4 have a bucket each
+        b, sub = divmod(bucket, 4)
+        return ((5 + sub) << (b - 3)) - 1
+
+    def add(self, ns:int):
+        self.buckets[self.bucket(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min: self.min = ns
+        if self.max is None or ns > self.max: self.max = ns
+
+    def percentile(self, p:float):
+        """Return an upper estimate of the p-th percentile (0-100) in nanoseconds."""
+        if self.count == 0: return 0
+        rank = p / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank: return min(self.bucketTop(bucket), self.max)
+        return self.max
+
+    def toDict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total / 1e6,
+            "mean_us": self.total / self.count / 1000 if self.count else 0,
+            "min_us": (self.min or 0) / 1000,
+            "p50_us": self.percentile(50) / 1000,
+            "p90_us": self.percentile(90) / 1000,
+            "p99_us": self.percentile(99) / 1000,
+            "max_us": (self.max or 0) / 1000,
+        }
+
+# everything recorded since the last reset
+# format - "Class.method" => Histogram
+histograms = {}
+# format - name:str => count:int
+counters = Counter()
+enabled = False
+# original methods replaced by enable()
+# format - list of (class, method name, original function)
+patched = []
+
+def count(name:str, n:int=1):
+    """Add n to counter name. Does nothing while instrumentation is off."""
+    if enabled: counters[name] += n
+
+def timed(name:str, func):
+    """Return a wrapper around func that records its latency in histogram name and counts the exceptions it raises."""
+    histogram = histograms.setdefault(name, Histogram())
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            counters[name + ".errors"] += 1
+            raise
+        finally:
+            histogram.add(time.perf_counter_ns() - start)
+    return wrapper
+
+def subclasses(cls):
+    """Return cls and every class derived from it."""
+    rv = [cls]
+    for sub in cls.__subclasses__():
+        rv.extend(subclasses(sub))
+    return rv
+
+def enable(gameScreen=None):
+    """
+    Start timing the methods in TARGETS (on every subclass that defines them) and, if the GameScreen class is passed in, its draw functions.
+    Only classes that exist when this is called are instrumented.
+    """
+    global enabled
+    if enabled: return
+    targets = [(base, names) for base, names in TARGETS.items()]
+    if gameScreen is not None: targets.append((gameScreen, GUI_METHODS))
+    for base, names in targets:
+        for cls in subclasses(base):
+            for name in names:
+                if name in cls.__dict__:
+                    func = cls.__dict__[name]
+                    patched.append((cls, name, func))
+                    setattr(cls, name, timed(f"{cls.__name__}.{name}", func))
+    enabled = True
+
+def disable():
+    """Stop timing and put the original methods back. Recorded data is kept until reset() is called."""
+    global enabled
+    while patched:
+        cls, name, func = patched.pop()
+        setattr(cls, name, func)
+    enabled = False
+
+def reset():
+    histograms.clear()
+    counters.clear()
+
+def toDict():
+    """Return everything recorded so far as a JSON-serializable dict."""
+    return {
+        "histograms": dict((name, h.toDict()) for name, h in sorted(histograms.items()) if h.count),
+        "counters": dict(sorted(counters.items())),
+    }
+
+def save(path:str):
+    """Write everything recorded so far to path as JSON."""
+    with open(path, "w") as f:
+        json.dump(toDict(), f, indent=2)
+
+def dump(file=None):
+    """Print a table of everything recorded so far (to stdout by default)."""
+    file = sys.stdout if file is None else file
+    data = toDict()
+    print(f"{'method':36} {'calls':>9} {'total ms':>10} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'max us':>9}", file=file)
+    for name, h in data["histograms"].items():
+        print(f"{name:36} {h['count']:9} {h['total_ms']:10.2f} {h['mean_us']:9.2f} {h['p50_us']:9.2f} {h['p99_us']:9.2f} {h['max_us']:9.2f}", file=file)
+    for name, n in data["counters"].items():
+        print(f"{name:36} {n:9}", file=file)
+
+### PROFILING ###
+def profile(func, *args, output:str=None, top:int=25, **kwargs):
+    """
+    Run func(*args, **kwargs) under cProfile, print the top functions by cumulative time and return func's result.
+
+    :param output: if given, also save the raw stats to this file (readable with pstats or snakeviz)
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        if output is not None: profiler.dump_stats(output)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
+
+class SamplingProfiler():
+    """
+    Statistical profiler that records the stack of one thread every interval seconds from a background thread.
+    Much lower overhead than cProfile, so timings stay realistic, at the cost of only seeing where time is spent on average.
+    """
+    def __init__(self, interval:float=0.001, thread:threading.Thread=None):
+        self.interval = interval
+        self.threadId = (thread or threading.current_thread()).ident
+        self.samples = Counter() # stack (tuple of "file:line function", outermost first) => samples
+        self.stopEvent = threading.Event()
+        self.sampler = None
+
+    def start(self):
+        self.stopEvent.clear()
+        self.sampler = threading.Thread(target=self.run, daemon=True)
+        self.sampler.start()
+
+    def stop(self):
+        self.stopEvent.set()
+        if self.sampler is not None: self.sampler.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def run(self):
+        while not self.stopEvent.wait(self.interval):
+            frame = sys._current_frames().get(self.threadId)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno} {code.co_name}")
+                frame = frame.f_back
+            if stack: self.samples[tuple(reversed(stack))] += 1
+
+    def functionTotals(self):
+        """Return a Counter of how many samples each function appeared in (inclusive time)."""
+        totals = Counter()
+        for stack, n in self.samples.items():
+            for func in set(entry.split(":", 1)[0] + " " + entry.split(" ", 1)[1] for entry in stack):
+                totals[func] += n
+        return totals
+
+    def report(self, top:int=25, file=None):
+        """Print the functions seen in the most samples."""
+        file = sys.stdout if file is None else file
+        total = sum(self.samples.values())
+        print(f"{total} samples", file=file)
+        for func, n in self.functionTotals().most_common(top):
+            print(f"{100 * n / max(total, 1):6.1f}%  {func}", file=file)
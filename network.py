@@ -0,0 +1,61 @@
+# This file contains the message transport shared by the game server and its clients.
+#
+# Messages are dicts with a "type" key, sent over an asyncio stream in the binary format from protocol.py.
+
+import asyncio
+from collections import deque
+
+from protocol import Codec
+
+DEFAULT_PORT = 7373
+
+class Connection():
+    """
+    One end of a connection between the game server and a client.
+    Messages sent during one pass of the event loop are written to the socket together, so a burst of messages costs one write.
+    """
+    HIGH_WATER = 64 * 1024 # bytes buffered in the transport before send() waits for the other end to catch up
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.codec = Codec()
+        self.received = deque() # decoded messages that haven't been returned by receive() yet
+        self.outgoing = bytearray() # encoded messages waiting for the next flush
+        self.flushScheduled = False
+
+    async def send(self, msg:dict):
+        """Queue one message to be written at the end of this pass of the event loop."""
+        if self.writer.is_closing(): raise ConnectionError("Connection is closed")
+        self.codec.encode(msg, self.outgoing)
+        if not self.flushScheduled:
+            self.flushScheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+        if self.writer.transport.get_write_buffer_size() > self.HIGH_WATER: await self.writer.drain()
+
+    def flush(self):
+        """Write every queued message."""
+        self.flushScheduled = False
+        if self.outgoing and not self.writer.is_closing(): self.writer.write(bytes(self.outgoing))
+        self.outgoing.clear()
+
+    async def receive(self):
+        """Return the next message, or None once the other end has closed the connection (or sent something unreadable)."""
+        while not self.received:
+            try:
+                data = await self.reader.read(self.READ_SIZE)
+                if not data: return None
+                self.received.extend(self.codec.feed(data))
+            except (ConnectionError, ValueError):
+                return None
+        return self.received.popleft()
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+async def connect(host:str, port:int=DEFAULT_PORT):
+    """Open a Connection to the game server at host:port."""
+    reader, writer = await asyncio.open_connection(host, port)
+    return Connection(reader, writer)
@@ -0,0 +1,177 @@
+# This file contains the opening book: AdvancedCPU's moves for common early states, worked out offline so games don't recount them.
+#
+# Until a ship is sunk, AdvancedCPU's choice depends only on which cells it has fired at and what they hit, which is exactly what Board.shotHash hashes.
+# The builder plays AdvancedCPU against many random fleets and stores the tied densest cells of every state it reaches often enough within the first moves.
+# The book is looked up through a memory map, so loading it is instant and only the pages a game touches are read.
+#
+# File layout (little endian):
+#     header   b"BSOB", version byte, varint length, JSON {"config": game config (see protocol.encodeConfig), "cpu": CPU class name, "depth": moves}
+#     uint32   number of states n, then zero padding to a multiple of 8 bytes
+#     uint64   n state hashes, sorted
+#     uint32   n + 1 offsets into the cells: state i's moves are cells[offsets[i]:offsets[i+1]]
+#     uint16   cells (see Board.cellIndex)
+#
+# Run "python openingbook.py build OUT" to build a book (see --help), and "python openingbook.py show FILE" to summarize one.
+# AdvancedCPU uses the book at DEFAULT_PATH if there is one.
+
+import os
+import sys
+import json
+import mmap
+from bisect import bisect_left
+from array import array
+from functools import lru_cache
+
+from config import GameConfig
+from protocol import encodeConfig, decodeConfig, writeVarint, readVarint
+
+MAGIC = b"BSOB"
+VERSION = 1
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "advancedcpu.book")
+
+class OpeningBook():
+    """A memory-mapped opening book. Use lookup(board.shotHash) to get the moves for a state. Call close() when done, or let it live as long as the process."""
+    def __init__(self, path:str):
+        self.file = open(path, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # empty file
+            self.file.close()
+            raise ValueError("Not an opening book file")
+        try:
+            self.parse()
+        except:
+            self.close()
+            raise
+
+    def parse(self):
+        data = self.data
+        if data[:4] != MAGIC: raise ValueError("Not an opening book file")
+        if data[4] != VERSION: raise ValueError(f"Unsupported opening book version {data[4]}")
+        try:
+            length, i = readVarint(data, 5)
+            header = json.loads(data[i:i+length])
+            self.config = decodeConfig(header["config"])
+            self.cpu = header["cpu"]
+            self.depth = header["depth"]
+            i += length
+            n = int.from_bytes(data[i:i+4], "little")
+            i = (i + 4 + 7) // 8 * 8
+        except (IndexError, KeyError, ValueError) as e:
+            raise ValueError("Opening book header is damaged") from e
+        sizes = (8 * n, 4 * (n + 1))
+        if len(data) < i + sum(sizes): raise ValueError("Opening book file is truncated")
+        views = []
+        for size, typecode in zip(sizes, ("Q", "I")):
+            views.append(self.view(i, size, typecode))
+            i += size
+        self.keys, self.offsets = views
+        self.cells = self.view(i, len(data) - i, "H")
+        if (len(self.offsets) != n + 1) or (self.offsets[n] > len(self.cells)): raise ValueError("Opening book file is truncated")
+
+    def view(self, start:int, size:int, typecode:str):
+        """Return the bytes [start, start + size) of the file as a sequence of typecode items, straight from the memory map if the byte order allows it."""
+        if sys.byteorder == "little":
+            return memoryview(self.data)[start:start + size].cast(typecode)
+        rv = array(typecode, self.data[start:start + size])
+        rv.byteswap()
+        return rv
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, shotHash:int):
+        """Return the tuple of cells to choose from in the state with shotHash, or None if the state isn't in the book."""
+        i = bisect_left(self.keys, shotHash)
+        if (i == len(self.keys)) or (self.keys[i] != shotHash): return None
+        return tuple(self.cells[self.offsets[i]:self.offsets[i+1]])
+
+    def close(self):
+        for name in ("keys", "offsets", "cells"):
+            view = getattr(self, name, None)
+            if isinstance(view, memoryview): view.release()
+        self.data.close()
+        self.file.close()
+
+@lru_cache(maxsize=None)
+def load(path:str=DEFAULT_PATH):
+    """Return the opening book at path (opened once per process), or None if there's no file there."""
+    if not os.path.exists(path): return None
+    return OpeningBook(path)
+
+def save(path:str, config:GameConfig, cpu:str, depth:int, entries:dict):
+    """Write a book of entries (shotHash => tuple of cells) to path."""
+    header = json.dumps({"config": encodeConfig(config), "cpu": cpu, "depth": depth}, separators=(",", ":")).encode()
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    writeVarint(out, len(header))
+    out += header
+    out += len(entries).to_bytes(4, "little")
+    out += bytes(-len(out) % 8)
+    keys = array("Q", sorted(entries))
+    offsets = array("I", [0])
+    cells = array("H")
+    for key in keys:
+        cells.extend(entries[key])
+        offsets.append(len(cells))
+    for a in (keys, offsets, cells):
+        if sys.byteorder == "big": a.byteswap()
+        out += a.tobytes()
+    with open(path, "wb") as f:
+        f.write(out)
+
+def build(config:GameConfig, games:int, depth:int=15, minCount:int=2, spacing:bool=True):
+    """
+    Play AdvancedCPU against games random fleets and return the book entries (shotHash => tuple of cells) of every state reached
+    at least minCount times within the first depth moves, before the first ship is sunk.
+    """
+    from board import BitBoard, Result
+    from cpu import AdvancedCPU
+    from player import ComputerPlayer
+    from placements import randomFleet
+    counts = {}
+    entries = {}
+    for _ in range(games):
+        target = BitBoard(config=config)
+        for ship in randomFleet(target, spacing):
+            target.addShip(ship)
+        shooter = ComputerPlayer(AdvancedCPU(False), BitBoard(config=config))
+        ai = shooter.ai
+        ai.initTargeting()
+        ai.book = None # count every state live
+        for _ in range(depth):
+            key = shooter.board.shotHash
+            counts[key] = counts.get(key, 0) + 1
+            if key not in entries: entries[key] = ai.densestCells()
+            move = shooter.getMove()
+            result = target.addEnemyShot(move)
+            shooter.sendMoveResult(move, result, target.lastShipSunk().name if result == Result.SUNK else None)
+            if result == Result.SUNK: break
+    return dict((key, cells) for key, cells in entries.items() if (counts[key] >= minCount) and cells)
+
+if __name__ == "__main__":
+    import time
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or inspect opening books for AdvancedCPU.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    builder = commands.add_parser("build", help="build an opening book by playing AdvancedCPU against random fleets")
+    builder.add_argument("output", nargs="?", default=DEFAULT_PATH)
+    builder.add_argument("-n", "--games", type=int, default=20000)
+    builder.add_argument("--depth", type=int, default=15, help="moves into each game to store states for")
+    builder.add_argument("--min-count", type=int, default=2, help="leave out states reached fewer times than this")
+    builder.add_argument("--width", type=int, default=10)
+    builder.add_argument("--height", type=int, default=10)
+    show = commands.add_parser("show", help="summarize an opening book")
+    show.add_argument("file", nargs="?", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        config = GameConfig(args.width, args.height)
+        start = time.perf_counter()
+        entries = build(config, args.games, args.depth, args.min_count)
+        save(args.output, config, "AdvancedCPU", args.depth, entries)
+        print(f"{len(entries)} states from {args.games} games in {time.perf_counter() - start:.1f}s, {os.path.getsize(args.output)} bytes")
+    else:
+        book = OpeningBook(args.file)
+        print(f"{len(book)} states of {book.cpu} on {book.config}, up to {book.depth} moves deep, {len(book.cells)} moves stored")
+        book.close()
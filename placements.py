@@ -0,0 +1,300 @@
+# This file contains the tables of every legal ship placement, shared by the setup code and the targeting CPUs.
+
+import os
+import sys
+import random
+from array import array
+from operator import itemgetter
+from functools import lru_cache
+
+from ship import Ship
+from config import GameConfig
+
+class PlacementTable():
+    """
+    Every legal placement of a ship of one length on an empty board of one size.
+    Placements are numbered row by row (horizontal before vertical at each origin), so a set of placements can be stored as an int bitset where placement i is bit i.
+    Cells are numbered the same way as Board.cellIndex.
+    """
+    def __init__(self, length:int, minX:int, maxX:int, minY:int, maxY:int):
+        self.length = length
+        self.minX = minX
+        self.minY = minY
+        self.width = maxX - minX + 1
+        self.height = maxY - minY + 1
+
+        self.positions = [] # origin of each placement, in board coordinates
+        self.directions = [] # direction of each placement, either (1, 0) or (0, 1)
+        self.masks = [] # cells covered by each placement
+        self.halos = [] # cells bordering each placement, including diagonals
+        self.coverage = [0] * (self.width * self.height) # placements covering each cell
+        self.horizontal = 0 # placements with direction (1, 0)
+
+        for y in range(self.height):
+            for x in range(self.width):
+                for d in ((1, 0), (0, 1)):
+                    endX = x + d[0] * (length-1)
+                    endY = y + d[1] * (length-1)
+                    if (endX >= self.width) | (endY >= self.height): continue
+                    bit = 1 << len(self.masks)
+                    mask = 0
+                    for i in range(length):
+                        cell = (y + d[1]*i) * self.width + (x + d[0]*i)
+                        mask |= 1 << cell
+                        self.coverage[cell] |= bit
+                    halo = 0
+                    for hy in range(max(y-1, 0), min(endY+1, self.height-1) + 1):
+                        for hx in range(max(x-1, 0), min(endX+1, self.width-1) + 1):
+                            halo |= 1 << (hy * self.width + hx)
+                    if d == (1, 0): self.horizontal |= bit
+                    self.positions.append((minX + x, minY + y))
+                    self.directions.append(d)
+                    self.masks.append(mask)
+                    self.halos.append(halo & ~mask)
+
+        self.all = (1 << len(self.masks)) - 1 # bitset of every placement
+
+        # for cellCounts: index of the horizontal and vertical placement at each origin cell, last cell first, or len(self) if there is none
+        origins = ([len(self)] * (self.width * self.height), [len(self)] * (self.width * self.height))
+        for i, ((x, y), d) in enumerate(zip(self.positions, self.directions)):
+            origins[d[1]][(y - minY) * self.width + (x - minX)] = i
+        self.horizontalOrigins, self.verticalOrigins = (itemgetter(*reversed(cells)) for cells in origins)
+        self.repeats = {} # field width in bytes => (horizontal, vertical) multipliers that repeat an origin's field over a placement's cells
+
+    def __len__(self):
+        return len(self.masks)
+
+    def covering(self, cells:int):
+        """Return the bitset of placements that cover at least one cell of the cell mask cells."""
+        rv = 0
+        while cells:
+            low = cells & -cells
+            cells ^= low
+            rv |= self.coverage[low.bit_length()-1]
+        return rv
+
+    def fitting(self, occupied:int):
+        """Return the bitset of placements that don't overlap the cell mask occupied."""
+        return self.all & ~self.covering(occupied)
+
+    def cellCounts(self, placements:int, fieldBytes:int=1):
+        """
+        Return how many placements of the bitset placements cover each cell, packed into an int with one fieldBytes wide field per cell (see packCells).
+        The counts are worked out with string and int operations on the whole board at once, without looping over cells or placements in Python.
+        """
+        if fieldBytes not in self.repeats:
+            bits = 8 * fieldBytes
+            self.repeats[fieldBytes] = (sum(1 << (bits * i) for i in range(self.length)), sum(1 << (bits * self.width * i) for i in range(self.length)))
+        horizontal, vertical = self.repeats[fieldBytes]
+        placed = format(placements, f"0{len(self)}b")[::-1] + "0" # "1" for each placement in the bitset, in placement order, then "0" for missing origins
+        return (packBits("".join(self.horizontalOrigins(placed)), fieldBytes) * horizontal
+                + packBits("".join(self.verticalOrigins(placed)), fieldBytes) * vertical)
+
+    def ship(self, i:int, name:str=""):
+        """Build a Ship object for placement i."""
+        return Ship(self.positions[i], self.length, self.directions[i], name)
+
+@lru_cache(maxsize=None)
+def getTable(length:int, minX:int, maxX:int, minY:int, maxY:int):
+    """Return the placement table for ships of length on a board with the given bounds, building it the first time it is asked for."""
+    return PlacementTable(length, minX, maxX, minY, maxY)
+
+def boardTable(board, length:int):
+    """Return the placement table for ships of length on board."""
+    return getTable(length, board.MIN_X, board.MAX_X, board.MIN_Y, board.MAX_Y)
+
+# field width in bytes => translation of "0" and "1" to big endian fields of that width
+FIELDS = dict((n, {ord("0"): "\0" * n, ord("1"): "\0" * (n-1) + "\1"}) for n in (1, 2, 4))
+
+def packBits(bits:str, fieldBytes:int=1):
+    """Return the string of "0"s and "1"s bits (most significant first) as an int with one fieldBytes wide field per character."""
+    return int.from_bytes(bits.translate(FIELDS[fieldBytes]).encode("latin-1"), "big")
+
+def packCells(mask:int, cells:int, fieldBytes:int=1):
+    """
+    Return the cell mask mask on a board of cells cells spread out to one fieldBytes wide field per cell, holding 1 for cells in the mask and 0 for the rest.
+    Packed cells can be added and multiplied like vectors of per-cell counts, as long as no count outgrows its field.
+    """
+    return packBits(format(mask & ((1 << cells) - 1), f"0{cells}b"), fieldBytes)
+
+def unpackCells(packed:int, cells:int, fieldBytes:int=1):
+    """Return the per-cell fields of packed (see packCells) as an array, cell 0 first."""
+    rv = array({1: "B", 2: "H", 4: "I"}[fieldBytes], packed.to_bytes(cells * fieldBytes, "little"))
+    if sys.byteorder == "big": rv.byteswap()
+    return rv
+
+def occupiedMask(board):
+    """Return the cell mask of every space occupied by a ship on board."""
+    mask = 0
+    for space in board.shipAt:
+        mask |= 1 << board.cellIndex(space)
+    return mask
+
+def lowestBit(bitset:int):
+    """Return the index of the lowest set bit of bitset."""
+    return (bitset & -bitset).bit_length() - 1
+
+def randomBit(bitset:int):
+    """Return the index of a uniformly chosen set bit of bitset (which must not be 0)."""
+    # a few cheap random probes usually hit a set bit; if they don't, fall back on a binary search on popcounts so the time stays bounded
+    n = bitset.bit_length()
+    for _ in range(4):
+        i = random.randrange(n)
+        if bitset >> i & 1: return i
+    k = random.randrange(bitset.bit_count())
+    lo, hi = 0, n # the chosen bit is in [lo, hi) and k is its rank among the set bits there
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        below = (bitset >> lo & ((1 << (mid - lo)) - 1)).bit_count()
+        if k < below:
+            hi = mid
+        else:
+            k -= below
+            lo = mid
+    return lo
+
+class FleetSampler():
+    """
+    Constructive random fleet generator. Each ship is picked uniformly from the placements still legal after the ships before it were placed, so there are no retries.
+    For every pair of ship lengths, the sampler precomputes which placements of the second length each placement of the first length rules out.
+    Placing a ship is then one bitwise operation per remaining length.
+    Those tables grow with the square of the board size, so this is only used up to MAX_SAMPLER_CELLS cells (see SparseFleetSampler).
+    """
+    def __init__(self, config:GameConfig, spacing:bool=False):
+        """
+        :param config: board size and fleet; ships are placed in fleet order
+        :param spacing: if true, ships are kept from touching (even diagonally) whenever the remaining space allows it
+        """
+        self.fleet = config.fleet
+        self.spacing = spacing
+        lengths = set(length for length, name in self.fleet)
+        self.tables = dict((length, getTable(length, 1, config.width, 1, config.height)) for length in lengths)
+        # placements of each length ruled out by each placement of each length
+        # format - placed length:int => {other length:int => list of bitsets, indexed by placement}
+        self.overlaps = {}
+        self.touches = {}
+        for placed, table in self.tables.items():
+            self.overlaps[placed] = dict((other, [t.covering(m) for m in table.masks]) for other, t in self.tables.items())
+            if spacing:
+                self.touches[placed] = dict((other, [t.covering(m | h) for m, h in zip(table.masks, table.halos)]) for other, t in self.tables.items())
+        self.typecode = "H" if max(len(t) for t in self.tables.values()) <= 0xFFFF else "L"
+
+    def sample(self, occupied:int=0):
+        """
+        Return a list with the placement index of each ship in the fleet.
+
+        :param occupied: cell mask of spaces that are already taken
+        """
+        loose = dict((length, table.fitting(occupied)) for length, table in self.tables.items())
+        strict = dict(loose) if self.spacing else loose
+        rv = []
+        for length, name in self.fleet:
+            if strict[length]: i = randomBit(strict[length])
+            elif loose[length]: i = randomBit(loose[length]) # no room left to keep this ship apart from the others
+            else: raise ValueError(f"There is no room left for the {name}")
+            rv.append(i)
+            for other, overlaps in self.overlaps[length].items():
+                loose[other] &= ~overlaps[i]
+            if self.spacing:
+                for other, touches in self.touches[length].items():
+                    strict[other] &= ~touches[i]
+        return rv
+
+    def sampleMany(self, k:int):
+        """Return k fleets as a flat array of placement indices, one row of len(fleet) indices per fleet."""
+        rv = array(self.typecode)
+        for _ in range(k):
+            rv.extend(self.sample())
+        return rv
+
+    def ships(self, indices):
+        """Build the Ship objects for one fleet of placement indices."""
+        return [self.tables[length].ship(i, name) for (length, name), i in zip(self.fleet, indices)]
+
+    def randomShips(self, board):
+        """Return a random fleet of Ship objects that fits around the ships already on board."""
+        return self.ships(self.sample(occupiedMask(board)))
+
+class SparseFleetSampler():
+    """
+    Random fleet generator for boards too big for placement tables. It tries random placements against the set of taken spaces.
+    On boards that big the fleet covers a small fraction of the board, so nearly every try succeeds.
+    The number of tries is still capped: spacing is dropped for a ship that can't be kept apart, and a ship that can't be placed at all raises ValueError.
+    """
+    MAX_TRIES = 1000
+
+    def __init__(self, config:GameConfig, spacing:bool=False):
+        self.config = config
+        self.spacing = spacing
+
+    def randomShips(self, board):
+        """Return a random fleet of Ship objects that fits around the ships already on board."""
+        taken = set(board.shipAt) # spaces taken by ships
+        rv = []
+        for length, name in self.config.fleet:
+            ship = None
+            directions = [d for d in ((1, 0), (0, 1)) if (d[0]*(length-1) < self.config.width) & (d[1]*(length-1) < self.config.height)]
+            for tries in range(2 * self.MAX_TRIES):
+                spaced = self.spacing and tries < self.MAX_TRIES
+                d = random.choice(directions)
+                pos = (random.randint(1, self.config.width - d[0]*(length-1)), random.randint(1, self.config.height - d[1]*(length-1)))
+                spaces = [(pos[0] + d[0]*i, pos[1] + d[1]*i) for i in range(length)]
+                if spaced: clear = not any((x+dx, y+dy) in taken for x, y in spaces for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+                else: clear = not any(space in taken for space in spaces)
+                if clear:
+                    ship = Ship(pos, length, d, name)
+                    break
+            if ship is None: raise ValueError(f"There is no room left for the {name}")
+            taken.update(ship.spaces)
+            rv.append(ship)
+        return rv
+
+MAX_SAMPLER_CELLS = 1024 # largest board that FleetSampler builds its tables for
+MAX_TABLE_CELLS = 4096 # largest board that targeting code should build placement tables for
+
+@lru_cache(maxsize=None)
+def getSampler(config:GameConfig, spacing:bool=False):
+    """Return the fleet sampler for config, building it the first time it is asked for."""
+    if config.cells <= MAX_SAMPLER_CELLS: return FleetSampler(config, spacing)
+    return SparseFleetSampler(config, spacing)
+
+def randomFleet(board, spacing:bool=False):
+    """Return a random fleet of Ship objects for board's config that fits around the ships already on board."""
+    return getSampler(board.config, spacing).randomShips(board)
+
+def firstFit(board, length:int, name:str=""):
+    """Return a Ship in the first open space on board, going row by row and preferring horizontal placements. Return None if there is no room."""
+    if board.config.cells <= MAX_TABLE_CELLS:
+        table = boardTable(board, length)
+        fitting = table.fitting(occupiedMask(board))
+        if fitting == 0: return None
+        return table.ship(lowestBit(fitting & table.horizontal) if fitting & table.horizontal else lowestBit(fitting), name)
+    for d in ((1, 0), (0, 1)):
+        for y in range(board.MIN_Y, board.MAX_Y - d[1]*(length-1) + 1):
+            for x in range(board.MIN_X, board.MAX_X - d[0]*(length-1) + 1):
+                if not any((x + d[0]*i, y + d[1]*i) in board.shipAt for i in range(length)):
+                    return Ship((x, y), length, d, name)
+    return None
+
+def sampleFleets(config:GameConfig, k:int, spacing:bool=False, workers:int=1):
+    """
+    Generate k fleets in bulk, spread across a process pool when workers is more than 1 (None uses every core).
+    Returns the same flat array of placement indices as FleetSampler.sampleMany, so config must be small enough for a FleetSampler.
+    """
+    if config.cells > MAX_SAMPLER_CELLS: raise ValueError("Board is too large for bulk fleet generation")
+    if workers is None: workers = os.cpu_count() or 1
+    if workers == 1:
+        return getSampler(config, spacing).sampleMany(k)
+    from concurrent.futures import ProcessPoolExecutor # only loaded when needed, it pulls in multiprocessing
+    chunks = [k // workers + (i < k % workers) for i in range(workers)]
+    rv = None
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_sampleChunk, config, n, spacing) for n in chunks]
+        for f in futures:
+            if rv is None: rv = f.result()
+            else: rv.extend(f.result())
+    return rv
+
+def _sampleChunk(config, k, spacing):
+    random.seed() # forked workers inherit the parent's random state
+    return getSampler(config, spacing).sampleMany(k)
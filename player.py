@@ -1,32 +1,45 @@
-from cpu import * # CPUs, Board, Ship, etc
+# This file contains the Player interface and the local (computer) player.
+# Online opponents are in remoteplayer.py, so importing this never loads the networking code.
+
+from board import Board, Result
+from cpu import CPU
+
+__all__ = ["Player", "ComputerPlayer"]
 
 class Player():
-    def __init__(self):
-        self.board = Board()
+    def __init__(self, board:Board=None):
+        self.board = Board() if board is None else board
+        self.goesFirst = None # true if this player moves first, false if they move second, None if the local side decides
     
-    def sendConfirmation(self): """Send confirmation to computer that local player has finished setting up their pieces."""; raise NotImplementedError()
+    def sendConfirmation(self, ships:list=None): """Send confirmation to computer that local player has finished setting up their pieces (ships is the local player's fleet)."""; raise NotImplementedError()
     def getConfirmation(self): """Wait for confirmation that other player is ready."""; raise NotImplementedError()
     def sendMove(self, move:tuple): """Send move to opponent. Returns the result of the move."""; raise NotImplementedError()
     def getMove(self): """Get move from opponent"""; raise NotImplementedError()
-    def sendMoveResult(self, move:tuple, result:Result): """Send an opponent a move they made and the result of the move."""; raise NotImplementedError()
+    def sendMoveResult(self, move:tuple, result:Result, shipName:str=None): """Send an opponent a move they made and the result of the move (and the name of the ship, if it sunk one)."""; raise NotImplementedError()
 
-class RemotePlayer(Player):
-    def __init__(self):
-        super().__init__()
+    def isDefeated(self):
+        """Return True if every one of this player's ships has been sunk."""
+        return len(self.board.aliveShips) == 0
 
-    def sendConfirmation(self):
-        pass
+    def thinkingTime(self, setup:bool=False):
+        """Return the minimum number of seconds the GUI should show this player as thinking before their next move (or their setup)."""
+        return 0
 
-    def getConfirmation(self):
+    def rematch(self):
+        """Return a fresh Player of the same kind for another game, or None if this one can't play again."""
+        return None
+
+    def close(self):
+        """Let go of anything the player holds on to (connections, threads) once the game is over."""
         pass
 
 class ComputerPlayer(Player):
-    def __init__(self, ai:CPU):
-        super().__init__()
+    def __init__(self, ai:CPU, board:Board=None):
+        super().__init__(board)
         self.ai = ai
         self.ai.setBoard(self.board)
     
-    def sendConfirmation(self):
+    def sendConfirmation(self, ships:list=None):
         pass
     
     def getConfirmation(self):
@@ -38,9 +51,14 @@ class ComputerPlayer(Player):
     
     def getMove(self):
         return self.ai.getMove()
+
+    def thinkingTime(self, setup:bool=False):
+        return self.ai.thinkingTime(setup)
+
+    def rematch(self):
+        return ComputerPlayer(self.ai.rematch(), Board(config=self.board.config))
     
-    def sendMoveResult(self, move:tuple, result:Result):
+    def sendMoveResult(self, move:tuple, result:Result, shipName:str=None):
         self.board.addMyShot(move, result)
-        self.ai.lastmove = move
-        self.ai.lastresult = result
+        self.ai.sendMoveResult(move, result, shipName)
         
\ No newline at end of file
@@ -0,0 +1,176 @@
+# This file contains the binary wire format used between the game server and its clients.
+#
+# Every message starts with a one byte opcode, and every message is self-delimiting, so several can be written in one go
+# and a reader can split them back up from any chunking of the byte stream.
+#
+#     MOVE    0x10                          cell                     fire a shot
+#     RESULT  0x20 | over << 2 | result     cell [ship]              result of your shot; ship is only there if result is SUNK
+#     SHOT    0x30 | over << 2 | result     cell                     your opponent's shot on your board
+#     JSON    0x00                          length, UTF-8 JSON       every other (rare) message
+#
+# cell is the cell index (see Board.cellIndex) as a varint, so one byte on boards of up to 128 cells and two bytes up to 16384.
+# result is the value of a board.Result. ship is a varint of (index in the fleet << 1 | vertical) followed by the cell of its top left space.
+# Cells and ships need the game config, so MOVE, RESULT and SHOT are only used once a "hosted" or "joined" message has gone by (in either direction);
+# before that, and for boards too big for two byte cells, they are sent as JSON like everything else.
+#
+# test_protocol.py round-trips every kind of message.
+
+import json
+
+from ship import Ship
+from config import GameConfig
+
+JSON = 0x00
+MOVE = 0x10
+RESULT = 0x20
+SHOT = 0x30
+OVER = 0x04 # flag in the opcode of RESULT and SHOT
+
+RESULTS = ("MISS", "HIT", "SUNK") # by board.Result value
+MAX_CELLS = 1 << 14 # largest board whose cells fit in two bytes
+MAX_JSON = 1 << 20 # longest JSON message accepted
+
+### SERIALIZATION ###
+def encodeShip(ship:Ship):
+    return [ship.pos[0], ship.pos[1], ship.length, ship.direction[0], ship.direction[1], ship.name]
+
+def decodeShip(data):
+    """Build a Ship from encodeShip's output. Raises ValueError if data isn't a ship."""
+    x, y, length, dx, dy, name = data
+    if (type(length) is not int) | ((dx, dy) not in Ship.POSSIBLE_DIRECTIONS): raise ValueError("Bad ship")
+    return Ship((int(x), int(y)), length, (dx, dy), str(name))
+
+def encodeConfig(config:GameConfig):
+    return {"width": config.width, "height": config.height, "fleet": [list(ship) for ship in config.fleet]}
+
+def decodeConfig(data):
+    """Build a GameConfig from encodeConfig's output. Raises ValueError if it isn't a valid config."""
+    try:
+        return GameConfig(int(data["width"]), int(data["height"]), tuple(data["fleet"]))
+    except (KeyError, TypeError) as e:
+        raise ValueError("Bad game config") from e
+
+### VARINTS ###
+def writeVarint(out:bytearray, n:int):
+    """Append n (which must not be negative) to out, 7 bits per byte, low bits first."""
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def readVarint(data, i:int):
+    """Return (value, index after it) for the varint at data[i]. Raises IndexError if data ends first."""
+    n = 0
+    shift = 0
+    while True:
+        b = data[i]
+        i += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80: return n, i
+        shift += 7
+        if shift > 63: raise ValueError("Varint is too long")
+
+class Codec():
+    """
+    Encoder and incremental decoder for both directions of one connection.
+    Messages are the same dicts that the rest of the code uses; only their encoding changes.
+    """
+    def __init__(self):
+        self.config = None # GameConfig of the current game, picked up from "hosted" and "joined" messages
+        self.buffer = bytearray() # received bytes that don't make a whole message yet
+
+    def useConfig(self, msg:dict):
+        if msg.get("type") in ("hosted", "joined"):
+            config = decodeConfig(msg["config"])
+            self.config = config if config.cells <= MAX_CELLS else None
+
+    def cell(self, pos):
+        x, y = pos
+        if not ((1 <= x <= self.config.width) & (1 <= y <= self.config.height)): raise ValueError("Position is off the board")
+        return (y - 1) * self.config.width + (x - 1)
+
+    def pos(self, cell:int):
+        if cell >= self.config.cells: raise ValueError("Cell is off the board")
+        return [cell % self.config.width + 1, cell // self.config.width + 1]
+
+    ### ENCODING ###
+    def encode(self, msg:dict, out:bytearray):
+        """Append the encoding of msg to out."""
+        msgType = msg["type"]
+        if (self.config is not None) and (msgType in ("move", "result", "shot")):
+            try:
+                self.encodeGame(msg, out)
+                return
+            except (KeyError, TypeError, ValueError):
+                pass # not something the binary format can express; send it as JSON
+        data = json.dumps(msg, separators=(",", ":")).encode()
+        out.append(JSON)
+        writeVarint(out, len(data))
+        out += data
+        self.useConfig(msg)
+
+    def encodeGame(self, msg:dict, out:bytearray):
+        start = len(out)
+        try:
+            if msg["type"] == "move":
+                out.append(MOVE)
+                writeVarint(out, self.cell(msg["pos"]))
+                return
+            result = RESULTS.index(msg["result"])
+            out.append((RESULT if msg["type"] == "result" else SHOT) | (OVER if msg["over"] else 0) | result)
+            writeVarint(out, self.cell(msg["pos"]))
+            if (msg["type"] == "result") & (result == 2):
+                x, y, length, dx, dy, name = msg["ship"]
+                i = [n for l, n in self.config.fleet].index(name)
+                if self.config.fleet[i][0] != length: raise ValueError("Ship doesn't match the fleet")
+                writeVarint(out, i << 1 | (dx == 0))
+                writeVarint(out, self.cell((min(x, x + dx * (length-1)), min(y, y + dy * (length-1)))))
+        except:
+            del out[start:]
+            raise
+
+    ### DECODING ###
+    def feed(self, data:bytes):
+        """Add received bytes and return a list of the messages they complete. Raises ValueError on malformed data."""
+        self.buffer += data
+        rv = []
+        i = 0
+        try:
+            while i < len(self.buffer):
+                msg, i = self.decode(self.buffer, i)
+                rv.append(msg)
+        except IndexError:
+            pass # the rest of the message hasn't arrived yet
+        del self.buffer[:i]
+        return rv
+
+    def decode(self, data, i:int):
+        """Return (message, index after it) for the message at data[i]. Raises IndexError if data ends first."""
+        op = data[i]
+        kind = op & 0xF0
+        if op == JSON:
+            length, j = readVarint(data, i + 1)
+            if length > MAX_JSON: raise ValueError("Message is too long")
+            if j + length > len(data): raise IndexError()
+            try:
+                msg = json.loads(bytes(data[j:j+length]))
+            except ValueError as e:
+                raise ValueError("Bad JSON message") from e
+            if not isinstance(msg, dict) or ("type" not in msg): raise ValueError("Message has no type")
+            self.useConfig(msg)
+            return msg, j + length
+        flags = op & 0x0F
+        if (self.config is None) or (kind not in (MOVE, RESULT, SHOT)) or (flags > (0 if kind == MOVE else OVER | 2)) or ((flags & 3) == 3):
+            raise ValueError(f"Unexpected opcode {op:#x}")
+
+        cell, j = readVarint(data, i + 1)
+        if kind == MOVE: return {"type": "move", "pos": self.pos(cell)}, j
+        result = op & 3
+        msg = {"type": "result" if kind == RESULT else "shot", "pos": self.pos(cell), "result": RESULTS[result], "over": bool(op & OVER)}
+        if (kind == RESULT) & (result == 2):
+            ship, j = readVarint(data, j)
+            origin, j = readVarint(data, j)
+            if ship >> 1 >= len(self.config.fleet): raise ValueError("Unknown ship")
+            length, name = self.config.fleet[ship >> 1]
+            msg["ship"] = self.pos(origin) + [length, 0, 1, name] if ship & 1 else self.pos(origin) + [length, 1, 0, name]
+        return msg, j
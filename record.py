@@ -0,0 +1,244 @@
+# This file contains the binary game record format: an append-only file of finished games, and a streaming reader that replays them.
+#
+# File layout:
+#     header   b"BSGR", version byte, varint length, game config as JSON (see protocol.encodeConfig)
+#     games    one after another, each a varint length followed by that many bytes:
+#                  first player (one byte, 0 or 1)
+#                  each player's fleet, in config fleet order: varint (cell of the ship's origin << 2 | index in Ship.POSSIBLE_DIRECTIONS)
+#                  every shot, players alternating from the first player: varint (cell << 2 | board.Result value)
+# Cells are numbered as in Board.cellIndex, so on the standard board a ship or a shot is 1-2 bytes. A whole game is about 165 bytes between
+# AdvancedCPUs and 330 between RandomCPUs, who take more shots.
+# Every game in a file has the same config. A partly written game at the end of a file (e.g. after a crash) is ignored by the reader.
+#
+# Run "python record.py FILE" to print a summary of a record file, and add "--verify" to replay every game in it.
+
+import os
+import json
+import mmap
+
+from ship import Ship
+from board import Board, Result
+from config import GameConfig
+from protocol import encodeConfig, decodeConfig, writeVarint, readVarint
+
+__all__ = ["GameEncoder", "GameWriter", "GameRecord", "RecordReader"]
+
+MAGIC = b"BSGR"
+VERSION = 2
+
+def encodeHeader(config:GameConfig):
+    data = json.dumps(encodeConfig(config), separators=(",", ":")).encode()
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    writeVarint(out, len(data))
+    return bytes(out + data)
+
+def decodeHeader(data):
+    """Return (config, index of the first game) for the header at the start of data. Raises ValueError if it isn't a record file."""
+    if bytes(data[:4]) != MAGIC: raise ValueError("Not a game record file")
+    if data[4] != VERSION: raise ValueError(f"Unsupported game record version {data[4]}")
+    try:
+        length, i = readVarint(data, 5)
+        return decodeConfig(json.loads(bytes(data[i:i+length]))), i + length
+    except IndexError as e:
+        raise ValueError("Game record header is truncated") from e
+
+class GameEncoder():
+    """
+    Encodes finished games into the record format, in memory. Call start() when both fleets are placed, shot() after every shot and finish() when the game is over.
+    Encoded games accumulate in data, which can be appended to a record file (with the same config) as is.
+    """
+    def __init__(self, config:GameConfig):
+        self.config = config
+        self.names = dict((name, i) for i, (length, name) in enumerate(config.fleet))
+        self.data = bytearray() # finished games
+        self.game = None # the game being recorded, without its length
+
+    def cell(self, pos):
+        return (pos[1] - 1) * self.config.width + (pos[0] - 1)
+
+    def start(self, first:int, fleets):
+        """
+        Start recording a game, dropping any game that was started but not finished.
+
+        :param first: index of the player who moves first (0 or 1)
+        :param fleets: each player's ships; every ship in the config's fleet must be there once
+        """
+        self.game = bytearray([first])
+        for fleet in fleets:
+            ships = [None] * len(self.config.fleet)
+            for ship in fleet:
+                ships[self.names[ship.name]] = ship
+            if None in ships: raise ValueError("Fleet doesn't match the game config")
+            for ship in ships:
+                writeVarint(self.game, self.cell(ship.pos) << 2 | Ship.POSSIBLE_DIRECTIONS.index(ship.direction))
+
+    def shot(self, pos, result:Result):
+        """Record the next shot of the game (players alternate, starting with the first player)."""
+        writeVarint(self.game, self.cell(pos) << 2 | result.value)
+
+    def finish(self):
+        """Finish the game being recorded and add it to data."""
+        writeVarint(self.data, len(self.game))
+        self.data += self.game
+        self.game = None
+
+class GameWriter(GameEncoder):
+    """
+    Records games straight to the end of a record file, creating it if needed. Each game is written when it's finished.
+    Raises ValueError if the file already holds games for a different config.
+    """
+    def __init__(self, path:str, config:GameConfig):
+        super().__init__(config)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with RecordReader(path) as reader:
+                if reader.config != config: raise ValueError(f"{path} holds games for a different config ({reader.config})")
+                end = reader.end()
+            if end < os.path.getsize(path): os.truncate(path, end) # drop a partly written game so new games follow the last whole one
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "ab")
+            self.file.write(encodeHeader(config))
+
+    def finish(self):
+        super().finish()
+        self.write(self.data)
+        self.data.clear()
+
+    def write(self, data:bytes):
+        """Append already encoded games (e.g. GameEncoder.data from a worker process)."""
+        self.file.write(data)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class GameRecord():
+    """One recorded game."""
+    __slots__ = ("config", "first", "fleets", "shots")
+
+    def __init__(self, config:GameConfig, first:int, fleets:tuple, shots:list):
+        self.config = config
+        self.first = first # index of the player who moved first
+        self.fleets = fleets # tuple of each player's list of Ships, in config fleet order
+        self.shots = shots # list of (pos, Result), players alternating from the first player
+
+    def shooter(self, i:int):
+        """Return the index of the player who fired shot i."""
+        return (self.first + i) % 2
+
+    def winner(self):
+        """Return the index of the player who fired the last shot (the winner, if the game was played to the end)."""
+        return self.shooter(len(self.shots) - 1)
+
+    def replay(self, boardClass=Board):
+        """
+        Play the game back onto a fresh board for each player and return the two boards.
+        Raises ValueError if a shot's recorded result doesn't match the result on the board.
+        """
+        boards = (boardClass(self.fleets[0], self.config), boardClass(self.fleets[1], self.config))
+        for i, (pos, recorded) in enumerate(self.shots):
+            shooter = self.shooter(i)
+            result = boards[1 - shooter].addEnemyShot(pos)
+            if result != recorded: raise ValueError(f"Shot {i} at {pos} was recorded as {recorded.name} but replays as {result.name}")
+            boards[shooter].addMyShot(pos, result)
+        return boards
+
+class RecordReader():
+    """
+    Reads a record file through a memory map and yields its games one at a time, so files with millions of games can be streamed
+    without loading them into memory. Use it as a context manager, or call close() when done.
+    """
+    def __init__(self, path:str):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b""
+        self.config, self.start = decodeHeader(self.data)
+        self.width = self.config.width
+        self.lengths = [length for length, name in self.config.fleet]
+        self.names = [name for length, name in self.config.fleet]
+        self.results = tuple(Result)
+
+    def __iter__(self):
+        for start, end in self.spans():
+            yield self.decodeGame(start, end)
+
+    def spans(self):
+        """Yield (start, end) of the bytes of every complete game in the file."""
+        data = self.data
+        i = self.start
+        while i < len(data):
+            try:
+                length, start = readVarint(data, i)
+            except IndexError:
+                return
+            if start + length > len(data): return # partly written game
+            yield start, start + length
+            i = start + length
+
+    def __len__(self):
+        return sum(1 for _ in self.spans())
+
+    def end(self):
+        """Return the index just past the last complete game."""
+        end = self.start
+        for start, end in self.spans(): pass
+        return end
+
+    def pos(self, cell:int):
+        return (cell % self.width + 1, cell // self.width + 1)
+
+    def decodeGame(self, start:int, end:int):
+        data = self.data
+        first = data[start]
+        i = start + 1
+        fleets = ([], [])
+        for fleet in fleets:
+            for length, name in zip(self.lengths, self.names):
+                n, i = readVarint(data, i)
+                fleet.append(Ship(self.pos(n >> 2), length, Ship.POSSIBLE_DIRECTIONS[n & 3], name))
+        shots = []
+        while i < end:
+            n, i = readVarint(data, i)
+            shots.append((self.pos(n >> 2), self.results[n & 3]))
+        return GameRecord(self.config, first, fleets, shots)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap): self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if __name__ == "__main__":
+    import argparse
+    from collections import Counter
+    parser = argparse.ArgumentParser(description="Summarize a game record file.")
+    parser.add_argument("file")
+    parser.add_argument("--verify", action="store_true", help="replay every game and check the recorded results")
+    args = parser.parse_args()
+
+    with RecordReader(args.file) as reader:
+        games = 0
+        wins = Counter()
+        shots = 0
+        for game in reader:
+            games += 1
+            wins[game.winner()] += 1
+            shots += len(game.shots)
+            if args.verify:
+                boards = game.replay()
+                if len(boards[1 - game.winner()].aliveShips) != 0: raise ValueError(f"Game {games} doesn't end with the loser's fleet sunk")
+        print(f"{games} games on {reader.config}")
+        if games:
+            print(f"player 0 won {wins[0]} games and player 1 won {wins[1]}, {shots / games:.1f} shots per game")
+            if args.verify: print("every game replayed correctly")
@@ -0,0 +1,144 @@
+# This file contains the player that stands in for an opponent on a game server (see server.py).
+
+import queue
+import asyncio
+import threading
+
+from board import Board, Result, DuplicateShotError
+from config import GameConfig
+from player import Player
+import network
+import protocol
+
+__all__ = ["RemotePlayer"]
+
+class RemotePlayer(Player):
+    """
+    Opponent playing through a game server (see server.py). The server holds both fleets and resolves every shot,
+    so this player's board only holds the shots fired at it and the ships that have been sunk.
+    Network I/O runs on an event loop in a background thread; every method blocks until the server has answered.
+    """
+    def __init__(self, host:str, port:int=network.DEFAULT_PORT, timeout:float=None):
+        """
+        :param timeout: seconds to wait for the server before raising TimeoutError, or None to wait forever
+        """
+        super().__init__()
+        self.timeout = timeout
+        self.name = "" # opponent's display name, once there is one
+        self.defeated = False
+        self.closed = False
+        self.inbox = queue.Queue() # messages from the server, with None once the connection is closed
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.connection = self.call(network.connect(host, port))
+        self.reader = self.call(self.startReading())
+
+    ### NETWORKING ###
+    def call(self, coro):
+        """Run coro on the network thread and return its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(self.timeout)
+
+    async def startReading(self):
+        return asyncio.create_task(self.readMessages())
+
+    async def stopReading(self):
+        self.reader.cancel()
+        self.connection.close()
+
+    async def readMessages(self):
+        while True:
+            msg = await self.connection.receive()
+            self.inbox.put(msg)
+            if msg is None: return
+
+    def send(self, msg:dict):
+        self.call(self.connection.send(msg))
+
+    def handle(self, msg):
+        """Deal with a message that can arrive at any time. Return True if it was one of those."""
+        if msg is None: raise ConnectionError("Lost connection to the server")
+        if msg["type"] == "error": raise ConnectionError(msg["message"])
+        if msg["type"] == "left": raise ConnectionError("Your opponent left the game")
+        if msg["type"] == "opponent":
+            self.name = msg["name"]
+            return True
+        return False
+
+    def expect(self, msgType:str):
+        """Wait for and return the next message of type msgType, raising ConnectionError if the server reports an error or the game ends early."""
+        while True:
+            try:
+                msg = self.inbox.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError("The server didn't answer in time")
+            if self.handle(msg): continue
+            if msg["type"] == msgType: return msg
+
+    def poll(self):
+        """Handle any messages that have already arrived without waiting for more."""
+        while True:
+            try:
+                msg = self.inbox.get_nowait()
+            except queue.Empty:
+                return
+            self.handle(msg)
+
+    def close(self):
+        """Disconnect from the server and stop the network thread. Anything waiting on the server gets a ConnectionError."""
+        if self.closed: return
+        self.closed = True
+        self.call(self.stopReading())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.inbox.put(None)
+
+    ### LOBBIES ###
+    def listLobbies(self):
+        """Return a list of (lobby name, host name, GameConfig) for every lobby waiting for an opponent."""
+        self.send({"type": "list"})
+        return [(l["lobby"], l["host"], protocol.decodeConfig(l["config"])) for l in self.expect("lobbies")["lobbies"]]
+
+    def host(self, lobby:str, name:str, config:GameConfig=None):
+        """Open a lobby called lobby, with name as the local player's display name."""
+        self.send({"type": "host", "lobby": lobby, "name": name, "config": None if config is None else protocol.encodeConfig(config)})
+        self.board = Board(config=protocol.decodeConfig(self.expect("hosted")["config"]))
+
+    def join(self, lobby:str, name:str):
+        """Join the lobby called lobby, with name as the local player's display name."""
+        self.send({"type": "join", "lobby": lobby, "name": name})
+        msg = self.expect("joined")
+        self.name = msg["opponent"]
+        self.board = Board(config=protocol.decodeConfig(msg["config"]))
+
+    def hasOpponent(self):
+        """Return True once someone has joined the lobby (without waiting)."""
+        self.poll()
+        return self.name != ""
+
+    ### GAME ###
+    def sendConfirmation(self, ships:list=None):
+        self.send({"type": "ships", "ships": [protocol.encodeShip(ship) for ship in ships]})
+
+    def getConfirmation(self):
+        self.goesFirst = not self.expect("start")["first"]
+        return True
+
+    def sendMove(self, move:tuple):
+        if move in self.board.enemyshots:
+            raise DuplicateShotError("There is already a shot there!")
+        self.send({"type": "move", "pos": move})
+        msg = self.expect("result")
+        result = Result[msg["result"]]
+        self.board.enemyshots[move] = result != Result.MISS
+        if result == Result.SUNK: self.board.deadShips.append(protocol.decodeShip(msg["ship"]))
+        self.defeated = msg["over"]
+        return result
+
+    def getMove(self):
+        msg = self.expect("shot")
+        return tuple(msg["pos"])
+
+    def sendMoveResult(self, move:tuple, result:Result, shipName:str=None):
+        pass # the server has already told the opponent
+
+    def isDefeated(self):
+        return self.defeated
@@ -0,0 +1,290 @@
+# This file contains the game server for online multiplayer.
+#
+# One asyncio event loop serves every connection, so a single process can host thousands of lobbies and games at once.
+# The server keeps both players' boards and resolves every shot itself; clients only ever learn what the rules let them see.
+#
+# Run "python server.py" to serve on the default port, or "python server.py --loadtest 1000" to play 1000 concurrent
+# games between bots over localhost against an in-process server and report the throughput.
+#
+# Messages are listed below as the dicts the code passes around; on the wire the frequent ones are a few bytes each (see protocol.py).
+# Client to server messages:
+#     {"type": "list"}                                          ask for the lobbies waiting for an opponent
+#     {"type": "host", "lobby": str, "name": str, "config": {}} open a lobby (config is optional and defaults to the standard game)
+#     {"type": "join", "lobby": str, "name": str}               join an open lobby
+#     {"type": "ships", "ships": [ship, ...]}                   place your fleet (see protocol.encodeShip)
+#     {"type": "move", "pos": [x, y]}                           fire a shot on your turn
+#     {"type": "leave"}                                         leave your lobby or game
+# Server to client messages:
+#     {"type": "lobbies", "lobbies": [{"lobby", "host", "config"}, ...]}
+#     {"type": "hosted", "lobby": str, "config": {}}
+#     {"type": "joined", "lobby": str, "config": {}, "opponent": str}
+#     {"type": "opponent", "name": str}                         someone joined your lobby
+#     {"type": "start", "first": bool}                          both fleets are placed; first is true if you move first
+#     {"type": "result", "pos", "result", "over", "ship"}       result of your shot; ship is only sent if it sunk one
+#     {"type": "shot", "pos", "result", "over"}                 your opponent's shot on your board
+#     {"type": "left"}                                          your opponent left or disconnected
+#     {"type": "error", "message": str}                         your last message was rejected
+
+import time
+import random
+import asyncio
+import argparse
+
+from board import Board, Result, DuplicateShotError
+from config import DEFAULT_CONFIG
+from placements import randomFleet
+from network import Connection, connect, DEFAULT_PORT
+from protocol import encodeShip, decodeShip, encodeConfig, decodeConfig
+
+class ProtocolError(Exception):
+    """Exception raised when a client sends a message that isn't allowed. The message is sent back to the client."""
+    def __init__(self, message):
+        super().__init__(message)
+
+class Seat():
+    """A connected client and its place in a lobby, if it has one."""
+    def __init__(self, connection:Connection):
+        self.connection = connection
+        self.name = ""
+        self.lobby = None
+        self.board = None # Board holding the player's fleet, once placed
+
+class Lobby():
+    """A lobby and, once both players have placed their fleets, the game being played in it."""
+    def __init__(self, name:str, config, host:Seat):
+        self.name = name
+        self.config = config
+        self.seats = [host]
+        self.turn = None # index in seats of the player to move, None until the game starts
+
+    def opponent(self, seat:Seat):
+        return self.seats[1 - self.seats.index(seat)] if len(self.seats) == 2 else None
+
+class GameServer():
+    def __init__(self):
+        # format - lobby name:str => Lobby
+        self.lobbies = {}
+        self.connections = 0
+        self.gamesPlayed = 0
+        self.handlers = {
+            "list": self.onList,
+            "host": self.onHost,
+            "join": self.onJoin,
+            "ships": self.onShips,
+            "move": self.onMove,
+            "leave": self.onLeave,
+        }
+
+    async def start(self, host:str="127.0.0.1", port:int=DEFAULT_PORT):
+        """Start listening and return the asyncio Server (port 0 picks a free port)."""
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def handle(self, reader, writer):
+        """Serve one client until it disconnects."""
+        seat = Seat(Connection(reader, writer))
+        self.connections += 1
+        try:
+            while True:
+                msg = await seat.connection.receive()
+                if msg is None: break
+                handler = self.handlers.get(msg.get("type"))
+                try:
+                    if handler is None: raise ProtocolError(f"Unknown message type {msg.get('type')!r}")
+                    await handler(seat, msg)
+                except ProtocolError as e:
+                    await seat.connection.send({"type": "error", "message": str(e)})
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            await self.leave(seat)
+            seat.connection.close()
+
+    async def notify(self, seat:Seat, msg:dict):
+        """Send msg to a client other than the one being served, ignoring it if that client is gone."""
+        try:
+            await seat.connection.send(msg)
+        except ConnectionError:
+            pass
+
+    async def leave(self, seat:Seat):
+        """Take seat out of its lobby, closing the lobby and telling the opponent if there is one."""
+        lobby = seat.lobby
+        if lobby is None: return
+        seat.lobby = None
+        seat.board = None
+        if self.lobbies.get(lobby.name) is lobby: del self.lobbies[lobby.name]
+        opponent = lobby.opponent(seat)
+        if opponent is not None:
+            opponent.lobby = None
+            opponent.board = None
+            await self.notify(opponent, {"type": "left"})
+
+    ### MESSAGE HANDLERS ###
+    async def onList(self, seat, msg):
+        lobbies = [{"lobby": l.name, "host": l.seats[0].name, "config": encodeConfig(l.config)} for l in self.lobbies.values() if len(l.seats) == 1]
+        await seat.connection.send({"type": "lobbies", "lobbies": lobbies})
+
+    async def onHost(self, seat, msg):
+        if seat.lobby is not None: raise ProtocolError("You are already in a lobby")
+        name = str(msg.get("lobby", ""))
+        if name == "": raise ProtocolError("Lobby name can't be empty")
+        if name in self.lobbies: raise ProtocolError(f"There is already a lobby called \"{name}\"")
+        try:
+            config = DEFAULT_CONFIG if msg.get("config") is None else decodeConfig(msg["config"])
+        except ValueError as e:
+            raise ProtocolError(str(e))
+        seat.name = str(msg.get("name", ""))
+        seat.lobby = self.lobbies[name] = Lobby(name, config, seat)
+        await seat.connection.send({"type": "hosted", "lobby": name, "config": encodeConfig(config)})
+
+    async def onJoin(self, seat, msg):
+        if seat.lobby is not None: raise ProtocolError("You are already in a lobby")
+        lobby = self.lobbies.get(str(msg.get("lobby", "")))
+        if lobby is None: raise ProtocolError("There is no lobby with that name")
+        if len(lobby.seats) == 2: raise ProtocolError("That lobby is full")
+        seat.name = str(msg.get("name", ""))
+        seat.lobby = lobby
+        lobby.seats.append(seat)
+        host = lobby.seats[0]
+        await seat.connection.send({"type": "joined", "lobby": lobby.name, "config": encodeConfig(lobby.config), "opponent": host.name})
+        await self.notify(host, {"type": "opponent", "name": seat.name})
+
+    async def onShips(self, seat, msg):
+        lobby = seat.lobby
+        if (lobby is None) or (len(lobby.seats) < 2): raise ProtocolError("You don't have an opponent yet")
+        if seat.board is not None: raise ProtocolError("You have already placed your ships")
+        try:
+            ships = [decodeShip(s) for s in msg["ships"]]
+        except (KeyError, TypeError, ValueError):
+            raise ProtocolError("Bad ship list")
+        if sorted((s.length, s.name) for s in ships) != sorted(lobby.config.fleet): raise ProtocolError("Those ships don't match the game's fleet")
+        board = Board(config=lobby.config)
+        for ship in ships:
+            if board.isShipValid(ship) != 0: raise ProtocolError(f"The {ship.name} is out of bounds or inside another ship")
+            board.addShip(ship)
+        seat.board = board
+
+        if all(s.board is not None for s in lobby.seats):
+            lobby.turn = random.randrange(2)
+            for i, s in enumerate(lobby.seats):
+                await self.notify(s, {"type": "start", "first": i == lobby.turn})
+
+    async def onMove(self, seat, msg):
+        lobby = seat.lobby
+        if (lobby is None) or (lobby.turn is None): raise ProtocolError("The game hasn't started")
+        if lobby.seats[lobby.turn] is not seat: raise ProtocolError("It isn't your turn")
+        try:
+            x, y = msg["pos"]
+        except (KeyError, TypeError, ValueError):
+            raise ProtocolError("Bad position")
+        if (type(x) is not int) | (type(y) is not int) or not ((1 <= x <= lobby.config.width) & (1 <= y <= lobby.config.height)):
+            raise ProtocolError("That position is off the board")
+
+        target = lobby.opponent(seat)
+        try:
+            result = target.board.addEnemyShot((x, y))
+        except DuplicateShotError as e:
+            raise ProtocolError(str(e))
+        over = len(target.board.aliveShips) == 0
+        reply = {"type": "result", "pos": [x, y], "result": result.name, "over": over}
+        if result == Result.SUNK: reply["ship"] = encodeShip(target.board.lastShipSunk())
+
+        if over:
+            # the game is over, so both players are free to host or join another one
+            del self.lobbies[lobby.name]
+            for s in lobby.seats:
+                s.lobby = None
+                s.board = None
+            self.gamesPlayed += 1
+        else:
+            lobby.turn = 1 - lobby.turn
+        await seat.connection.send(reply)
+        await self.notify(target, {"type": "shot", "pos": [x, y], "result": result.name, "over": over})
+
+    async def onLeave(self, seat, msg):
+        await self.leave(seat)
+
+### LOAD TEST ###
+async def expect(connection:Connection, msgType:str):
+    """Return the next message from connection, raising ConnectionError unless it has type msgType."""
+    msg = await connection.receive()
+    if msg is None: raise ConnectionError("Server closed the connection")
+    if msg["type"] != msgType: raise ConnectionError(f"Expected a {msgType} message, got {msg}")
+    return msg
+
+async def botGame(host:str, port:int, lobbyName:str, hosted:asyncio.Event=None):
+    """
+    Connect a bot that places a random fleet and fires at random, and play one game in lobby lobbyName. Return True if the bot won.
+    The bot hosts the lobby if hosted is given (and sets it once the lobby is open), and joins it otherwise.
+    """
+    connection = await connect(host, port)
+    try:
+        if hosted is not None:
+            await connection.send({"type": "host", "lobby": lobbyName, "name": "host"})
+            config = decodeConfig((await expect(connection, "hosted"))["config"])
+            hosted.set()
+            await expect(connection, "opponent")
+        else:
+            await connection.send({"type": "join", "lobby": lobbyName, "name": "guest"})
+            config = decodeConfig((await expect(connection, "joined"))["config"])
+
+        board = Board(config=config)
+        await connection.send({"type": "ships", "ships": [encodeShip(ship) for ship in randomFleet(board)]})
+        myturn = (await expect(connection, "start"))["first"]
+        while True:
+            if myturn:
+                move = board.getUnshotPool().pick()
+                await connection.send({"type": "move", "pos": move})
+                msg = await expect(connection, "result")
+                board.addMyShot(move, Result[msg["result"]])
+            else:
+                msg = await expect(connection, "shot")
+            if msg["over"]: return myturn
+            myturn = not myturn
+    finally:
+        connection.close()
+
+async def loadTest(games:int, host:str="127.0.0.1", port:int=0):
+    """Play games concurrent bot games against a server (an in-process one if port is 0) and return how many seconds they took."""
+    server = None
+    if port == 0:
+        gameServer = GameServer()
+        server = await gameServer.start(host, 0)
+        port = server.sockets[0].getsockname()[1]
+
+    async def game(i):
+        hosted = asyncio.Event()
+        hostTask = asyncio.create_task(botGame(host, port, f"load-{i}", hosted))
+        await hosted.wait()
+        await botGame(host, port, f"load-{i}")
+        await hostTask
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(game(i) for i in range(games)))
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    return time.perf_counter() - start
+
+async def serve(host:str, port:int):
+    gameServer = GameServer()
+    server = await gameServer.start(host, port)
+    print(f"Serving on {', '.join(str(s.getsockname()) for s in server.sockets)}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Battleship game server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--loadtest", type=int, metavar="GAMES", help="play GAMES concurrent bot games over localhost against an in-process server and exit")
+    args = parser.parse_args()
+
+    if args.loadtest is None:
+        asyncio.run(serve(args.host, args.port))
+    else:
+        elapsed = asyncio.run(loadTest(args.loadtest, args.host))
+        print(f"{args.loadtest} concurrent games in {elapsed:.2f}s ({args.loadtest / elapsed:.0f} games/sec)")
@@ -1,5 +1,13 @@
 class Ship():
+    """
+    A ship placement: origin, length, direction and name, plus the spaces it covers.
+    Ships are compared and hashed by value so they can be used as dict keys; don't change one after creating it. Moving or rotating a ship makes a new one
+    with translated() or rotated(), which is cheap enough to call on every keypress or in placement-heavy loops, so ships never need to be copied.
+    """
     POSSIBLE_DIRECTIONS = (1, 0), (0, 1), (-1, 0), (0, -1)
+    CLOCKWISE = {(1, 0): (0, 1), (0, 1): (-1, 0), (-1, 0): (0, -1), (0, -1): (1, 0)} # direction => direction after one clockwise rotation
+
+    __slots__ = ("pos", "length", "direction", "name", "spaces", "hash", "mask")
 
     def __init__(self, pos:tuple, l:int, d:tuple, name:str=""):
         """
@@ -8,41 +16,43 @@ class Ship():
         :param d: tuple(int, int) for direction the ship is pointing in; can be (1, 0), (0, 1), (-1, 0), or (0, -1)
         :param name: name/id of the ship
         """
-        if d not in Ship.POSSIBLE_DIRECTIONS: raise(ValueError, "Bad direction value")
-        self.name = name
-        self.pos = pos
+        if d not in Ship.CLOCKWISE: raise ValueError("Bad direction value")
+        x, y = pos
+        if d[0] < 0: x -= l - 1 # walk the spaces from the top left, so they come out sorted
+        if d[1] < 0: y -= l - 1
+        self.pos = (pos[0], pos[1])
         self.length = l
         self.direction = d
-        self.generateSpaces()
-    
-    def generateSpaces(self):
-        """Generate spaces list for ship based on position, length, and direction. ONLY use this function in SETUP PHASE"""
-        self.spaces = [] # all spaces the ship occupies
-        for i in range(0, self.length):
-            self.spaces.append((self.pos[0] + self.direction[0]*i, self.pos[1] + self.direction[1]*i))
-        self.spaces.sort()
-
-    def translate(self, transVector:tuple):
-        """Translate the ship based on translation vector. ONLY use this function in SETUP PHASE"""
-        self.pos = (self.pos[0] + transVector[0], self.pos[1] + transVector[1])
-        for i in range(0, len(self.spaces)):
-            self.spaces[i] = (self.spaces[i][0] + transVector[0], self.spaces[i][1] + transVector[1])
-        self.spaces.sort()
-    
-    def rotate(self):
-        """Rotate the ship clockwise one time. ONLY use this function in SETUP PHASE"""
-        # change direction var
-        if self.direction == (1, 0):
-            self.direction = (0, 1)
-        elif self.direction == (0, 1):
-            self.direction = (-1, 0)
-        elif self.direction == (-1, 0):
-            self.direction = (0, -1)
-        elif self.direction == (0, -1):
-            self.direction = (1, 0)
-        else: raise(ValueError, "Bad direction value")
-
-        self.generateSpaces()
-    
-    def isSunk(self):
-        return len(self.spaces) == 0
\ No newline at end of file
+        self.name = name
+        self.spaces = tuple([(x + i, y) for i in range(l)] if d[1] == 0 else [(x, y + i) for i in range(l)]) # all spaces the ship occupies, sorted (spaces[0] is the top left)
+        self.hash = hash((self.pos, l, d, name))
+        self.mask = None # (board width, cell mask), filled in by cellMask
+
+    def __eq__(self, other):
+        return isinstance(other, Ship) and (self.pos, self.length, self.direction, self.name) == (other.pos, other.length, other.direction, other.name)
+
+    def __hash__(self):
+        return self.hash
+
+    def __repr__(self):
+        return f"Ship({self.pos}, {self.length}, {self.direction}, {self.name!r})"
+
+    def __reduce__(self):
+        return (Ship, (self.pos, self.length, self.direction, self.name))
+
+    def translated(self, transVector:tuple):
+        """Return a copy of this ship moved by the translation vector."""
+        return Ship((self.pos[0] + transVector[0], self.pos[1] + transVector[1]), self.length, self.direction, self.name)
+
+    def rotated(self):
+        """Return a copy of this ship rotated clockwise one time about its origin."""
+        return Ship(self.pos, self.length, Ship.CLOCKWISE[self.direction], self.name)
+
+    def cellMask(self, width:int):
+        """Return the bitmask of the ship's cells on a board width cells wide (see Board.cellIndex). Assumes the ship is in bounds."""
+        if (self.mask is None) or (self.mask[0] != width):
+            x, y = self.spaces[0]
+            stride = 1 if self.direction[1] == 0 else width # distance between the cells of consecutive spaces
+            # one bit every stride bits, length times: the repunit of length digits in base 2**stride
+            self.mask = (width, ((1 << stride * self.length) - 1) // ((1 << stride) - 1) << ((y - 1) * width + (x - 1)))
+        return self.mask[1]
@@ -0,0 +1,191 @@
+# This file contains the headless match engine used to play CPU vs CPU games without a GUI.
+
+import os
+import time
+import random
+from collections import Counter
+
+import cpu as cpumodule
+from core import * # ComputerPlayer, CPUs, Board, Ship, etc
+
+def playGame(cpuA, cpuB, firstPlayer=None, boardClass=Board, config:GameConfig=None, recorder=None):
+    """
+    Play one full game between two CPUs and return the winner and the number of shots it took them.
+
+    :param cpuA: CPU subclass used by player A
+    :param cpuB: CPU subclass used by player B
+    :param firstPlayer: 0 if player A moves first, 1 if player B does, None to pick randomly
+    :param boardClass: Board implementation used by both players
+    :param config: board size and fleet (defaults to the standard game)
+    :param recorder: optional record.GameEncoder (or GameWriter) to record the game with
+    :return: tuple(int, int) - index of the winner (0 for A, 1 for B) and the number of shots the winner fired
+    """
+    players = (ComputerPlayer(cpuA(False), boardClass(config=config)), ComputerPlayer(cpuB(False), boardClass(config=config)))
+    for p in players:
+        p.getConfirmation()
+
+    turn = random.getrandbits(1) if firstPlayer is None else firstPlayer
+    if recorder is not None: recorder.start(turn, [list(p.board.aliveShips) for p in players])
+    shots = [0, 0]
+    while True:
+        shooter = players[turn]
+        target = players[1-turn]
+        move = shooter.getMove()
+        result = target.sendMove(move)
+        shooter.sendMoveResult(move, result, target.board.lastShipSunk().name if result == Result.SUNK else None)
+        shots[turn] += 1
+        if recorder is not None: recorder.shot(move, result)
+        if result == Result.SUNK and len(target.board.aliveShips) == 0:
+            if recorder is not None: recorder.finish()
+            return turn, shots[turn]
+        turn = 1 - turn
+
+def playGames(cpuA, cpuB, games:int, seed=None, config:GameConfig=None, record:bool=False, boardClass=Board):
+    """
+    Play a batch of games in this process and return the shots-to-win counters for both players, and the encoded game records
+    (bytes in the record.py format, without a header) if record is true, or None otherwise.
+    This is the unit of work handed to each worker process by runMatch.
+    """
+    random.seed(seed) # forked workers inherit the parent's random state, so always reseed
+    shotsToWin = (Counter(), Counter())
+    recorder = None
+    if record:
+        from record import GameEncoder
+        recorder = GameEncoder(DEFAULT_CONFIG if config is None else config)
+    for _ in range(games):
+        winner, shots = playGame(cpuA, cpuB, boardClass=boardClass, config=config, recorder=recorder)
+        shotsToWin[winner][shots] += 1
+    return shotsToWin, None if recorder is None else bytes(recorder.data)
+
+class MatchResults():
+    """Aggregate results of a match between two CPUs."""
+    def __init__(self, cpuA, cpuB):
+        self.cpuA = cpuA
+        self.cpuB = cpuB
+        self.games = 0
+        self.elapsed = 0.0
+        # shots-to-win distribution for each player
+        # format - shots:int => games won with that many shots:int
+        self.shotsToWin = (Counter(), Counter())
+
+    def merge(self, shotsToWin):
+        """Add a pair of shots-to-win counters returned by playGames to the results."""
+        for i in (0, 1):
+            self.shotsToWin[i].update(shotsToWin[i])
+            self.games += sum(shotsToWin[i].values())
+
+    def wins(self, player:int):
+        return sum(self.shotsToWin[player].values())
+
+    def winRate(self, player:int):
+        if self.games == 0: return 0.0
+        return self.wins(player) / self.games
+
+    def meanShotsToWin(self, player:int):
+        wins = self.wins(player)
+        if wins == 0: return None
+        return sum(shots * n for shots, n in self.shotsToWin[player].items()) / wins
+
+    def gamesPerSecond(self):
+        if self.elapsed == 0: return 0.0
+        return self.games / self.elapsed
+
+    def summary(self):
+        """Return a human readable summary of the match."""
+        lines = [f"{self.games} games in {self.elapsed:.2f}s ({self.gamesPerSecond():.0f} games/sec)"]
+        for i, c in enumerate((self.cpuA, self.cpuB)):
+            mean = self.meanShotsToWin(i)
+            meantxt = "n/a" if mean is None else f"{mean:.2f}"
+            lines.append(f"{c.__name__}: {self.wins(i)} wins ({100*self.winRate(i):.1f}%), mean shots to win {meantxt}")
+        return "\n".join(lines)
+
+def runMatch(cpuA, cpuB, games:int, workers=None, chunkSize=None, seed=None, config:GameConfig=None, record:str=None, boardClass=Board):
+    """
+    Play games between two CPUs spread across a process pool and return a MatchResults object.
+
+    :param cpuA: CPU subclass used by player A
+    :param cpuB: CPU subclass used by player B
+    :param games: total number of games to play
+    :param workers: number of worker processes (defaults to the number of cores); 1 plays every game in this process
+    :param chunkSize: number of games handed to a worker at a time
+    :param seed: optional seed so that a match can be reproduced
+    :param config: board size and fleet (defaults to the standard game)
+    :param record: optional path of a record file to append every game to (player 0 is cpuA)
+    :param boardClass: Board implementation used by both players (Board or BitBoard)
+    """
+    if workers is None: workers = os.cpu_count() or 1
+    if chunkSize is None: chunkSize = max(1, min(1000, games // (workers * 4)))
+    chunks = [min(chunkSize, games - start) for start in range(0, games, chunkSize)]
+    seeds = [None if seed is None else seed + i for i in range(len(chunks))]
+
+    writer = None
+    if record is not None:
+        from record import GameWriter
+        writer = GameWriter(record, DEFAULT_CONFIG if config is None else config)
+
+    results = MatchResults(cpuA, cpuB)
+    start = time.perf_counter()
+    def merge(shotsToWin, records):
+        results.merge(shotsToWin)
+        if writer is not None: writer.write(records)
+    try:
+        if workers == 1:
+            for n, s in zip(chunks, seeds):
+                merge(*playGames(cpuA, cpuB, n, s, config, writer is not None, boardClass))
+        else:
+            from concurrent.futures import ProcessPoolExecutor # only loaded when needed, it pulls in multiprocessing
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                n = len(chunks)
+                for rv in pool.map(playGames, [cpuA]*n, [cpuB]*n, chunks, seeds, [config]*n, [writer is not None]*n, [boardClass]*n):
+                    merge(*rv)
+    finally:
+        if writer is not None: writer.close()
+    results.elapsed = time.perf_counter() - start
+    return results
+
+def getCPUClass(name:str):
+    """Look up a CPU subclass in the cpu module by its class name."""
+    c = getattr(cpumodule, name, None)
+    if not (isinstance(c, type) and issubclass(c, CPU)) or c is CPU:
+        raise ValueError(f"Unknown CPU \"{name}\"")
+    return c
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Play CPU vs CPU Battleship games without a GUI.")
+    parser.add_argument("cpuA", help="class name of the first CPU, e.g. RandomCPU")
+    parser.add_argument("cpuB", help="class name of the second CPU, e.g. IntermediateCPU")
+    parser.add_argument("-n", "--games", type=int, default=1000)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=10)
+    parser.add_argument("--board", choices=("Board", "BitBoard"), default="Board", help="board implementation to play on")
+    parser.add_argument("--instrument", metavar="FILE", help="record per-method latencies and write them to FILE as JSON (plays every game in this process)")
+    parser.add_argument("--profile", metavar="FILE", nargs="?", const="", help="run under cProfile, optionally saving the raw stats to FILE (plays every game in this process)")
+    parser.add_argument("--record", metavar="FILE", help="append every game to the record file FILE (see record.py)")
+    parser.add_argument("--book-a", metavar="FILE", help="set up the first CPU's ships from the fleet book FILE (see heatmap.py)")
+    parser.add_argument("--book-b", metavar="FILE", help="set up the second CPU's ships from the fleet book FILE")
+    args = parser.parse_args()
+
+    config = GameConfig(args.width, args.height)
+    workers = 1 if (args.instrument is not None) | (args.profile is not None) else args.workers
+    cpus = [getCPUClass(args.cpuA), getCPUClass(args.cpuB)]
+    for i, book in enumerate((args.book_a, args.book_b)):
+        if book is not None:
+            from heatmap import PlacedCPU
+            cpus[i] = PlacedCPU(cpus[i], book)
+    match = (cpus[0], cpus[1], args.games, workers)
+    options = dict(seed=args.seed, config=config, record=args.record, boardClass=BitBoard if args.board == "BitBoard" else Board)
+    if args.instrument is not None:
+        import instrument
+        instrument.enable()
+    if args.profile is not None:
+        import instrument
+        results = instrument.profile(runMatch, *match, **options, output=args.profile or None)
+    else:
+        results = runMatch(*match, **options)
+    print(results.summary())
+    if args.instrument is not None:
+        instrument.dump()
+        instrument.save(args.instrument)
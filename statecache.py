@@ -0,0 +1,39 @@
+# This file contains the cache CPUs use to remember work done on board states they have seen before.
+
+from collections import OrderedDict
+
+class StateCache():
+    """
+    Bounded least recently used cache of values computed from a targeting board state, such as the best cells of a heat map.
+    Keys are normally (Board.shotHash, remaining fleet, ...), so the same state reached in different games (or in a different shot order) hits the same entry.
+    The hash is 64 bits, so a collision is possible but very unlikely; callers should still sanity check what they get back (e.g. that a move is unshot).
+    """
+    def __init__(self, maxsize:int=1 << 16):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        """Return the value stored for key (marking it as recently used), or default if there isn't one."""
+        value = self.entries.get(key, default)
+        if value is default:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store value for key, dropping the least recently used entry if the cache is full."""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize: self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,84 @@
+# Tests that BitBoard behaves like Board. Run with "python -m pytest" or "python -m unittest test_board".
+
+import random
+import unittest
+
+from ship import Ship
+from board import Board, BitBoard, Result, DuplicateShotError
+from config import GameConfig
+from placements import randomFleet
+
+class BoardTest(unittest.TestCase):
+    def boards(self, config:GameConfig=None):
+        """Return a Board and a BitBoard with the same random fleet on them."""
+        board = Board(config=config)
+        ships = randomFleet(board)
+        return Board(ships, config), BitBoard(ships, config)
+
+    def testSameResults(self):
+        random.seed(1)
+        for config in (None, GameConfig(7, 12)):
+            board, bitboard = self.boards(config)
+            shots = [(x, y) for x in range(1, board.MAX_X+1) for y in range(1, board.MAX_Y+1)]
+            random.shuffle(shots)
+            for pos in shots:
+                self.assertEqual(board.addEnemyShot(pos), bitboard.addEnemyShot(pos))
+                self.assertEqual(board.enemyshots, dict(bitboard.enemyshots))
+            self.assertEqual(board.deadShips, bitboard.deadShips)
+            self.assertEqual(bitboard.enemyhitmask, bitboard.occupiedmask)
+
+    def testDuplicateShots(self):
+        for board in self.boards():
+            board.addEnemyShot((3, 3))
+            with self.assertRaises(DuplicateShotError):
+                board.addEnemyShot((3, 3))
+            board.addMyShot((3, 3), Result.MISS)
+            with self.assertRaises(DuplicateShotError):
+                board.addMyShot((3, 3), Result.HIT)
+
+    def testShotsOffTheBoard(self):
+        for board in self.boards():
+            for pos in ((11, 1), (0, 1), (1, 0), (1, 11), (-1, 5)):
+                with self.assertRaisesRegex(ValueError, "off the board"):
+                    board.addEnemyShot(pos)
+            self.assertEqual(len(board.enemyshots), 0)
+
+    def testWritableEnemyShots(self):
+        # RemotePlayer keeps track of its shots by writing them into enemyshots
+        board = BitBoard()
+        board.enemyshots[(2, 3)] = True
+        board.enemyshots[(4, 5)] = False
+        self.assertIn((2, 3), board.enemyshots)
+        self.assertNotIn((11, 1), board.enemyshots)
+        self.assertEqual(dict(board.enemyshots), {(2, 3): True, (4, 5): False})
+        board.enemyshots[(2, 3)] = False
+        del board.enemyshots[(4, 5)]
+        self.assertEqual(board.enemyshots, {(2, 3): False})
+        with self.assertRaises(DuplicateShotError):
+            board.addEnemyShot((2, 3))
+
+    def testIsShipValid(self):
+        for board in self.boards(GameConfig(8, 6)):
+            for x in range(-1, 11):
+                for y in range(-1, 9):
+                    for d in Ship.POSSIBLE_DIRECTIONS:
+                        ship = Ship((x, y), 3, d)
+                        expected = 1 if any(not (1 <= sx <= 8 and 1 <= sy <= 6) for sx, sy in ship.spaces) else (2 if any(s in board.shipAt for s in ship.spaces) else 0)
+                        self.assertEqual(board.isShipValid(ship), expected, ship)
+
+    def testUnshotPool(self):
+        random.seed(2)
+        for board in self.boards(GameConfig(5, 4)):
+            pool = board.getUnshotPool()
+            seen = set()
+            while len(pool):
+                pos = pool.pick(parity=True)
+                self.assertNotIn(pos, seen)
+                if len(seen) < 10: self.assertEqual(sum(pos) % 2, 0) # the 10 even cells come first
+                seen.add(pos)
+                board.addMyShot(pos, Result.MISS)
+            self.assertEqual(len(seen), 20)
+            self.assertIsNone(pool.pick())
+
+if __name__ == "__main__":
+    unittest.main()
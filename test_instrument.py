@@ -0,0 +1,42 @@
+# Tests for the latency histogram in instrument.py. Run with "python -m pytest" or "python -m unittest test_instrument".
+
+import random
+import unittest
+
+from instrument import Histogram
+
+class HistogramTest(unittest.TestCase):
+    def testBucketsHoldTheirValues(self):
+        for ns in range(5000):
+            bucket = Histogram.bucket(ns)
+            self.assertGreaterEqual(Histogram.bucketTop(bucket), ns)
+            self.assertLessEqual(Histogram.bucketTop(bucket), ns * 1.25 + 1)
+            if ns > 0 and Histogram.bucket(ns - 1) != bucket:
+                # a new bucket starts just above the top of the last one
+                self.assertEqual(Histogram.bucketTop(Histogram.bucket(ns - 1)), ns - 1)
+
+    def testSmallValues(self):
+        for ns in range(11):
+            h = Histogram()
+            h.add(ns)
+            for p in (0, 50, 100):
+                self.assertEqual(h.percentile(p), ns)
+
+    def testPercentiles(self):
+        random.seed(1)
+        h = Histogram()
+        values = sorted(random.randrange(1, 10**6) for _ in range(1000))
+        for ns in values:
+            h.add(ns)
+        self.assertEqual((h.count, h.min, h.max, h.total), (1000, values[0], values[-1], sum(values)))
+        for p in (50, 90, 99):
+            exact = values[p * 10 - 1]
+            self.assertGreaterEqual(h.percentile(p), exact)
+            self.assertLessEqual(h.percentile(p), exact * 1.25)
+
+    def testEmpty(self):
+        self.assertEqual(Histogram().percentile(50), 0)
+        self.assertEqual(Histogram().toDict()["mean_us"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+# Round-trip tests for the binary wire format in protocol.py. Run with "python -m pytest" or "python -m unittest test_protocol".
+
+import unittest
+
+import protocol
+from protocol import Codec, writeVarint, readVarint, encodeConfig, JSON, MOVE, RESULT, SHOT, OVER
+from config import GameConfig, DEFAULT_CONFIG
+
+def joined(config:GameConfig):
+    return {"type": "joined", "lobby": "test", "config": encodeConfig(config), "opponent": "host"}
+
+class ProtocolTest(unittest.TestCase):
+    def codecs(self, config:GameConfig=DEFAULT_CONFIG):
+        """Return a (sender, receiver) pair of codecs that have both seen the config."""
+        sender = Codec()
+        receiver = Codec()
+        self.assertEqual(receiver.feed(self.encode(sender, joined(config))), [joined(config)])
+        return sender, receiver
+
+    def encode(self, codec:Codec, msg:dict):
+        out = bytearray()
+        codec.encode(msg, out)
+        return bytes(out)
+
+    def roundTrip(self, msg:dict, config:GameConfig=DEFAULT_CONFIG):
+        """Encode msg, check that it decodes back to itself, and return its encoding."""
+        sender, receiver = self.codecs(config)
+        data = self.encode(sender, msg)
+        self.assertEqual(receiver.feed(data), [msg])
+        self.assertEqual(receiver.buffer, bytearray())
+        return data
+
+    ### VARINTS ###
+    def testVarints(self):
+        for n in (0, 1, 0x7F, 0x80, 0x3FFF, 0x4000, 1 << 40):
+            out = bytearray()
+            writeVarint(out, n)
+            self.assertEqual(readVarint(out, 0), (n, len(out)))
+        for n, size in ((0x7F, 1), (0x80, 2), (0x3FFF, 2), (0x4000, 3)):
+            out = bytearray()
+            writeVarint(out, n)
+            self.assertEqual(len(out), size)
+
+    def testTruncatedVarint(self):
+        out = bytearray()
+        writeVarint(out, 300)
+        with self.assertRaises(IndexError):
+            readVarint(out[:-1], 0)
+
+    ### MESSAGES ###
+    def testMove(self):
+        self.assertEqual(self.roundTrip({"type": "move", "pos": [1, 1]}), bytes([MOVE, 0]))
+        self.assertEqual(self.roundTrip({"type": "move", "pos": [10, 10]}), bytes([MOVE, 99]))
+
+    def testTwoByteCells(self):
+        config = GameConfig(20, 20)
+        self.assertEqual(len(self.roundTrip({"type": "move", "pos": [8, 7]}, config)), 2) # cell 127
+        self.assertEqual(len(self.roundTrip({"type": "move", "pos": [9, 7]}, config)), 3) # cell 128
+        self.assertEqual(len(self.roundTrip({"type": "move", "pos": [20, 20]}, config)), 3)
+        self.roundTrip({"type": "shot", "pos": [20, 19], "result": "HIT", "over": False}, config)
+        self.roundTrip({"type": "result", "pos": [20, 20], "result": "SUNK", "over": False, "ship": [16, 20, 5, 1, 0, "Carrier"]}, config)
+
+    def testResult(self):
+        for result in ("MISS", "HIT"):
+            for over in (False, True):
+                data = self.roundTrip({"type": "result", "pos": [4, 7], "result": result, "over": over})
+                self.assertEqual(data[0], RESULT | (OVER if over else 0) | protocol.RESULTS.index(result))
+                self.assertEqual(len(data), 2)
+
+    def testResultWithSunkShip(self):
+        self.roundTrip({"type": "result", "pos": [4, 7], "result": "SUNK", "over": True, "ship": [2, 7, 3, 1, 0, "Submarine"]})
+        self.roundTrip({"type": "result", "pos": [4, 7], "result": "SUNK", "over": False, "ship": [4, 3, 5, 0, 1, "Carrier"]})
+
+    def testSunkShipIsSentFromItsTopLeft(self):
+        sender, receiver = self.codecs()
+        msg = {"type": "result", "pos": [4, 7], "result": "SUNK", "over": False, "ship": [4, 7, 3, -1, 0, "Destroyer"]}
+        decoded, = receiver.feed(self.encode(sender, msg))
+        self.assertEqual(decoded["ship"], [2, 7, 3, 1, 0, "Destroyer"])
+
+    def testShot(self):
+        for result in protocol.RESULTS:
+            for over in (False, True):
+                data = self.roundTrip({"type": "shot", "pos": [9, 2], "result": result, "over": over})
+                self.assertEqual(data[0], SHOT | (OVER if over else 0) | protocol.RESULTS.index(result))
+
+    ### JSON FALLBACK ###
+    def testJSON(self):
+        data = self.roundTrip({"type": "left"})
+        self.assertEqual(data[0], JSON)
+
+    def testJSONBeforeConfig(self):
+        sender = Codec()
+        receiver = Codec()
+        msg = {"type": "move", "pos": [1, 1]}
+        data = self.encode(sender, msg)
+        self.assertEqual(data[0], JSON)
+        self.assertEqual(receiver.feed(data), [msg])
+
+    def testJSONForUnencodableMessages(self):
+        for msg in ({"type": "move", "pos": [11, 1]},
+                    {"type": "result", "pos": [1, 1], "result": "SUNK", "over": False, "ship": [1, 1, 3, 1, 0, "Dinghy"]},
+                    {"type": "result", "pos": [1, 1], "result": "SUNK", "over": False, "ship": [1, 1, 4, 1, 0, "Carrier"]}):
+            self.assertEqual(self.roundTrip(msg)[0], JSON)
+
+    def testJSONForHugeBoards(self):
+        config = GameConfig(200, 200)
+        self.assertEqual(self.roundTrip({"type": "move", "pos": [200, 200]}, config)[0], JSON)
+
+    ### STREAMING ###
+    def testBatchedMessages(self):
+        sender, receiver = self.codecs()
+        messages = [
+            {"type": "move", "pos": [3, 4]},
+            {"type": "shot", "pos": [9, 2], "result": "MISS", "over": False},
+            {"type": "result", "pos": [5, 5], "result": "SUNK", "over": False, "ship": [5, 4, 2, 0, 1, "Patrol Boat"]},
+            {"type": "chat", "text": "hi"},
+            {"type": "shot", "pos": [10, 10], "result": "SUNK", "over": True},
+        ]
+        out = bytearray()
+        for msg in messages:
+            sender.encode(msg, out)
+        self.assertEqual(receiver.feed(bytes(out)), messages)
+
+    def testByteSizedChunks(self):
+        sender, receiver = self.codecs(GameConfig(20, 20))
+        messages = [
+            {"type": "move", "pos": [20, 20]},
+            {"type": "result", "pos": [19, 18], "result": "SUNK", "over": False, "ship": [19, 14, 5, 0, 1, "Carrier"]},
+            {"type": "chat", "text": "good game"},
+        ]
+        out = bytearray()
+        for msg in messages:
+            sender.encode(msg, out)
+        decoded = []
+        for b in out:
+            decoded.extend(receiver.feed(bytes([b])))
+        self.assertEqual(decoded, messages)
+        self.assertEqual(receiver.buffer, bytearray())
+
+    ### ERRORS ###
+    def testTruncatedMessageIsBuffered(self):
+        sender, receiver = self.codecs(GameConfig(20, 20))
+        move = self.encode(sender, {"type": "move", "pos": [20, 20]})
+        chat = self.encode(sender, {"type": "chat", "text": "hi"})
+        for message in (move, chat):
+            for end in range(len(message)):
+                with self.assertRaises(IndexError):
+                    receiver.decode(message[:end], 0)
+        data = move + chat
+        self.assertEqual(receiver.feed(data[:-1]), [{"type": "move", "pos": [20, 20]}])
+        self.assertEqual(receiver.feed(data[-1:]), [{"type": "chat", "text": "hi"}])
+
+    def testUnknownOpcode(self):
+        for op in (0x01, 0x11, 0x23, 0x40, 0xFF):
+            sender, receiver = self.codecs()
+            with self.assertRaisesRegex(ValueError, "Unexpected opcode"):
+                receiver.feed(bytes([op, 0]))
+
+    def testGameOpcodeBeforeConfig(self):
+        with self.assertRaisesRegex(ValueError, "Unexpected opcode"):
+            Codec().feed(bytes([MOVE, 0]))
+
+    def testMalformedData(self):
+        sender, receiver = self.codecs()
+        for data in (bytes([MOVE, 100]), # off the board
+                     bytes([RESULT | 2, 0, 10 << 1, 0]), # unknown ship
+                     bytes([JSON, 3]) + b"{x}",
+                     bytes([JSON, 2]) + b"[]",
+                     bytes([MOVE]) + b"\xff" * 10): # varint too long
+            with self.assertRaises(ValueError):
+                receiver.feed(data)
+            receiver.buffer.clear()
+
+if __name__ == "__main__":
+    unittest.main()
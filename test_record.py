@@ -0,0 +1,66 @@
+# Round-trip tests for the game record format in record.py. Run with "python -m pytest" or "python -m unittest test_record".
+
+import os
+import random
+import tempfile
+import unittest
+
+from ship import Ship
+from board import Board, Result
+from config import DEFAULT_CONFIG
+from record import GameWriter, RecordReader
+from simulation import playGame
+from cpu import RandomCPU, IntermediateCPU
+
+# one ship pointing in each direction, plus one more, in DEFAULT_CONFIG fleet order
+FLEETS = (
+    [Ship((5, 1), 5, (-1, 0), "Carrier"), Ship((10, 6), 4, (0, -1), "Battleship"), Ship((1, 3), 3, (1, 0), "Destroyer"),
+     Ship((3, 6), 3, (0, 1), "Submarine"), Ship((8, 10), 2, (-1, 0), "Patrol Boat")],
+    [Ship((1, 10), 5, (0, -1), "Carrier"), Ship((3, 2), 4, (1, 0), "Battleship"), Ship((7, 7), 3, (-1, 0), "Destroyer"),
+     Ship((9, 9), 3, (0, -1), "Submarine"), Ship((4, 4), 2, (0, 1), "Patrol Boat")],
+)
+
+class RecordTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".bsgr")
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testFleetsRoundTrip(self):
+        # player 0 sinks every ship of player 1, player 1 misses in between
+        boards = (Board(FLEETS[0]), Board(FLEETS[1]))
+        with GameWriter(self.path, DEFAULT_CONFIG) as writer:
+            writer.start(0, FLEETS)
+            targets = sorted(s for ship in FLEETS[1] for s in ship.spaces)
+            for i, pos in enumerate(targets):
+                writer.shot(pos, boards[1].addEnemyShot(pos))
+                if i < len(targets) - 1:
+                    miss = (i % 10 + 1, 2 + i // 10 * 3)
+                    writer.shot(miss, boards[0].addEnemyShot(miss))
+            writer.finish()
+
+        with RecordReader(self.path) as reader:
+            game, = reader
+        self.assertEqual(game.fleets, FLEETS)
+        replayed = game.replay()
+        for board, original in zip(replayed, boards):
+            self.assertEqual(board.aliveShips, original.aliveShips)
+            self.assertEqual(board.deadShips, original.deadShips)
+        self.assertEqual(game.winner(), 0)
+
+    def testSimulatedGames(self):
+        random.seed(1)
+        with GameWriter(self.path, DEFAULT_CONFIG) as writer:
+            for _ in range(20):
+                playGame(RandomCPU, IntermediateCPU, recorder=writer)
+        with RecordReader(self.path) as reader:
+            self.assertEqual(len(reader), 20)
+            for game in reader:
+                boards = game.replay()
+                self.assertEqual(len(boards[1 - game.winner()].aliveShips), 0)
+                self.assertEqual(game.shots[-1][1], Result.SUNK)
+
+if __name__ == "__main__":
+    unittest.main()
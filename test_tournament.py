@@ -0,0 +1,54 @@
+# Tests for the sequential test and round-robin runner in tournament.py. Run with "python -m pytest" or "python -m unittest test_tournament".
+
+import random
+import unittest
+
+from cpu import RandomCPU, IntermediateCPU
+from tournament import SPRT, EVEN, runTournament
+
+class OtherRandomCPU(RandomCPU):
+    """A CPU that is exactly as strong as RandomCPU."""
+
+class SPRTTest(unittest.TestCase):
+    def play(self, sprt:SPRT, winRate:float, rng:random.Random, maxGames:int=20000):
+        """Return the decision sprt reaches on games won with winRate, checked after every game."""
+        wins = [0, 0]
+        for _ in range(maxGames):
+            wins[rng.random() >= winRate] += 1
+            decision = sprt.decide(wins[0], wins[1])
+            if decision is not None: return decision
+        return None
+
+    def testEvenPairingsHaveNoWinner(self):
+        rng = random.Random(1)
+        sprt = SPRT(0.05, 0.05, 0.05)
+        decisions = [self.play(sprt, 0.5, rng) for _ in range(200)]
+        self.assertNotIn(None, decisions)
+        # each one-sided test wrongly names a winner at most alpha of the time
+        self.assertLess(sum(d != EVEN for d in decisions), 200 * 2 * 0.05 * 1.5)
+
+    def testStrongerCPUIsFound(self):
+        rng = random.Random(2)
+        sprt = SPRT(0.05, 0.05, 0.05)
+        self.assertEqual(sum(self.play(sprt, 0.6, rng) == 0 for _ in range(50)), 50)
+        self.assertEqual(sum(self.play(sprt, 0.4, rng) == 1 for _ in range(50)), 50)
+
+    def testUndecidedAtFirst(self):
+        self.assertIsNone(SPRT().decide(0, 0))
+        self.assertIsNone(SPRT().decide(3, 2))
+
+class TournamentTest(unittest.TestCase):
+    def testIdenticalCPUs(self):
+        results = runTournament([RandomCPU, OtherRandomCPU], maxGames=2000, workers=1, seed=1, sprt=SPRT(0.1, 0.05, 0.05))
+        pairing, = results.pairings
+        self.assertEqual(pairing.verdict, EVEN)
+        self.assertIn("no significant difference", pairing.summary())
+
+    def testStrongerCPU(self):
+        results = runTournament([RandomCPU, IntermediateCPU], maxGames=2000, workers=1, seed=1)
+        pairing, = results.pairings
+        self.assertEqual(pairing.verdict, 1)
+        self.assertIn("IntermediateCPU is stronger", pairing.summary())
+
+if __name__ == "__main__":
+    unittest.main()
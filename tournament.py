@@ -0,0 +1,227 @@
+# This file contains the round-robin tournament runner used to compare CPUs against each other without a GUI.
+#
+# Every pair of CPUs plays batches of games on a process pool, alternating who moves first. After each batch sequential probability ratio tests
+# (SPRT) check whether one CPU of the pair is clearly stronger or the two are about even, and the pairing stops as soon as either is settled
+# (or when it reaches the game limit).
+# Results are reported as win rates with Wilson confidence intervals, plus Elo ratings fitted to every pairing at once.
+#
+# Run "python tournament.py" to play every CPU in cpu.py against every other, or name some of them: "python tournament.py RandomCPU AdvancedCPU".
+
+import os
+import math
+import time
+import random
+import itertools
+
+import cpu as cpumodule
+from core import * # CPUs, GameConfig, etc
+from simulation import playGame, getCPUClass
+
+def cpuClasses():
+    """Return every CPU subclass defined in the cpu module, in the order they're defined."""
+    return [c for c in vars(cpumodule).values() if isinstance(c, type) and issubclass(c, CPU) and c is not CPU and c.__module__ == cpumodule.__name__]
+
+def playBatch(cpuA, cpuB, games:int, seed=None, config:GameConfig=None, boardClass=Board):
+    """
+    Play a batch of games between two CPUs in this process, alternating who moves first, and return (wins for cpuA, wins for cpuB).
+    This is the unit of work handed to each worker process.
+    """
+    random.seed(seed) # forked workers inherit the parent's random state, so always reseed
+    wins = [0, 0]
+    for i in range(games):
+        winner, shots = playGame(cpuA, cpuB, firstPlayer=i % 2, boardClass=boardClass, config=config)
+        wins[winner] += 1
+    return tuple(wins)
+
+### STATISTICS ###
+def wilson(wins:int, games:int, z:float=1.96):
+    """Return the (low, high) Wilson score interval for a win rate of wins out of games (95% by default)."""
+    if games == 0: return (0.0, 1.0)
+    p = wins / games
+    center = (p + z*z / (2*games)) / (1 + z*z / games)
+    half = z * math.sqrt(p * (1-p) / games + z*z / (4*games*games)) / (1 + z*z / games)
+    return (max(0.0, center - half), min(1.0, center + half))
+
+def eloDifference(winRate:float):
+    """Return the Elo rating difference that predicts winRate."""
+    winRate = min(max(winRate, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / winRate - 1)
+
+EVEN = 2 # verdict of a pairing whose CPUs are within the margin of each other
+
+class SPRT():
+    """
+    Two one-sided sequential probability ratio tests on the win rate p of the first CPU of a pairing: H0: p = 0.5 against H1: p = 0.5 + margin,
+    and H0: p = 0.5 against H1: p = 0.5 - margin. Accepting either H1 means that CPU is stronger, and accepting both H0s means neither is
+    (the CPUs are about even). The error rates of each test are alpha and beta.
+    """
+    def __init__(self, margin:float=0.05, alpha:float=0.05, beta:float=0.05):
+        # weights of a win and a loss in the log likelihood ratio of the test that the first CPU is stronger;
+        # the test that the second one is stronger is the same with wins and losses swapped
+        self.winWeight = math.log((0.5 + margin) / 0.5)
+        self.lossWeight = math.log((0.5 - margin) / 0.5)
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    def llr(self, wins:int, losses:int):
+        """Return the log likelihood ratios of H1 to H0 of both tests (first CPU stronger, second CPU stronger) after wins and losses."""
+        return (wins * self.winWeight + losses * self.lossWeight, losses * self.winWeight + wins * self.lossWeight)
+
+    def decide(self, wins:int, losses:int):
+        """Return 0 if the first CPU is stronger, 1 if the second one is, EVEN if neither is, or None if more games are needed."""
+        first, second = self.llr(wins, losses)
+        if first >= self.upper: return 0
+        if second >= self.upper: return 1
+        if (first <= self.lower) and (second <= self.lower): return EVEN
+        return None
+
+def fitElo(pairings:list, iterations:int=1000):
+    """
+    Fit a Bradley-Terry model to the results of every pairing and return a dict of CPU class => Elo rating, with the mean rating at 0.
+    Each pairing gets one virtual drawn game, so CPUs that won or lost every game still get finite ratings.
+    """
+    players = sorted(set(itertools.chain.from_iterable((p.cpuA, p.cpuB) for p in pairings)), key=lambda c: c.__name__)
+    strength = dict((c, 1.0) for c in players)
+    for _ in range(iterations):
+        # minorization-maximization update: strength = wins / sum(games / (own strength + opponent strength))
+        updated = {}
+        for c in players:
+            wins = 0.0
+            denominator = 0.0
+            for p in pairings:
+                if c not in (p.cpuA, p.cpuB): continue
+                other = p.cpuB if c is p.cpuA else p.cpuA
+                wins += (p.wins[0] if c is p.cpuA else p.wins[1]) + 0.5
+                denominator += (p.games + 1) / (strength[c] + strength[other])
+            updated[c] = wins / denominator if denominator else 1.0
+        # keep the geometric mean at 1 so the strengths don't drift
+        scale = math.exp(sum(math.log(s) for s in updated.values()) / len(updated))
+        strength = dict((c, s / scale) for c, s in updated.items())
+    return dict((c, 400 * math.log10(s)) for c, s in strength.items())
+
+### TOURNAMENT ###
+class Pairing():
+    """Running results of one pair of CPUs."""
+    def __init__(self, cpuA, cpuB, sprt:SPRT):
+        self.cpuA = cpuA
+        self.cpuB = cpuB
+        self.sprt = sprt
+        self.wins = [0, 0]
+        self.verdict = None # 0 if cpuA is stronger, 1 if cpuB is, EVEN if neither is, None if the test hasn't decided (yet)
+        self.pending = 0 # batches handed to workers and not returned yet
+
+    @property
+    def games(self):
+        return self.wins[0] + self.wins[1]
+
+    def merge(self, wins:tuple):
+        self.wins[0] += wins[0]
+        self.wins[1] += wins[1]
+        if self.verdict is None: self.verdict = self.sprt.decide(self.wins[0], self.wins[1])
+
+    def summary(self):
+        low, high = wilson(self.wins[0], self.games)
+        rate = self.wins[0] / self.games if self.games else 0.0
+        if self.verdict is None: verdict = "undecided"
+        elif self.verdict == EVEN: verdict = "no significant difference"
+        else: verdict = f"{(self.cpuA, self.cpuB)[self.verdict].__name__} is stronger"
+        return (f"{self.cpuA.__name__} vs {self.cpuB.__name__}: {self.games} games, {self.wins[0]}-{self.wins[1]}, "
+                f"{100*rate:.1f}% [{100*low:.1f}%, {100*high:.1f}%] for {self.cpuA.__name__}, {verdict}")
+
+class TournamentResults():
+    """Results of every pairing in a tournament."""
+    def __init__(self, pairings:list):
+        self.pairings = pairings
+        self.elapsed = 0.0
+
+    def ratings(self):
+        """Return a list of (CPU class, Elo rating), strongest first."""
+        return sorted(fitElo(self.pairings).items(), key=lambda item: -item[1])
+
+    def summary(self):
+        """Return a human readable summary of the tournament."""
+        games = sum(p.games for p in self.pairings)
+        lines = [f"{games} games in {self.elapsed:.2f}s"]
+        lines += [p.summary() for p in self.pairings]
+        lines.append("Elo ratings:")
+        lines += [f"  {c.__name__:20} {rating:+7.0f}" for c, rating in self.ratings()]
+        return "\n".join(lines)
+
+def runTournament(cpus:list, maxGames:int=2000, batchSize:int=50, workers=None, seed=None, config:GameConfig=None, sprt:SPRT=None, boardClass=Board):
+    """
+    Play a round-robin tournament between cpus and return a TournamentResults object.
+
+    :param cpus: list of CPU subclasses
+    :param maxGames: most games played by one pairing if the test doesn't decide it first
+    :param batchSize: games handed to a worker at a time (rounded up to an even number, so each batch has both CPUs move first equally often)
+    :param workers: number of worker processes (defaults to the number of cores); 1 plays every game in this process
+    :param seed: optional seed so that a tournament can be reproduced (with one worker)
+    :param config: board size and fleet (defaults to the standard game)
+    :param sprt: early stopping test (defaults to SPRT())
+    :param boardClass: Board implementation used by every player (Board or BitBoard)
+    """
+    if workers is None: workers = os.cpu_count() or 1
+    if sprt is None: sprt = SPRT()
+    batchSize += batchSize % 2
+    pairings = [Pairing(a, b, sprt) for a, b in itertools.combinations(cpus, 2)]
+    seeds = itertools.count(0 if seed is None else seed)
+    def nextSeed():
+        n = next(seeds)
+        return None if seed is None else n
+
+    def batches(pairing:Pairing):
+        """Return how many more batches pairing should be given right now."""
+        if pairing.verdict is not None: return 0
+        return max(0, math.ceil((maxGames - pairing.games) / batchSize) - pairing.pending)
+
+    results = TournamentResults(pairings)
+    start = time.perf_counter()
+    if workers == 1:
+        for p in pairings:
+            while batches(p) > 0:
+                p.merge(playBatch(p.cpuA, p.cpuB, min(batchSize, maxGames - p.games), nextSeed(), config, boardClass))
+    else:
+        from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED # only loaded when needed, they pull in multiprocessing
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            running = {} # future => pairing
+            def fill():
+                # keep every worker busy, handing out batches round-robin so each pairing gets to a decision as early as possible
+                while len(running) < 2 * workers:
+                    waiting = [p for p in pairings if batches(p) > 0]
+                    if not waiting: return
+                    for p in waiting:
+                        if len(running) >= 2 * workers: return
+                        games = min(batchSize, maxGames - p.games - p.pending * batchSize)
+                        running[pool.submit(playBatch, p.cpuA, p.cpuB, games, nextSeed(), config, boardClass)] = p
+                        p.pending += 1
+            fill()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    p = running.pop(future)
+                    p.pending -= 1
+                    p.merge(future.result())
+                fill()
+    results.elapsed = time.perf_counter() - start
+    return results
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Play a round-robin tournament between CPUs without a GUI.")
+    parser.add_argument("cpus", nargs="*", help="class names of the CPUs to enter (defaults to every CPU in cpu.py)")
+    parser.add_argument("-n", "--max-games", type=int, default=2000, help="most games per pairing")
+    parser.add_argument("-b", "--batch", type=int, default=50, help="games handed to a worker at a time")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=10)
+    parser.add_argument("--board", choices=("Board", "BitBoard"), default="Board", help="board implementation to play on")
+    parser.add_argument("--margin", type=float, default=0.05, help="win rate margin around 50%% that the sequential test has to resolve")
+    parser.add_argument("--alpha", type=float, default=0.05, help="error rate of the sequential test (both ways)")
+    args = parser.parse_args()
+
+    cpus = [getCPUClass(name) for name in args.cpus] if args.cpus else cpuClasses()
+    if len(cpus) < 2: parser.error("a tournament needs at least two CPUs")
+    results = runTournament(cpus, args.max_games, args.batch, args.workers, args.seed, GameConfig(args.width, args.height), SPRT(args.margin, args.alpha, args.alpha),
+                            BitBoard if args.board == "BitBoard" else Board)
+    print(results.summary())
@@ -0,0 +1,257 @@
+# This file contains the lockstep vectorized match engine, which plays thousands of CPU vs CPU games at once as NumPy arrays.
+#
+# It needs NumPy, which the rest of the game doesn't, so nothing in core imports it.
+#
+# Neither RandomCPU nor IntermediateCPU looks at the opponent's shots when picking a move, so a game between them is two independent halves:
+# each CPU firing at the other's fleet until it's sunk. The CPU that needs fewer shots wins (the first player wins a tie).
+# The engine plays the halves separately: every row of its arrays is one fleet being fired upon by one CPU, and every step fires one shot in each unfinished row.
+#
+# Run "python vectorsim.py IntermediateCPU RandomCPU -n 10000" to play a match, with the same summary as simulation.py.
+
+import time
+from collections import Counter
+
+import numpy as np
+
+from core import * # CPUs, GameConfig, Ship, etc
+from placements import getTable
+from simulation import MatchResults, getCPUClass
+
+MISS, HIT, SUNK = (r.value for r in Result)
+MAX_TRIES = 100 # random placements tried for a ship before giving up on keeping it apart from the others
+
+class FleetTables():
+    """Every placement of each ship in a fleet, as arrays of cell indices (see Board.cellIndex)."""
+    def __init__(self, config:GameConfig):
+        self.cells = config.cells
+        self.placements = [] # for each ship in the fleet, a (placements, length) array of the cells each placement covers
+        self.zones = [] # for each ship, a (placements, n) array of the cells each placement covers or borders, padded with the dummy cell index config.cells
+        for length, name in config.fleet:
+            table = getTable(length, 1, config.width, 1, config.height)
+            self.placements.append(np.array([[c for c in range(self.cells) if m >> c & 1] for m in table.masks], dtype=np.intp))
+            zones = [[c for c in range(self.cells) if (m | h) >> c & 1] for m, h in zip(table.masks, table.halos)]
+            width = max(len(z) for z in zones)
+            self.zones.append(np.array([z + [self.cells] * (width - len(z)) for z in zones], dtype=np.intp))
+
+def placeFleets(config:GameConfig, k:int, spacing:bool, rng:np.random.Generator):
+    """
+    Place k random fleets at once and return a (k, cells) int8 array of the index in the fleet of the ship on each cell, or -1 for water.
+    Like placements.FleetSampler, each ship is uniform over the placements left by the ships before it (by rejection, all rows at once).
+    With spacing, ships are kept from touching for up to MAX_TRIES tries, and placed anywhere they fit after that.
+    """
+    tables = FleetTables(config)
+    ships = np.full((k, config.cells + 1), -1, dtype=np.int8) # the extra column is the dummy cell, which is always water
+    occupied = np.zeros((k, config.cells + 1), dtype=bool) # cells taken by a ship or next to one, for spacing
+    for i, cells in enumerate(tables.placements):
+        zones = tables.zones[i]
+        chosen = np.empty(k, dtype=np.intp)
+        rows = np.arange(k)
+        tries = 0
+        while len(rows):
+            picks = rng.integers(len(cells), size=len(rows))
+            if spacing and tries < MAX_TRIES: blocked = occupied[rows[:, None], cells[picks]].any(axis=1)
+            else: blocked = (ships[rows[:, None], cells[picks]] >= 0).any(axis=1)
+            chosen[rows[~blocked]] = picks[~blocked]
+            rows = rows[blocked]
+            tries += 1
+        ships[np.arange(k)[:, None], cells[chosen]] = i
+        if spacing: occupied[np.arange(k)[:, None], zones[chosen]] = True
+    return ships[:, :config.cells]
+
+def neighborTable(config:GameConfig):
+    """Return a (cells, 4) array of the neighbors of each cell in Ship.POSSIBLE_DIRECTIONS order, with -1 for neighbors off the board."""
+    rv = np.full((config.cells, 4), -1, dtype=np.intp)
+    for c in range(config.cells):
+        x, y = c % config.width, c // config.width
+        for d, (dx, dy) in enumerate(Ship.POSSIBLE_DIRECTIONS):
+            if (0 <= x + dx < config.width) & (0 <= y + dy < config.height): rv[c, d] = (y + dy) * config.width + x + dx
+    return rv
+
+class VectorGames():
+    """K fleets being fired upon in lockstep: the primary boards of K games, as planes of K rows by cells."""
+    def __init__(self, config:GameConfig, ships:np.ndarray):
+        """:param ships: (K, cells) array from placeFleets"""
+        k = len(ships)
+        self.config = config
+        self.ships = ships
+        self.shot = np.zeros((k, config.cells), dtype=bool)
+        self.hit = np.zeros((k, config.cells), dtype=bool)
+        self.remaining = np.tile(np.array([length for length, name in config.fleet], dtype=np.int8), (k, 1)) # hits left before each ship sinks
+        self.alive = np.full(k, len(config.fleet), dtype=np.int16) # ships left in each game
+        self.shots = np.zeros(k, dtype=np.int32) # shots fired in each game
+
+    def active(self):
+        """Return the indices of the games that aren't over yet."""
+        return np.flatnonzero(self.alive)
+
+    def fire(self, rows:np.ndarray, cells:np.ndarray):
+        """Fire one shot at cells[i] in game rows[i] for every i (each row at most once), and return an array of the Result values."""
+        ship = self.ships[rows, cells]
+        hit = ship >= 0
+        self.shot[rows, cells] = True
+        self.hit[rows, cells] = hit
+        self.shots[rows] += 1
+        results = hit.astype(np.int8)
+        hitRows = rows[hit]
+        hitShips = ship[hit]
+        self.remaining[hitRows, hitShips] -= 1
+        sunk = self.remaining[hitRows, hitShips] == 0
+        results[np.flatnonzero(hit)[sunk]] = SUNK
+        self.alive[hitRows[sunk]] -= 1
+        return results
+
+### POLICIES ###
+class RandomPolicy():
+    """RandomCPU's targeting for every row of a VectorGames: each game fires in the order of its own random permutation of the cells."""
+    def __init__(self, games:VectorGames, rng:np.random.Generator):
+        self.games = games
+        self.order = rng.permuted(np.tile(np.arange(games.config.cells, dtype=np.intp), (len(games.ships), 1)), axis=1)
+        self.next = np.zeros(len(games.ships), dtype=np.intp) # position in order of each game's next random move
+
+    def randomMoves(self, rows:np.ndarray):
+        """Return the next unshot cell in each row's order, which is uniform over the row's unshot cells, and move past it."""
+        moves = np.empty(len(rows), dtype=np.intp)
+        pending = np.arange(len(rows))
+        while len(pending):
+            r = rows[pending]
+            cells = self.order[r, self.next[r]]
+            self.next[r] += 1
+            unshot = ~self.games.shot[r, cells]
+            moves[pending[unshot]] = cells[unshot]
+            pending = pending[~unshot]
+        return moves
+
+    def choose(self, rows:np.ndarray):
+        """Return the move of each game in rows."""
+        return self.randomMoves(rows)
+
+    def update(self, rows:np.ndarray, cells:np.ndarray, results:np.ndarray):
+        """Receive the results of the moves returned by choose."""
+        pass
+
+class IntermediatePolicy(RandomPolicy):
+    """
+    IntermediateCPU's targeting (without parity) for every row of a VectorGames.
+    Each game has its own ship group and FIFO queue of borders, kept as planes and a (K, cells) queue with head and tail pointers.
+    Hits joining a group are processed one per game per step, so when several join at once their borders can be queued in a slightly different order than IntermediateCPU's.
+    """
+    def __init__(self, games:VectorGames, rng:np.random.Generator):
+        super().__init__(games, rng)
+        k, cells = games.shot.shape
+        self.neighbors = neighborTable(games.config)
+        self.targeting = np.zeros(k, dtype=bool) # true in SHIPGROUP mode
+        self.group = np.zeros((k, cells), dtype=bool)
+        self.queued = np.zeros((k, cells), dtype=bool)
+        self.queue = np.zeros((k, cells), dtype=np.intp)
+        self.head = np.zeros(k, dtype=np.intp)
+        self.tail = np.zeros(k, dtype=np.intp)
+
+    def choose(self, rows:np.ndarray):
+        moves = np.full(len(rows), -1, dtype=np.intp)
+        # ship group moves: pop borders until an unshot one turns up
+        pending = np.flatnonzero(self.targeting[rows])
+        while len(pending):
+            r = rows[pending]
+            waiting = self.head[r] < self.tail[r]
+            self.targeting[r[~waiting]] = False # the group is complete
+            pending = pending[waiting]
+            r = r[waiting]
+            cells = self.queue[r, self.head[r]]
+            self.head[r] += 1
+            unshot = ~self.games.shot[r, cells]
+            moves[pending[unshot]] = cells[unshot]
+            pending = pending[~unshot]
+        random = np.flatnonzero(moves < 0)
+        moves[random] = self.randomMoves(rows[random])
+        return moves
+
+    def update(self, rows:np.ndarray, cells:np.ndarray, results:np.ndarray):
+        targeting = self.targeting[rows]
+        start = ~targeting & (results == HIT) # a hit while hunting starts a new group
+        grow = targeting & (results != MISS)
+        r = rows[start]
+        self.group[r] = False
+        self.queued[r] = False
+        self.head[r] = 0
+        self.tail[r] = 0
+        self.targeting[r] = True
+        self.addToGroup(rows[start | grow], cells[start | grow])
+
+    def addToGroup(self, rows:np.ndarray, cells:np.ndarray):
+        """Add hit cells to their games' groups, with every hit connected to them, and queue their unqueued unshot neighbors."""
+        shot = self.games.shot
+        hit = self.games.hit
+        while len(rows):
+            new = ~self.group[rows, cells]
+            rows, cells = rows[new], cells[new]
+            # handle one cell per game at a time, so that each game's queue tail only moves once per direction
+            now = np.zeros(len(rows), dtype=bool)
+            now[np.unique(rows, return_index=True)[1]] = True
+            nextRows, nextCells = [rows[~now]], [cells[~now]]
+            rows, cells = rows[now], cells[now]
+            self.group[rows, cells] = True
+            for d in range(4):
+                nb = self.neighbors[cells, d]
+                onBoard = nb >= 0
+                r, nb = rows[onBoard], nb[onBoard]
+                isShot = shot[r, nb]
+                join = isShot & hit[r, nb] & ~self.group[r, nb]
+                nextRows.append(r[join])
+                nextCells.append(nb[join])
+                border = ~isShot & ~self.queued[r, nb]
+                r, nb = r[border], nb[border]
+                self.queue[r, self.tail[r]] = nb
+                self.tail[r] += 1
+                self.queued[r, nb] = True
+            rows, cells = np.concatenate(nextRows), np.concatenate(nextCells)
+
+# policy and fleet spacing of each CPU that the engine can play
+POLICIES = {RandomCPU: RandomPolicy, IntermediateCPU: IntermediatePolicy}
+SPACING = {RandomCPU: False, IntermediateCPU: True, AdvancedCPU: True, MonteCarloCPU: True}
+
+### MATCHES ###
+def shotsToSink(shooter, defender, k:int, rng:np.random.Generator, config:GameConfig=None):
+    """Return an array of how many shots shooter (a CPU class) takes to sink each of k fleets placed the way defender (a CPU class) places them."""
+    config = DEFAULT_CONFIG if config is None else config
+    games = VectorGames(config, placeFleets(config, k, SPACING[defender], rng))
+    policy = POLICIES[shooter](games, rng)
+    rows = games.active()
+    while len(rows):
+        cells = policy.choose(rows)
+        policy.update(rows, cells, games.fire(rows, cells))
+        rows = games.active()
+    return games.shots
+
+def runVectorMatch(cpuA, cpuB, games:int, seed=None, config:GameConfig=None, batchSize:int=10000):
+    """
+    Play games between two CPUs in lockstep batches and return a simulation.MatchResults object. Player A moves first in every other game.
+    Only CPUs in POLICIES can be played.
+    """
+    for c in (cpuA, cpuB):
+        if c not in POLICIES: raise ValueError(f"{c.__name__} has no vectorized policy")
+    rng = np.random.default_rng(seed)
+    results = MatchResults(cpuA, cpuB)
+    start = time.perf_counter()
+    for first in range(0, games, batchSize):
+        k = min(batchSize, games - first)
+        shotsA = shotsToSink(cpuA, cpuB, k, rng, config)
+        shotsB = shotsToSink(cpuB, cpuA, k, rng, config)
+        aFirst = (np.arange(first, first + k) % 2) == 0
+        aWins = (shotsA < shotsB) | ((shotsA == shotsB) & aFirst)
+        results.merge((Counter(shotsA[aWins].tolist()), Counter(shotsB[~aWins].tolist())))
+    results.elapsed = time.perf_counter() - start
+    return results
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Play CPU vs CPU Battleship games in lockstep with NumPy.")
+    parser.add_argument("cpuA", help="class name of the first CPU: " + " or ".join(c.__name__ for c in POLICIES))
+    parser.add_argument("cpuB", help="class name of the second CPU")
+    parser.add_argument("-n", "--games", type=int, default=10000)
+    parser.add_argument("-k", "--batch", type=int, default=10000, help="games played in lockstep at a time")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=10)
+    args = parser.parse_args()
+
+    print(runVectorMatch(getCPUClass(args.cpuA), getCPUClass(args.cpuB), args.games, args.seed, GameConfig(args.width, args.height), args.batch).summary())